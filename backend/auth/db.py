@@ -0,0 +1,337 @@
+import json
+import os
+import random
+import re
+import threading
+import time
+from collections import deque
+import psycopg2
+import psycopg2.extensions
+import psycopg2.pool
+
+QUERIES = {}
+
+_pools = {}
+_pool_lock = threading.Lock()
+_replica_state = {'checked_at': None, 'healthy': False, 'lag': None}
+_replica_lock = threading.Lock()
+_stats = {}
+_stats_lock = threading.Lock()
+_stats_logged_at = time.monotonic()
+_slow_lock = threading.Lock()
+_slow_captured_at = deque()
+
+FUNCTION_NAME = os.environ.get('FUNCTION_NAME') or os.path.basename(os.path.dirname(os.path.abspath(__file__)))
+READ_STATEMENT = re.compile(r'^\s*(SELECT|WITH)\b', re.IGNORECASE)
+# WITH с UPDATE/INSERT/DELETE внутри (booking_claim) и SELECT ... FOR UPDATE — не чтение:
+# EXPLAIN ANALYZE выполнил бы запись или захватил блокировки ещё раз
+WRITE_KEYWORD = re.compile(r'\b(INSERT|UPDATE|DELETE|MERGE)\b', re.IGNORECASE)
+EXPLAINABLE = re.compile(r'^\s*(SELECT|WITH|INSERT|UPDATE|DELETE|EXECUTE)\b', re.IGNORECASE)
+
+
+class PreparedConnection(psycopg2.extensions.connection):
+    """Соединение, которое помнит, какие запросы на нём уже подготовлены"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.prepared = set()
+        self.slow_queries = []
+        self.replica = False
+
+
+class TimedCursor(psycopg2.extensions.cursor):
+    """Курсор, замеряющий каждый запрос; медленные попадают в журнал вместе с планом"""
+
+    query_name = None
+
+    # Упавший запрос (lock_timeout, нарушение уникальности) не замеряется: транзакция уже
+    # прервана, и точку сохранения для плана в ней не создать
+    def execute(self, query, vars=None):
+        started = time.perf_counter()
+        result = super().execute(query, vars)
+        _check_slow(self, query, (time.perf_counter() - started) * 1000, vars)
+        return result
+
+    def executemany(self, query, vars_list):
+        started = time.perf_counter()
+        result = super().executemany(query, vars_list)
+        _check_slow(self, query, (time.perf_counter() - started) * 1000, explain=False)
+        return result
+
+
+def register(name: str, sql: str):
+    """Регистрирует горячий запрос; параметры в SQL — %s, как в обычном execute"""
+    placeholders = sql.count('%s')
+    counter = iter(range(1, placeholders + 1))
+    QUERIES[name] = {
+        'sql': sql,
+        'server_sql': re.sub(r'%s', lambda _: f'${next(counter)}', sql),
+        'placeholders': placeholders
+    }
+
+
+def _prepare_enabled() -> bool:
+    # За pgbouncer в режиме transaction подготовленные запросы не живут — там их выключают
+    return os.environ.get('DB_PREPARE', '1') != '0'
+
+
+def get_pool(replica: bool = False):
+    """Пул соединений создаётся при первом обращении и переживает тёплые вызовы"""
+    key = 'replica' if replica else 'primary'
+    if key not in _pools:
+        with _pool_lock:
+            if key not in _pools:
+                _pools[key] = psycopg2.pool.ThreadedConnectionPool(
+                    int(os.environ.get('DB_POOL_MIN', '0')),
+                    int(os.environ.get('DB_POOL_MAX', '4')),
+                    os.environ['DATABASE_READONLY_URL' if replica else 'DATABASE_URL'],
+                    connection_factory=PreparedConnection,
+                    cursor_factory=TimedCursor
+                )
+    return _pools[key]
+
+
+def _getconn(replica: bool):
+    pool = get_pool(replica)
+    conn = pool.getconn()
+    if conn.closed:
+        pool.putconn(conn, close=True)
+        conn = pool.getconn()
+    conn.replica = replica
+    return conn
+
+
+def acquire(readonly: bool = False):
+    """Берёт соединение из пула, заменяя закрытые сервером.
+
+    readonly=True направляет запрос на реплику (DATABASE_READONLY_URL), если она задана
+    и отстаёт не больше DB_REPLICA_MAX_LAG_SECONDS; иначе соединение берётся с основной базы.
+    """
+    if readonly and os.environ.get('DATABASE_READONLY_URL') and _replica_healthy():
+        try:
+            return _getconn(True)
+        except psycopg2.Error:
+            _mark_replica(False, None)
+    return _getconn(False)
+
+
+def release(conn):
+    """Возвращает соединение в пул, откатив незавершённую транзакцию"""
+    if conn is None:
+        return
+    pool = get_pool(conn.replica)
+    try:
+        if not conn.closed:
+            conn.rollback()
+            if not conn.replica:
+                _flush_slow_queries(conn)
+        pool.putconn(conn, close=bool(conn.closed))
+    except psycopg2.Error:
+        pool.putconn(conn, close=True)
+
+
+def _mark_replica(healthy: bool, lag):
+    with _replica_lock:
+        _replica_state.update(checked_at=time.monotonic(), healthy=healthy, lag=lag)
+
+
+def _replica_healthy() -> bool:
+    """Отставание реплики проверяется не чаще раза в DB_REPLICA_CHECK_INTERVAL секунд"""
+    interval = float(os.environ.get('DB_REPLICA_CHECK_INTERVAL', '10'))
+    with _replica_lock:
+        checked_at = _replica_state['checked_at']
+        if checked_at is not None and time.monotonic() - checked_at < interval:
+            return _replica_state['healthy']
+        # Остальные потоки до конца проверки пользуются прежним результатом
+        _replica_state['checked_at'] = time.monotonic()
+
+    lag = None
+    conn = None
+    try:
+        conn = _getconn(True)
+        cur = psycopg2.extensions.cursor(conn)
+        # Если всё полученное уже применено, реплика не отстаёт, даже когда на основной базе давно не было записей
+        cur.execute("""
+            SELECT CASE
+                WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+                ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+            END
+        """)
+        lag = float(cur.fetchone()[0])
+        cur.close()
+    except psycopg2.Error:
+        pass
+    finally:
+        release(conn)
+
+    healthy = lag is not None and lag <= float(os.environ.get('DB_REPLICA_MAX_LAG_SECONDS', '5'))
+    _mark_replica(healthy, lag)
+    if not healthy:
+        print(json.dumps({'event': 'replica_fallback', 'function': FUNCTION_NAME, 'lag_seconds': lag}))
+    return healthy
+
+
+def prepare(cur, name: str):
+    """Подготавливает зарегистрированный запрос на соединении курсора, не выполняя его"""
+    conn = cur.connection
+    if _prepare_enabled() and name not in conn.prepared:
+        cur.execute(f"PREPARE {name} AS {QUERIES[name]['server_sql']}")
+        conn.prepared.add(name)
+
+
+def execute(cur, name: str, params: tuple = ()):
+    """Выполняет зарегистрированный запрос, подготавливая его на соединении один раз"""
+    query = QUERIES[name]
+    started = time.perf_counter()
+
+    if _prepare_enabled():
+        prepare(cur, name)
+        args = ', '.join(['%s'] * query['placeholders'])
+        statement = f'EXECUTE {name} ({args})' if args else f'EXECUTE {name}'
+    else:
+        statement = query['sql']
+
+    cur.query_name = name
+    try:
+        cur.execute(statement, params)
+    finally:
+        cur.query_name = None
+
+    _record(name, (time.perf_counter() - started) * 1000)
+
+
+def _record(name: str, elapsed_ms: float):
+    global _stats_logged_at
+    with _stats_lock:
+        entry = _stats.setdefault(name, {'calls': 0, 'total_ms': 0.0, 'max_ms': 0.0})
+        entry['calls'] += 1
+        entry['total_ms'] += elapsed_ms
+        entry['max_ms'] = max(entry['max_ms'], elapsed_ms)
+
+        interval = float(os.environ.get('DB_STATS_LOG_INTERVAL', '300'))
+        now = time.monotonic()
+        if interval <= 0 or now - _stats_logged_at < interval:
+            return
+        _stats_logged_at = now
+        snapshot = _snapshot()
+
+    print(json.dumps({'event': 'query_stats', 'queries': snapshot}, ensure_ascii=False))
+
+
+def _snapshot() -> dict:
+    return {
+        name: {
+            'calls': entry['calls'],
+            'total_ms': round(entry['total_ms'], 3),
+            'avg_ms': round(entry['total_ms'] / entry['calls'], 3),
+            'max_ms': round(entry['max_ms'], 3)
+        }
+        for name, entry in sorted(_stats.items(), key=lambda item: -item[1]['total_ms'])
+    }
+
+
+def query_stats() -> dict:
+    """Сводка по зарегистрированным запросам за жизнь экземпляра, самые тяжёлые первыми"""
+    with _stats_lock:
+        return _snapshot()
+
+
+def _slow_threshold_ms() -> float:
+    return float(os.environ.get('SLOW_QUERY_MS', '200'))
+
+
+def _allow_capture() -> bool:
+    """Выборка и ограничение частоты: EXPLAIN ANALYZE повторяет запрос, поэтому не чаще N раз в минуту"""
+    if random.random() >= float(os.environ.get('SLOW_QUERY_SAMPLE', '1')):
+        return False
+
+    limit = int(os.environ.get('SLOW_QUERY_MAX_PER_MINUTE', '6'))
+    now = time.monotonic()
+    with _slow_lock:
+        while _slow_captured_at and now - _slow_captured_at[0] > 60:
+            _slow_captured_at.popleft()
+        if len(_slow_captured_at) >= limit:
+            return False
+        _slow_captured_at.append(now)
+    return True
+
+
+def _check_slow(cur, query, elapsed_ms: float, vars=None, explain: bool = True):
+    threshold = _slow_threshold_ms()
+    if threshold <= 0 or elapsed_ms < threshold or cur.closed or cur.connection.closed:
+        return
+    if not _allow_capture():
+        return
+
+    sql = query.decode('utf-8', 'replace') if isinstance(query, bytes) else str(query)
+    name = cur.query_name
+    capture = {
+        'event': 'slow_query',
+        'function': FUNCTION_NAME,
+        'query': name,
+        # Только текст с плейсхолдерами: значения параметров содержат персональные данные
+        'sql': ' '.join((QUERIES[name]['sql'] if name in QUERIES else sql).split()),
+        'rows': cur.rowcount,
+        'duration_ms': round(elapsed_ms, 3),
+        'plan': None
+    }
+
+    # Вне транзакции (autocommit) точку сохранения не создать — план не снимаем
+    if explain and EXPLAINABLE.match(sql) and cur.connection.status != psycopg2.extensions.STATUS_READY:
+        capture['plan'] = _explain(cur.connection, sql, vars, _read_only(capture['sql']))
+
+    print(json.dumps(capture, ensure_ascii=False, default=str))
+    if os.environ.get('SLOW_QUERY_TABLE') == '1':
+        cur.connection.slow_queries.append(capture)
+
+
+def _read_only(sql: str) -> bool:
+    """Запрос только читает: для него безопасен EXPLAIN ANALYZE, для остальных — только оценка плана"""
+    return READ_STATEMENT.match(sql) is not None and WRITE_KEYWORD.search(sql) is None
+
+
+def _explain(conn, sql: str, vars, analyze: bool):
+    """План медленного запроса; выполняется в точке сохранения и всегда откатывается"""
+    options = 'ANALYZE, BUFFERS' if analyze else 'COSTS'
+    cur = psycopg2.extensions.cursor(conn)
+    try:
+        cur.execute('SAVEPOINT slow_query_explain')
+    except psycopg2.Error:
+        cur.close()
+        return None
+
+    try:
+        cur.execute('SET LOCAL statement_timeout = %s', (int(os.environ.get('SLOW_QUERY_EXPLAIN_TIMEOUT_MS', '5000')),))
+        cur.execute(f'EXPLAIN ({options}) {sql}', vars)
+        return '\n'.join(row[0] for row in cur.fetchall())
+    except psycopg2.Error as e:
+        return f'EXPLAIN failed: {e}'.strip()
+    finally:
+        # Откат отменяет и повторно выполненную запись, и SET LOCAL
+        try:
+            cur.execute('ROLLBACK TO SAVEPOINT slow_query_explain')
+            cur.execute('RELEASE SAVEPOINT slow_query_explain')
+        except psycopg2.Error:
+            pass
+        cur.close()
+
+
+def _flush_slow_queries(conn):
+    """Сохраняет накопленные медленные запросы в slow_queries после завершения обработчика"""
+    if not conn.slow_queries:
+        return
+    captures, conn.slow_queries = conn.slow_queries, []
+    cur = psycopg2.extensions.cursor(conn)
+    try:
+        cur.executemany("""
+            INSERT INTO slow_queries (function_name, query_name, sql_text, row_count, duration_ms, plan)
+            VALUES (%s, %s, %s, %s, %s, %s)
+        """, [
+            (c['function'], c['query'], c['sql'], c['rows'], c['duration_ms'], c['plan'])
+            for c in captures
+        ])
+        conn.commit()
+    except psycopg2.Error:
+        conn.rollback()
+    finally:
+        cur.close()
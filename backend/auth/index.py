@@ -1,27 +1,48 @@
 import json
 import secrets
 import os
-import psycopg2
 import bcrypt
 from datetime import datetime, timedelta
+from db import acquire, release
+from tenants import resolve_tenant
+from profiling import profiled
+from warmup import is_warmup, warm_up
 
 SECURITY_HEADERS = {
     'X-Frame-Options': 'DENY',
     'X-Content-Type-Options': 'nosniff'
 }
 
+@profiled('auth')
 def handler(event: dict, context) -> dict:
     """API для авторизации администратора с хешированием паролей"""
     method = event.get('httpMethod', 'GET')
     frontend_domain = os.environ.get('FRONTEND_DOMAIN', '*')
     
+    # Прогрев после деплоя или простоя: пулы, клиенты и кэши создаются до прихода пользователей
+    if is_warmup(event):
+        report = warm_up('auth', [
+            ('tenant', lambda: resolve_tenant({})['slug'])
+        ])
+        return {
+            'statusCode': 200 if report['ok'] else 503,
+            'headers': {
+                'Content-Type': 'application/json',
+                'Access-Control-Allow-Origin': frontend_domain,
+                'Access-Control-Allow-Credentials': 'true',
+                **SECURITY_HEADERS
+            },
+            'body': json.dumps(report),
+            'isBase64Encoded': False
+        }
+    
     if method == 'OPTIONS':
         return {
             'statusCode': 200,
             'headers': {
                 'Access-Control-Allow-Origin': frontend_domain,
                 'Access-Control-Allow-Methods': 'POST, OPTIONS',
-                'Access-Control-Allow-Headers': 'Content-Type',
+                'Access-Control-Allow-Headers': 'Content-Type, X-Tenant',
                 'Access-Control-Allow-Credentials': 'true',
                 **SECURITY_HEADERS
             },
@@ -33,7 +54,7 @@ def handler(event: dict, context) -> dict:
         data = json.loads(event.get('body', '{}'))
         password = data.get('password', '')
         
-        conn = psycopg2.connect(os.environ['DATABASE_URL'])
+        conn = acquire()
         cur = conn.cursor()
         
         try:
@@ -77,17 +98,19 @@ def handler(event: dict, context) -> dict:
             else:
                 attempts = 0
             
-            stored_hash_str = os.environ.get('ADMIN_PASSWORD_HASH', '')
+            # Пароль у каждого мастера свой; неизвестный мастер не проходит проверку, как и неверный пароль
+            tenant = resolve_tenant(event, cur)
+            stored_hash_str = tenant['admin_password_hash'] if tenant else ''
             
-            # Fallback: генерируем хеш для пароля "yolo2024" если секрет не настроен
-            if not stored_hash_str:
+            # Fallback: генерируем хеш для пароля "yolo2024" если секрет не настроен (только у основного мастера)
+            if not stored_hash_str and tenant and tenant['is_default']:
                 # Используем предгенерированный хеш для "yolo2024"
                 temp_password = "yolo2024"
                 stored_hash = bcrypt.hashpw(temp_password.encode(), bcrypt.gensalt(rounds=12))
             else:
                 stored_hash = stored_hash_str.encode()
             
-            if bcrypt.checkpw(password.encode(), stored_hash):
+            if stored_hash and bcrypt.checkpw(password.encode(), stored_hash):
                 token = secrets.token_urlsafe(32)
                 expires_at = datetime.now() + timedelta(days=7)
                 
@@ -96,7 +119,8 @@ def handler(event: dict, context) -> dict:
                         id SERIAL PRIMARY KEY,
                         token VARCHAR(64) UNIQUE NOT NULL,
                         created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                        expires_at TIMESTAMP NOT NULL
+                        expires_at TIMESTAMP NOT NULL,
+                        tenant_id INTEGER NOT NULL DEFAULT 1
                     )
                 """)
                 
@@ -105,9 +129,9 @@ def handler(event: dict, context) -> dict:
                 """)
                 
                 cur.execute("""
-                    INSERT INTO admin_sessions (token, expires_at)
-                    VALUES (%s, %s)
-                """, (token, expires_at))
+                    INSERT INTO admin_sessions (token, expires_at, tenant_id)
+                    VALUES (%s, %s, %s)
+                """, (token, expires_at, tenant['id']))
                 
                 cur.execute("""
                     INSERT INTO rate_limit (ip, auth_attempts, last_attempt)
@@ -171,7 +195,7 @@ def handler(event: dict, context) -> dict:
             }
         finally:
             cur.close()
-            conn.close()
+            release(conn)
     
     return {
         'statusCode': 405,
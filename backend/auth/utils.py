@@ -1,36 +1,52 @@
-import os
-import psycopg2
 from datetime import datetime
+from db import acquire, release, execute, register
 
-def verify_admin_token(token: str) -> bool:
-    """Проверяет валидность токена администратора"""
+register('admin_session_lookup', """
+    SELECT expires_at, tenant_id FROM admin_sessions 
+    WHERE token = %s
+""")
+
+def admin_tenant(token: str, cur=None):
+    """Арендатор, которому принадлежит сессия администратора, или None для невалидного токена.
+    
+    С переданным курсором проверка идёт в транзакции вызывающего, без отдельного соединения;
+    просроченная сессия тогда не удаляется — это сделает следующая обычная проверка.
+    """
     if not token:
-        return False
+        return None
     
-    conn = psycopg2.connect(os.environ['DATABASE_URL'])
+    if cur is not None:
+        execute(cur, 'admin_session_lookup', (token,))
+        result = cur.fetchone()
+        if not result or datetime.now() > result[0]:
+            return None
+        return result[1]
+    
+    conn = acquire()
     cur = conn.cursor()
     
     try:
-        cur.execute("""
-            SELECT expires_at FROM admin_sessions 
-            WHERE token = %s
-        """, (token,))
+        execute(cur, 'admin_session_lookup', (token,))
         
         result = cur.fetchone()
         
         if not result:
-            return False
+            return None
         
-        expires_at = result[0]
+        expires_at, tenant_id = result
         
         if datetime.now() > expires_at:
             cur.execute("DELETE FROM admin_sessions WHERE token = %s", (token,))
             conn.commit()
-            return False
+            return None
         
-        return True
+        return tenant_id
     except Exception:
-        return False
+        return None
     finally:
         cur.close()
-        conn.close()
+        release(conn)
+
+def verify_admin_token(token: str, cur=None) -> bool:
+    """Проверяет валидность токена администратора"""
+    return admin_tenant(token, cur) is not None
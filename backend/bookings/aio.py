@@ -0,0 +1,107 @@
+import asyncio
+import hashlib
+import os
+
+_pool = None
+_http_client = None
+_s3_client = None
+_locks = {}
+
+
+def _lock(name: str) -> asyncio.Lock:
+    if name not in _locks:
+        _locks[name] = asyncio.Lock()
+    return _locks[name]
+
+
+async def get_pool():
+    """Пул asyncpg создаётся при первом обращении и живёт, пока жив процесс"""
+    global _pool
+    if _pool is None:
+        async with _lock('pool'):
+            if _pool is None:
+                import asyncpg
+                _pool = await asyncpg.create_pool(
+                    os.environ['DATABASE_URL'],
+                    min_size=int(os.environ.get('ASYNC_DB_POOL_MIN', '1')),
+                    max_size=int(os.environ.get('ASYNC_DB_POOL_MAX', '20')),
+                    statement_cache_size=int(os.environ.get('ASYNC_DB_STATEMENT_CACHE', '100'))
+                )
+    return _pool
+
+
+def get_http_client():
+    """Общий асинхронный HTTP-клиент с keep-alive"""
+    global _http_client
+    if _http_client is None:
+        import httpx
+        _http_client = httpx.AsyncClient(timeout=10.0)
+    return _http_client
+
+
+async def get_s3_client(settings: dict):
+    """Асинхронный S3-клиент aiobotocore, открытый один раз на процесс"""
+    global _s3_client
+    if _s3_client is None:
+        async with _lock('s3'):
+            if _s3_client is None:
+                from aiobotocore.config import AioConfig
+                from aiobotocore.session import get_session
+                _s3_client = await get_session().create_client(
+                    's3',
+                    endpoint_url=settings['endpoint'],
+                    aws_access_key_id=settings['access_key'],
+                    aws_secret_access_key=settings['secret_key'],
+                    config=AioConfig(max_pool_connections=settings['max_pool_connections'])
+                ).__aenter__()
+    return _s3_client
+
+
+async def put_objects(settings: dict, items: list, get_storage):
+    """Параллельная загрузка [(ключ, байты, content-type), ...]; локальное хранилище — в потоках"""
+    if not items:
+        return
+
+    if settings['backend'] == 'local':
+        storage = get_storage()
+        await asyncio.gather(*(asyncio.to_thread(storage.put, *item) for item in items))
+        return
+
+    client = await get_s3_client(settings)
+    await asyncio.gather(*(
+        client.put_object(
+            Bucket=settings['bucket'],
+            Key=key,
+            Body=data,
+            ContentType=content_type,
+            Metadata={'md5': hashlib.md5(data).hexdigest()}
+        )
+        for key, data, content_type in items
+    ))
+
+
+async def head_object(settings: dict, key: str, get_storage):
+    """Метаданные объекта (как storage.head) или None"""
+    if settings['backend'] == 'local':
+        return await asyncio.to_thread(get_storage().head, key)
+
+    client = await get_s3_client(settings)
+    try:
+        response = await client.head_object(Bucket=settings['bucket'], Key=key)
+    except Exception:
+        return None
+
+    etag = response.get('ETag', '').strip('"')
+    return {
+        'key': key,
+        'size': response.get('ContentLength', 0),
+        'etag': etag,
+        'md5': response.get('Metadata', {}).get('md5', etag)
+    }
+
+
+def public_url(settings: dict, key: str, get_storage) -> str:
+    """Публичный URL объекта без создания синхронного S3-клиента"""
+    if settings['backend'] == 'local':
+        return get_storage().public_url(key)
+    return f"{settings['public_base'].rstrip('/')}/{key}"
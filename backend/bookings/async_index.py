@@ -0,0 +1,191 @@
+import asyncio
+import json
+import os
+import asyncpg
+import index
+from aio import get_pool, get_s3_client, put_objects, public_url
+from multipart import MultipartError, form_boundary, parse_form
+from publisher import publish_later
+from photos import decode_photos, validate_photos, photo_suffixes, photo_uploads, PhotoError, MAX_PHOTOS, MAX_PHOTO_SIZE
+from storage import get_storage, storage_settings
+from tenants import resolve_tenant
+from validation import BOOKING_SCHEMA, ValidationError
+from profiling import profiled
+from warmup import is_warmup, warm_up_async
+
+SECURITY_HEADERS = index.SECURITY_HEADERS
+
+CLAIM_BOOKING = """
+    WITH claimed AS (
+        UPDATE time_slots
+        SET is_available = false
+        WHERE id = $1 AND tenant_id = $2 AND is_available = true
+        RETURNING id, slot_date, tenant_id
+    ), booking AS (
+        INSERT INTO bookings
+        (tenant_id, slot_id, slot_date, client_name, client_contact, booking_type, comment)
+        SELECT tenant_id, id, slot_date, $3, $4, $5, $6 FROM claimed
+        RETURNING id, slot_date, tenant_id
+    ), photos AS (
+        INSERT INTO booking_photos (tenant_id, booking_id, slot_date, photo_url)
+        SELECT booking.tenant_id, booking.id, booking.slot_date, $7::text || booking.id || p.suffix
+        FROM booking, unnest($8::text[]) WITH ORDINALITY AS p(suffix, position)
+        ORDER BY p.position
+    )
+    SELECT id, slot_date FROM booking
+"""
+
+RELEASE_BOOKING = """
+    WITH removed_photos AS (
+        DELETE FROM booking_photos WHERE booking_id = $1 AND slot_date = $2
+    ), removed AS (
+        DELETE FROM bookings WHERE id = $1 AND slot_date = $2
+        RETURNING slot_id
+    )
+    UPDATE time_slots SET is_available = true
+    WHERE id IN (SELECT slot_id FROM removed) AND slot_date = $2
+"""
+
+
+async def _warm_statements(*queries) -> dict:
+    """Открывает пул asyncpg и подготавливает горячие запросы на одном из его соединений"""
+    pool = await get_pool()
+    async with pool.acquire() as conn:
+        for query in queries:
+            await conn.prepare(query)
+    return {'prepared': len(queries)}
+
+
+async def _warm_s3() -> dict:
+    settings = storage_settings()
+    if settings['backend'] == 's3':
+        await get_s3_client(settings)
+    return {'backend': settings['backend']}
+
+
+def _json_response(status_code: int, payload, frontend_domain: str) -> dict:
+    return {
+        'statusCode': status_code,
+        'headers': {
+            'Content-Type': 'application/json',
+            'Access-Control-Allow-Origin': frontend_domain,
+            'Access-Control-Allow-Credentials': 'true',
+            **SECURITY_HEADERS
+        },
+        'body': json.dumps(payload),
+        'isBase64Encoded': False
+    }
+
+
+@profiled('bookings')
+async def handler(event: dict, context) -> dict:
+    """Асинхронный вариант создания заявки: asyncpg, aiobotocore; остальные методы — синхронным обработчиком"""
+    frontend_domain = os.environ.get('FRONTEND_DOMAIN', '*')
+    method = event.get('httpMethod', 'GET')
+
+    # Синхронные пулы и кэши прогревает обычный обработчик, пул asyncpg и клиент aiobotocore — этот
+    if is_warmup(event):
+        response = await asyncio.to_thread(index.handler, event, context)
+        return await warm_up_async(response, [
+            ('asyncpg', lambda: _warm_statements(CLAIM_BOOKING, RELEASE_BOOKING)),
+            ('aio_storage', _warm_s3)
+        ])
+
+    if method != 'POST':
+        return await asyncio.to_thread(index.handler, event, context)
+
+    body = event.get('body') or '{}'
+
+    # Размер и схема проверяются до семафора, фото и соединения с базой, как в синхронном обработчике
+    if len(body) > index.MAX_BODY_SIZE:
+        return _json_response(413, {'error': 'Размер данных слишком большой'}, frontend_domain)
+
+    # Форма разбирается в потоке: копирование частей мегабайтных фото нагружает CPU
+    files = None
+    try:
+        boundary = form_boundary(event)
+        if boundary:
+            fields, files = await asyncio.to_thread(parse_form, event, boundary, MAX_PHOTO_SIZE, MAX_PHOTOS)
+            payload = BOOKING_SCHEMA.validate(fields)
+        else:
+            payload = BOOKING_SCHEMA.load(body)
+    except (MultipartError, ValidationError) as e:
+        return _json_response(e.status_code, {'error': e.message, 'fields': getattr(e, 'errors', {})}, frontend_domain)
+
+    # Общий с синхронным обработчиком семафор: ожидание в потоке не блокирует цикл событий
+    wait_s = float(os.environ.get('BOOKING_ADMISSION_WAIT_MS', '200')) / 1000
+    if not await asyncio.to_thread(index.ADMISSION.acquire, timeout=wait_s):
+        return index.overloaded_response(frontend_domain)
+
+    try:
+        # Декодирование фото нагружает CPU — уводим его из цикла событий
+        try:
+            if files is not None:
+                photos = validate_photos([photo for name, photo in files if name == 'photos'])
+            else:
+                photos = await asyncio.to_thread(decode_photos, payload['photos'])
+        except PhotoError as e:
+            return _json_response(e.status_code, {'error': e.message}, frontend_domain)
+
+        tenant = await asyncio.to_thread(resolve_tenant, event)
+        if not tenant:
+            return _json_response(404, {'error': 'Мастер не найден'}, frontend_domain)
+        prefix = tenant['storage_prefix']
+
+        settings = storage_settings()
+        pool = await get_pool()
+
+        # Свободного соединения не ждём дольше семафора: под нагрузкой лучше быстро ответить 503
+        try:
+            conn = await pool.acquire(timeout=wait_s)
+        except (asyncio.TimeoutError, asyncpg.TooManyConnectionsError, asyncpg.CannotConnectNowError, OSError):
+            return index.overloaded_response(frontend_domain)
+
+        try:
+            # Слот не ждём дольше lock_timeout; set_config(..., true) действует до конца транзакции
+            try:
+                async with conn.transaction():
+                    await conn.execute(
+                        "SELECT set_config('lock_timeout', $1, true), set_config('statement_timeout', $2, true)",
+                        os.environ.get('BOOKING_LOCK_TIMEOUT', '2s'), os.environ.get('BOOKING_STATEMENT_TIMEOUT', '5s')
+                    )
+                    claimed = await (await conn.prepare(CLAIM_BOOKING)).fetchrow(
+                        payload['slot_id'], tenant['id'], payload['name'], payload['contact'], payload['type'], payload['comment'],
+                        public_url(settings, prefix + 'bookings/', get_storage), photo_suffixes(photos)
+                    )
+            except asyncpg.UniqueViolationError:
+                claimed = None
+            except (asyncpg.LockNotAvailableError, asyncpg.QueryCanceledError):
+                return index.overloaded_response(frontend_domain)
+
+            if not claimed:
+                return _json_response(409, {'error': 'Слот уже занят'}, frontend_domain)
+
+            booking_id, slot_date = claimed['id'], claimed['slot_date']
+
+            uploads = photo_uploads(booking_id, photos, prefix)
+            try:
+                await put_objects(settings, uploads, get_storage)
+            except Exception:
+                await conn.execute(RELEASE_BOOKING, booking_id, slot_date)
+                await asyncio.to_thread(publish_later, tenant)
+                await asyncio.to_thread(get_storage().delete_prefixes, [f'{prefix}bookings/{booking_id}/'])
+                raise
+
+            photo_urls = [public_url(settings, key, get_storage) for key, _, _ in uploads]
+        finally:
+            await pool.release(conn)
+
+        await asyncio.to_thread(publish_later, tenant)
+
+        return _json_response(201, {
+            'booking_id': booking_id,
+            'photos': photo_urls,
+            'message': 'Заявка создана'
+        }, frontend_domain)
+
+    except Exception as e:
+        print(json.dumps({'event': 'error', 'function': 'bookings', 'method': method, 'error': repr(e)}, ensure_ascii=False))
+        return _json_response(500, {'error': 'Внутренняя ошибка, попробуйте позже'}, frontend_domain)
+    finally:
+        index.ADMISSION.release()
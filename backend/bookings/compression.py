@@ -0,0 +1,103 @@
+import base64
+import gzip
+import os
+import threading
+from collections import OrderedDict
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def _settings() -> dict:
+    return {
+        'min_bytes': int(os.environ.get('COMPRESS_MIN_BYTES', '1024')),
+        'gzip_level': int(os.environ.get('COMPRESS_GZIP_LEVEL', '6')),
+        'brotli_quality': int(os.environ.get('COMPRESS_BROTLI_QUALITY', '5')),
+        'cache_size': int(os.environ.get('COMPRESS_CACHE_SIZE', '32'))
+    }
+
+
+def accepted_encodings(headers: dict) -> set:
+    """Кодировки из Accept-Encoding с ненулевым q"""
+    value = ''
+    for key, header in (headers or {}).items():
+        if key.lower() == 'accept-encoding':
+            value = header or ''
+            break
+
+    accepted = set()
+    for item in value.split(','):
+        parts = [part.strip() for part in item.split(';')]
+        name = parts[0].lower()
+        quality = 1.0
+        for param in parts[1:]:
+            if param.startswith('q='):
+                try:
+                    quality = float(param[2:])
+                except ValueError:
+                    quality = 0.0
+        if name and quality > 0:
+            accepted.add(name)
+    return accepted
+
+
+def choose_encoding(headers: dict):
+    accepted = accepted_encodings(headers)
+    if brotli is not None and 'br' in accepted:
+        return 'br'
+    if 'gzip' in accepted or '*' in accepted:
+        return 'gzip'
+    return None
+
+
+def _compress(encoding: str, body: bytes, settings: dict) -> bytes:
+    if encoding == 'br':
+        return brotli.compress(body, quality=settings['brotli_quality'])
+    return gzip.compress(body, compresslevel=settings['gzip_level'], mtime=0)
+
+
+def compressed_body(encoding: str, body: str, settings: dict) -> str:
+    """Сжатое тело в base64; одинаковые ответы (тот же список слотов) сжимаются один раз"""
+    key = (encoding, hash(body))
+    with _cache_lock:
+        cached = _cache.get(key)
+        if cached and cached[0] == body:
+            _cache.move_to_end(key)
+            return cached[1]
+
+    encoded = base64.b64encode(_compress(encoding, body.encode('utf-8'), settings)).decode('ascii')
+
+    with _cache_lock:
+        _cache[key] = (body, encoded)
+        while len(_cache) > settings['cache_size']:
+            _cache.popitem(last=False)
+    return encoded
+
+
+def compress_response(event: dict, response: dict) -> dict:
+    """Сжимает тело ответа gzip или brotli, если клиент это умеет и ответ достаточно большой"""
+    body = response.get('body')
+    if response.get('isBase64Encoded') or not isinstance(body, str):
+        return response
+
+    settings = _settings()
+    headers = dict(response.get('headers') or {})
+    vary = headers.get('Vary')
+    headers['Vary'] = f'{vary}, Accept-Encoding' if vary else 'Accept-Encoding'
+
+    encoding = choose_encoding(event.get('headers') or {})
+    if not encoding or len(body) < settings['min_bytes']:
+        return {**response, 'headers': headers}
+
+    headers['Content-Encoding'] = encoding
+    return {
+        **response,
+        'headers': headers,
+        'body': compressed_body(encoding, body, settings),
+        'isBase64Encoded': True
+    }
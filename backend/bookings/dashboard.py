@@ -0,0 +1,63 @@
+import os
+from sync import list_bookings, slot_to_dict, sync_cursor
+
+
+def stats_days() -> int:
+    return int(os.environ.get('DASHBOARD_STATS_DAYS', '30'))
+
+
+def upcoming_slots(cur, tenant_id: int) -> list:
+    cur.execute("""
+        SELECT id, slot_date, slot_time, is_available
+        FROM time_slots
+        WHERE tenant_id = %s AND slot_date >= CURRENT_DATE
+        ORDER BY slot_date, slot_time
+    """, (tenant_id,))
+    return [slot_to_dict(row) for row in cur.fetchall()]
+
+
+def booking_stats(cur, tenant_id: int) -> dict:
+    """Сводка из booking_stats за последние DASHBOARD_STATS_DAYS дней и все будущие.
+
+    Счётчик разбит на шарды (V0010): значение ключа — сумма его шардов, отдельный шард может быть отрицательным.
+    """
+    cur.execute("""
+        SELECT slot_date, payment_status, booking_type, SUM(bookings)
+        FROM booking_stats
+        WHERE tenant_id = %s AND slot_date >= CURRENT_DATE - %s
+        GROUP BY slot_date, payment_status, booking_type
+        HAVING SUM(bookings) > 0
+        ORDER BY slot_date
+    """, (tenant_id, stats_days()))
+
+    by_day = {}
+    by_status = {}
+    by_type = {}
+    for slot_date, payment_status, booking_type, count in cur.fetchall():
+        day = slot_date.isoformat()
+        by_day[day] = by_day.get(day, 0) + count
+        by_status[payment_status] = by_status.get(payment_status, 0) + count
+        by_type[booking_type] = by_type.get(booking_type, 0) + count
+
+    return {
+        'days': stats_days(),
+        'by_day': [{'date': day, 'count': count} for day, count in by_day.items()],
+        'by_status': by_status,
+        'by_type': by_type,
+        'total': sum(by_status.values())
+    }
+
+
+def dashboard(cur, tenant_id: int) -> dict:
+    """Слоты, последние заявки и сводка из одного снимка базы.
+
+    Транзакция должна быть открыта как REPEATABLE READ: тогда все запросы видят одно и то же состояние.
+    Курсор синхронизации берётся первым, как и при полной загрузке списка заявок.
+    """
+    cursor = sync_cursor(cur)
+    return {
+        'cursor': cursor.isoformat(),
+        'slots': upcoming_slots(cur, tenant_id),
+        'bookings': list_bookings(cur, tenant_id),
+        'stats': booking_stats(cur, tenant_id)
+    }
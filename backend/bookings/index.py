@@ -1,11 +1,45 @@
 import json
 import os
-import psycopg2
-import base64
-import boto3
+import threading
+import psycopg2.errors
+import psycopg2.pool
 from datetime import datetime
-from utils import verify_admin_token
-from validation import sanitize_text, validate_contact, validate_booking_type, validate_name
+from availability import publish_availability
+from compression import compress_response
+from dashboard import dashboard
+from db import acquire, release, execute, register
+from tenants import resolve_tenant, tenant_by_id
+from utils import admin_tenant
+from multipart import MultipartError, form_boundary, parse_form
+from publisher import publish_later
+from photos import decode_photos, validate_photos, photo_suffixes, photo_uploads, PhotoError, MAX_PHOTOS, MAX_PHOTO_SIZE
+from storage import get_storage
+from sync import changes_since, list_bookings, parse_cursor, sync_cursor
+from validation import BOOKING_SCHEMA, ValidationError
+from profiling import profiled
+from warmup import is_warmup, warm_up
+
+# Захват слота, заявка и строки фото — один запрос: строка слота заблокирована
+# только на время этого оператора, а проигравший в гонке получает пустой результат
+register('booking_claim', """
+    WITH claimed AS (
+        UPDATE time_slots 
+        SET is_available = false 
+        WHERE id = %s AND tenant_id = %s AND is_available = true
+        RETURNING id, slot_date, tenant_id
+    ), booking AS (
+        INSERT INTO bookings 
+        (tenant_id, slot_id, slot_date, client_name, client_contact, booking_type, comment)
+        SELECT tenant_id, id, slot_date, %s, %s, %s, %s FROM claimed
+        RETURNING id, slot_date, tenant_id
+    ), photos AS (
+        INSERT INTO booking_photos (tenant_id, booking_id, slot_date, photo_url)
+        SELECT booking.tenant_id, booking.id, booking.slot_date, %s::text || booking.id || p.suffix
+        FROM booking, unnest(%s::text[]) WITH ORDINALITY AS p(suffix, position)
+        ORDER BY p.position
+    )
+    SELECT id, slot_date FROM booking
+""")
 
 SECURITY_HEADERS = {
     'X-Frame-Options': 'DENY',
@@ -13,18 +47,59 @@ SECURITY_HEADERS = {
     'Content-Security-Policy': "default-src 'none'; script-src 'self'; connect-src 'self'; img-src 'self' https://cdn.poehali.dev; style-src 'self'"
 }
 
+# Больше не пропустит decode_photos: все фото в base64 плюс запас на поля формы.
+# Двоичное multipart-тело шлюз тоже передаёт в base64, так что предел для него тот же
+MAX_BODY_SIZE = MAX_PHOTOS * MAX_PHOTO_SIZE * 4 // 3 + 64 * 1024
+
+# Сколько заявок с декодированием и загрузкой фото экземпляр обрабатывает одновременно
+ADMISSION = threading.BoundedSemaphore(int(os.environ.get('BOOKING_MAX_INFLIGHT', '4')))
+
+def overloaded_response(frontend_domain: str) -> dict:
+    """503 с Retry-After: клиент повторит запрос позже, а не будет ждать в очереди"""
+    return {
+        'statusCode': 503,
+        'headers': {
+            'Content-Type': 'application/json',
+            'Access-Control-Allow-Origin': frontend_domain,
+            'Access-Control-Allow-Credentials': 'true',
+            'Access-Control-Expose-Headers': 'Retry-After',
+            'Retry-After': os.environ.get('BOOKING_RETRY_AFTER', '2'),
+            **SECURITY_HEADERS
+        },
+        'body': json.dumps({'error': 'Сервис перегружен, повторите попытку через несколько секунд'}),
+        'isBase64Encoded': False
+    }
+
+@profiled('bookings')
 def handler(event: dict, context) -> dict:
     """API для создания заявок на запись с загрузкой фото"""
     frontend_domain = os.environ.get('FRONTEND_DOMAIN', '*')
     method = event.get('httpMethod', 'GET')
     
+    # Прогрев после деплоя или простоя: пулы, клиенты и кэши создаются до прихода пользователей
+    if is_warmup(event):
+        report = warm_up('bookings', [
+            ('tenant', lambda: resolve_tenant({})['slug'])
+        ])
+        return {
+            'statusCode': 200 if report['ok'] else 503,
+            'headers': {
+                'Content-Type': 'application/json',
+                'Access-Control-Allow-Origin': frontend_domain,
+                'Access-Control-Allow-Credentials': 'true',
+                **SECURITY_HEADERS
+            },
+            'body': json.dumps(report),
+            'isBase64Encoded': False
+        }
+    
     if method == 'OPTIONS':
         return {
             'statusCode': 200,
             'headers': {
                 'Access-Control-Allow-Origin': frontend_domain,
                 'Access-Control-Allow-Methods': 'GET, POST, DELETE, OPTIONS',
-                'Access-Control-Allow-Headers': 'Content-Type, X-Admin-Token, Cookie',
+                'Access-Control-Allow-Headers': 'Content-Type, X-Admin-Token, X-Tenant, Cookie',
                 'Access-Control-Allow-Credentials': 'true',
                 **SECURITY_HEADERS
             },
@@ -32,150 +107,123 @@ def handler(event: dict, context) -> dict:
             'isBase64Encoded': False
         }
     
-    conn = psycopg2.connect(os.environ['DATABASE_URL'])
+    admitted = False
+    
+    if method == 'POST':
+        body = event.get('body') or '{}'
+        
+        # Размер проверяется до разбора JSON и до занятия соединения
+        if len(body) > MAX_BODY_SIZE:
+            return {
+                'statusCode': 413,
+                'headers': {
+                    'Content-Type': 'application/json',
+                    'Access-Control-Allow-Origin': frontend_domain,
+                    'Access-Control-Allow-Credentials': 'true',
+                    **SECURITY_HEADERS
+                },
+                'body': json.dumps({'error': 'Размер данных слишком большой'}),
+                'isBase64Encoded': False
+            }
+        
+        # Тело разбирается и проверяется по схеме целиком до фото, семафора и соединения с базой:
+        # некорректная заявка получает все ошибки полей одним ответом
+        files = None
+        try:
+            boundary = form_boundary(event)
+            if boundary:
+                fields, files = parse_form(event, boundary, MAX_PHOTO_SIZE, MAX_PHOTOS)
+                payload = BOOKING_SCHEMA.validate(fields)
+            else:
+                payload = BOOKING_SCHEMA.load(body)
+        except (MultipartError, ValidationError) as e:
+            return {
+                'statusCode': e.status_code,
+                'headers': {
+                    'Content-Type': 'application/json',
+                    'Access-Control-Allow-Origin': frontend_domain,
+                    'Access-Control-Allow-Credentials': 'true',
+                    **SECURITY_HEADERS
+                },
+                'body': json.dumps({'error': e.message, 'fields': getattr(e, 'errors', {})}),
+                'isBase64Encoded': False
+            }
+        
+        admitted = ADMISSION.acquire(timeout=float(os.environ.get('BOOKING_ADMISSION_WAIT_MS', '200')) / 1000)
+        if not admitted:
+            return overloaded_response(frontend_domain)
+    
+    # Чтение идёт с реплики; ?consistent=1 после собственной записи читает с основной базы.
+    # Синхронизация по курсору и дашборд тоже читают с основной базы: на реплике курсор может обогнать данные
+    params = event.get('queryStringParameters') or {}
+    consistent = params.get('consistent') == '1' or 'since' in params or params.get('view') == 'dashboard'
+    try:
+        conn = acquire(readonly=method == 'GET' and not consistent)
+    except (psycopg2.pool.PoolError, psycopg2.OperationalError):
+        # Пул исчерпан или база не принимает подключения — отказываем сразу
+        if admitted:
+            ADMISSION.release()
+        return overloaded_response(frontend_domain)
     cur = conn.cursor()
     
     try:
         if method == 'POST':
-            body = event.get('body', '{}')
-            
-            if len(body) > 50 * 1024 * 1024:
+            tenant = resolve_tenant(event, cur)
+            if not tenant:
                 return {
-                    'statusCode': 413,
-                    'headers': {
-                        'Content-Type': 'application/json',
-                        'Access-Control-Allow-Origin': frontend_domain,
-                        'Access-Control-Allow-Credentials': 'true',
-                        **SECURITY_HEADERS
-                    },
-                    'body': json.dumps({'error': 'Размер данных слишком большой'}),
-                    'isBase64Encoded': False
-                }
-            
-            data = json.loads(body)
-            
-            slot_id = data.get('slot_id')
-            client_name = data.get('name', '')
-            client_contact = data.get('contact', '')
-            booking_type = data.get('type', '')
-            comment = data.get('comment', '')
-            photos_base64 = data.get('photos', [])
-            
-            if not validate_name(client_name):
-                return {
-                    'statusCode': 400,
-                    'headers': {
-                        'Content-Type': 'application/json',
-                        'Access-Control-Allow-Origin': frontend_domain,
-                        'Access-Control-Allow-Credentials': 'true',
-                        **SECURITY_HEADERS
-                    },
-                    'body': json.dumps({'error': 'Некорректное имя'}),
-                    'isBase64Encoded': False
-                }
-            
-            if not validate_contact(client_contact):
-                return {
-                    'statusCode': 400,
-                    'headers': {
-                        'Content-Type': 'application/json',
-                        'Access-Control-Allow-Origin': frontend_domain,
-                        'Access-Control-Allow-Credentials': 'true',
-                        **SECURITY_HEADERS
-                    },
-                    'body': json.dumps({'error': 'Некорректный контакт'}),
-                    'isBase64Encoded': False
-                }
-            
-            if not validate_booking_type(booking_type):
-                return {
-                    'statusCode': 400,
+                    'statusCode': 404,
                     'headers': {
                         'Content-Type': 'application/json',
                         'Access-Control-Allow-Origin': frontend_domain,
                         'Access-Control-Allow-Credentials': 'true',
                         **SECURITY_HEADERS
                     },
-                    'body': json.dumps({'error': 'Некорректный тип записи'}),
+                    'body': json.dumps({'error': 'Мастер не найден'}),
                     'isBase64Encoded': False
                 }
             
-            client_name = sanitize_text(client_name, 100)
-            client_contact = sanitize_text(client_contact, 100)
-            comment = sanitize_text(comment, 500)
-            
-            MAX_PHOTOS = 3
-            if len(photos_base64) > MAX_PHOTOS:
+            try:
+                if files is not None:
+                    photos = validate_photos([photo for name, photo in files if name == 'photos'])
+                else:
+                    photos = decode_photos(payload['photos'])
+            except PhotoError as e:
                 return {
-                    'statusCode': 400,
+                    'statusCode': e.status_code,
                     'headers': {
                         'Content-Type': 'application/json',
                         'Access-Control-Allow-Origin': frontend_domain,
                         'Access-Control-Allow-Credentials': 'true',
                         **SECURITY_HEADERS
                     },
-                    'body': json.dumps({'error': f'Максимум {MAX_PHOTOS} фото'}),
+                    'body': json.dumps({'error': e.message}),
                     'isBase64Encoded': False
                 }
             
-
-            
-            VALID_IMAGE_SIGNATURES = {
-                b'\xff\xd8\xff': 'image/jpeg',
-                b'\x89PNG\r\n\x1a\n': 'image/png',
-                b'GIF87a': 'image/gif',
-                b'GIF89a': 'image/gif',
-                b'RIFF': 'image/webp'
-            }
-            
-            MAX_PHOTO_SIZE = 5 * 1024 * 1024
-            for idx, photo_data in enumerate(photos_base64):
-                if photo_data.startswith('data:image'):
-                    photo_data = photo_data.split(',')[1]
-                
-                photo_bytes = base64.b64decode(photo_data)
-                
-                if len(photo_bytes) > MAX_PHOTO_SIZE:
-                    return {
-                        'statusCode': 413,
-                        'headers': {
-                            'Content-Type': 'application/json',
-                            'Access-Control-Allow-Origin': frontend_domain,
-                            'Access-Control-Allow-Credentials': 'true',
-                            **SECURITY_HEADERS
-                        },
-                        'body': json.dumps({'error': f'Фото {idx + 1} слишком большое (максимум 5MB)'}),
-                        'isBase64Encoded': False
-                    }
-                
-                is_valid_image = False
-                for signature in VALID_IMAGE_SIGNATURES.keys():
-                    if photo_bytes.startswith(signature):
-                        is_valid_image = True
-                        break
-                
-                if not is_valid_image:
-                    return {
-                        'statusCode': 400,
-                        'headers': {
-                            'Content-Type': 'application/json',
-                            'Access-Control-Allow-Origin': frontend_domain,
-                            'Access-Control-Allow-Credentials': 'true',
-                            **SECURITY_HEADERS
-                        },
-                        'body': json.dumps({'error': f'Файл {idx + 1} не является изображением'}),
-                        'isBase64Encoded': False
-                    }
-            
-            cur.execute("""
-                SELECT id FROM time_slots 
-                WHERE id = %s AND is_available = true
-                FOR UPDATE
-            """, (slot_id,))
+            storage = get_storage()
             
-            locked_slot = cur.fetchone()
+            # Слот не ждём дольше lock_timeout: под нагрузкой лучше быстро ответить 503
+            cur.execute(
+                "SELECT set_config('lock_timeout', %s, true), set_config('statement_timeout', %s, true)",
+                (os.environ.get('BOOKING_LOCK_TIMEOUT', '2s'), os.environ.get('BOOKING_STATEMENT_TIMEOUT', '5s'))
+            )
             
-            if not locked_slot:
+            # URL фото в базе: префикс + id заявки + суффикс, как у ключей из photo_uploads
+            try:
+                execute(cur, 'booking_claim', (
+                    payload['slot_id'], tenant['id'], payload['name'], payload['contact'], payload['type'], payload['comment'],
+                    storage.public_url(tenant['storage_prefix'] + 'bookings/'), photo_suffixes(photos)
+                ))
+                claimed = cur.fetchone()
+            except psycopg2.errors.UniqueViolation:
+                # Уникальный индекс на активную заявку слота — страховка от двойной записи
+                conn.rollback()
+                claimed = None
+            except (psycopg2.errors.LockNotAvailable, psycopg2.errors.QueryCanceled):
+                conn.rollback()
+                return overloaded_response(frontend_domain)
+            
+            if not claimed:
                 return {
                     'statusCode': 409,
                     'headers': {
@@ -188,51 +236,33 @@ def handler(event: dict, context) -> dict:
                     'isBase64Encoded': False
                 }
             
-            cur.execute("""
-                UPDATE time_slots 
-                SET is_available = false 
-                WHERE id = %s
-            """, (slot_id,))
-            
-            cur.execute("""
-                INSERT INTO bookings 
-                (slot_id, client_name, client_contact, booking_type, comment)
-                VALUES (%s, %s, %s, %s, %s)
-                RETURNING id
-            """, (slot_id, client_name, client_contact, booking_type, comment))
-            
-            booking_id = cur.fetchone()[0]
-            
-            s3 = boto3.client('s3',
-                endpoint_url='https://bucket.poehali.dev',
-                aws_access_key_id=os.environ['AWS_ACCESS_KEY_ID'],
-                aws_secret_access_key=os.environ['AWS_SECRET_ACCESS_KEY']
-            )
+            booking_id, slot_date = claimed
+            conn.commit()
             
-            photo_urls = []
-            for idx, photo_data in enumerate(photos_base64):
-                if photo_data.startswith('data:image'):
-                    photo_data = photo_data.split(',')[1]
-                
-                photo_bytes = base64.b64decode(photo_data)
-                file_key = f'bookings/{booking_id}/photo_{idx}.jpg'
-                
-                s3.put_object(
-                    Bucket='files',
-                    Key=file_key,
-                    Body=photo_bytes,
-                    ContentType='image/jpeg'
-                )
-                
-                photo_url = f"https://cdn.poehali.dev/projects/{os.environ['AWS_ACCESS_KEY_ID']}/bucket/{file_key}"
-                photo_urls.append(photo_url)
-                
+            # Фото загружаются параллельно уже после фиксации, чтобы не держать слот во время загрузки
+            uploads = photo_uploads(booking_id, photos, tenant['storage_prefix'])
+            try:
+                storage.put_many(uploads)
+            except Exception:
+                # Компенсация: без фото заявка неполная — удаляем её и освобождаем слот
                 cur.execute("""
-                    INSERT INTO booking_photos (booking_id, photo_url)
-                    VALUES (%s, %s)
-                """, (booking_id, photo_url))
-            
-            conn.commit()
+                    WITH removed_photos AS (
+                        DELETE FROM booking_photos WHERE booking_id = %s AND slot_date = %s
+                    ), removed AS (
+                        DELETE FROM bookings WHERE id = %s AND slot_date = %s
+                        RETURNING slot_id
+                    )
+                    UPDATE time_slots SET is_available = true
+                    WHERE id IN (SELECT slot_id FROM removed) AND slot_date = %s
+                """, (booking_id, slot_date, booking_id, slot_date, slot_date))
+                conn.commit()
+                publish_later(tenant, conn)
+                storage.delete_prefixes([f"{tenant['storage_prefix']}bookings/{booking_id}/"])
+                raise
+            
+            photo_urls = [storage.public_url(key) for key, _, _ in uploads]
+            # HEAD по месяцам и PUT манифеста — в фоне, ответ заявки их не ждёт
+            publish_later(tenant, conn)
             
             return {
                 'statusCode': 201,
@@ -263,7 +293,14 @@ def handler(event: dict, context) -> dict:
                             token = cookie.split('=', 1)[1]
                             break
             
-            if not verify_admin_token(token):
+            # ?view=dashboard — слоты, заявки и сводка одним вызовом: проверка токена и все чтения
+            # идут на одном соединении и видят один снимок базы
+            dashboard_view = params.get('view') == 'dashboard'
+            if dashboard_view:
+                cur.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ, READ ONLY")
+            
+            tenant_id = admin_tenant(token, cur if dashboard_view else None)
+            if not tenant_id:
                 return {
                     'statusCode': 401,
                     'headers': {
@@ -276,54 +313,63 @@ def handler(event: dict, context) -> dict:
                     'isBase64Encoded': False
                 }
             
-            cur.execute("""
-                SELECT b.id, b.client_name, b.client_contact, 
-                       b.booking_type, b.comment, b.payment_status,
-                       ts.slot_date, ts.slot_time, b.receipt_url, b.created_at
-                FROM bookings b
-                JOIN time_slots ts ON b.slot_id = ts.id
-                ORDER BY b.created_at DESC
-                LIMIT 50
-            """)
-            
-            bookings = cur.fetchall()
-            result = []
+            if dashboard_view:
+                return compress_response(event, {
+                    'statusCode': 200,
+                    'headers': {
+                        'Content-Type': 'application/json',
+                        'Access-Control-Allow-Origin': frontend_domain,
+                        'Access-Control-Allow-Credentials': 'true',
+                        **SECURITY_HEADERS
+                    },
+                    'body': json.dumps(dashboard(cur, tenant_id)),
+                    'isBase64Encoded': False
+                })
             
-            for row in bookings:
-                booking_id = row[0]
-                
-                cur.execute("""
-                    SELECT photo_url FROM booking_photos 
-                    WHERE booking_id = %s
-                """, (booking_id,))
-                
-                photos = [photo[0] for photo in cur.fetchall()]
+            # ?since=<курсор> — только изменения после прошлого опроса вместо полного списка
+            if 'since' in params:
+                since = parse_cursor(params.get('since'))
+                if not since:
+                    return {
+                        'statusCode': 400,
+                        'headers': {
+                            'Content-Type': 'application/json',
+                            'Access-Control-Allow-Origin': frontend_domain,
+                            'Access-Control-Allow-Credentials': 'true',
+                            **SECURITY_HEADERS
+                        },
+                        'body': json.dumps({'error': 'Некорректный курсор'}),
+                        'isBase64Encoded': False
+                    }
                 
-                result.append({
-                    'id': booking_id,
-                    'name': row[1],
-                    'contact': row[2],
-                    'type': row[3],
-                    'comment': row[4],
-                    'payment_status': row[5],
-                    'date': row[6].isoformat(),
-                    'time': str(row[7]),
-                    'receipt_url': row[8],
-                    'created_at': row[9].isoformat() if row[9] else None,
-                    'photos': photos
+                return compress_response(event, {
+                    'statusCode': 200,
+                    'headers': {
+                        'Content-Type': 'application/json',
+                        'Access-Control-Allow-Origin': frontend_domain,
+                        'Access-Control-Allow-Credentials': 'true',
+                        **SECURITY_HEADERS
+                    },
+                    'body': json.dumps(changes_since(cur, tenant_id, since)),
+                    'isBase64Encoded': False
                 })
             
-            return {
+            cursor = sync_cursor(cur)
+            result = list_bookings(cur, tenant_id)
+            
+            return compress_response(event, {
                 'statusCode': 200,
                 'headers': {
                     'Content-Type': 'application/json',
                     'Access-Control-Allow-Origin': frontend_domain,
                     'Access-Control-Allow-Credentials': 'true',
+                    'Access-Control-Expose-Headers': 'X-Sync-Cursor',
+                    'X-Sync-Cursor': cursor.isoformat(),
                     **SECURITY_HEADERS
                 },
                 'body': json.dumps(result),
                 'isBase64Encoded': False
-            }
+            })
         
         elif method == 'DELETE':
             # Получаем токен из заголовка X-Admin-Token или из cookie
@@ -338,7 +384,8 @@ def handler(event: dict, context) -> dict:
                             token = cookie.split('=', 1)[1]
                             break
             
-            if not verify_admin_token(token):
+            tenant_id = admin_tenant(token, cur)
+            if not tenant_id:
                 return {
                     'statusCode': 401,
                     'headers': {
@@ -367,7 +414,7 @@ def handler(event: dict, context) -> dict:
                     'isBase64Encoded': False
                 }
             
-            cur.execute("SELECT slot_id FROM bookings WHERE id = %s", (booking_id,))
+            cur.execute("SELECT slot_id, slot_date FROM bookings WHERE id = %s AND tenant_id = %s", (booking_id, tenant_id))
             result = cur.fetchone()
             
             if not result:
@@ -383,13 +430,14 @@ def handler(event: dict, context) -> dict:
                     'isBase64Encoded': False
                 }
             
-            slot_id = result[0]
+            slot_id, slot_date = result
             
-            cur.execute("DELETE FROM booking_photos WHERE booking_id = %s", (booking_id,))
-            cur.execute("DELETE FROM bookings WHERE id = %s", (booking_id,))
-            cur.execute("UPDATE time_slots SET is_available = true WHERE id = %s", (slot_id,))
+            cur.execute("DELETE FROM booking_photos WHERE booking_id = %s AND slot_date = %s", (booking_id, slot_date))
+            cur.execute("DELETE FROM bookings WHERE id = %s AND slot_date = %s", (booking_id, slot_date))
+            cur.execute("UPDATE time_slots SET is_available = true WHERE id = %s AND slot_date = %s", (slot_id, slot_date))
             
             conn.commit()
+            publish_availability(conn, get_storage(), tenant_by_id(tenant_id, cur))
             
             return {
                 'statusCode': 200,
@@ -419,6 +467,7 @@ def handler(event: dict, context) -> dict:
     except Exception as e:
         if conn:
             conn.rollback()
+        print(json.dumps({'event': 'error', 'function': 'bookings', 'method': method, 'error': repr(e)}, ensure_ascii=False))
         return {
             'statusCode': 500,
             'headers': {
@@ -427,9 +476,11 @@ def handler(event: dict, context) -> dict:
                 'Access-Control-Allow-Credentials': 'true',
                 **SECURITY_HEADERS
             },
-            'body': json.dumps({'error': str(e)}),
+            'body': json.dumps({'error': 'Внутренняя ошибка, попробуйте позже'}),
             'isBase64Encoded': False
         }
     finally:
         cur.close()
-        conn.close()
\ No newline at end of file
+        release(conn)
+        if admitted:
+            ADMISSION.release()
\ No newline at end of file
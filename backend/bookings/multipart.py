@@ -0,0 +1,129 @@
+import base64
+import binascii
+import re
+
+# Текстовые поля формы (имя, контакт, комментарий) не бывают большими
+MAX_FIELD_SIZE = 64 * 1024
+MAX_FIELDS = 20
+
+_PARAM = re.compile(r';\s*([\w*-]+)\s*=\s*("(?:[^"\\]|\\.)*"|[^;]*)')
+
+
+class MultipartError(Exception):
+    """Ошибка разбора multipart/form-data с HTTP-статусом для ответа"""
+
+    def __init__(self, status_code: int, message: str):
+        super().__init__(message)
+        self.status_code = status_code
+        self.message = message
+
+
+def _header(event: dict, name: str) -> str:
+    for key, value in (event.get('headers') or {}).items():
+        if key.lower() == name:
+            return value or ''
+    return ''
+
+
+def _params(value: str) -> dict:
+    params = {}
+    for key, raw in _PARAM.findall(value):
+        raw = raw.strip()
+        if raw.startswith('"') and raw.endswith('"'):
+            raw = re.sub(r'\\(.)', r'\1', raw[1:-1])
+        params[key.lower()] = raw
+    return params
+
+
+def form_boundary(event: dict):
+    """Граница частей, если тело запроса — multipart/form-data, иначе None"""
+    content_type = _header(event, 'content-type')
+    if content_type.split(';', 1)[0].strip().lower() != 'multipart/form-data':
+        return None
+    boundary = _params(content_type).get('boundary')
+    if not boundary or len(boundary) > 70:
+        raise MultipartError(400, 'Некорректная граница multipart')
+    return boundary.encode('latin-1')
+
+
+def event_bytes(event: dict) -> bytes:
+    """Тело события в байтах: двоичные тела шлюз передаёт в base64"""
+    body = event.get('body') or ''
+    if event.get('isBase64Encoded'):
+        try:
+            return base64.b64decode(body)
+        except (binascii.Error, ValueError):
+            raise MultipartError(400, 'Некорректное тело запроса')
+    return body.encode('utf-8')
+
+
+def _part_headers(raw: bytes) -> dict:
+    headers = {}
+    for line in raw.decode('utf-8', 'replace').split('\r\n'):
+        if ':' in line:
+            key, value = line.split(':', 1)
+            headers[key.strip().lower()] = value.strip()
+    return headers
+
+
+def iter_parts(body: bytes, boundary: bytes, max_file_size: int, max_files: int):
+    """Идёт по частям тела по очереди: (имя поля, имя файла или None, content-type, байты).
+
+    Конец части ищется только в пределах лимита размера, поэтому слишком большой файл
+    или лишний файл отклоняются сразу, без просмотра остатка тела.
+    """
+    delimiter = b'\r\n--' + boundary
+    # Первая граница может стоять в самом начале тела, без предшествующего CRLF
+    position = body.find(delimiter[2:])
+    if position == -1:
+        raise MultipartError(400, 'В теле нет частей multipart')
+    position += len(delimiter) - 2
+
+    files = 0
+    fields = 0
+    while True:
+        if body.startswith(b'--', position):
+            return
+        if not body.startswith(b'\r\n', position):
+            raise MultipartError(400, 'Некорректная граница multipart')
+
+        headers_end = body.find(b'\r\n\r\n', position + 2, position + 2 + 8 * 1024)
+        if headers_end == -1:
+            raise MultipartError(400, 'Некорректные заголовки части multipart')
+        headers = _part_headers(body[position + 2:headers_end])
+        disposition = _params(headers.get('content-disposition', ''))
+        name = disposition.get('name', '')
+        filename = disposition.get('filename')
+
+        if filename is not None:
+            files += 1
+            if files > max_files:
+                raise MultipartError(400, f'Максимум {max_files} файлов')
+            limit = max_file_size
+        else:
+            fields += 1
+            if fields > MAX_FIELDS:
+                raise MultipartError(400, 'Слишком много полей формы')
+            limit = MAX_FIELD_SIZE
+
+        data_start = headers_end + 4
+        data_end = body.find(delimiter, data_start, data_start + limit + len(delimiter))
+        if data_end == -1:
+            if filename is not None and len(body) - data_start > limit:
+                raise MultipartError(413, f'Файл {files} слишком большой (максимум {max_file_size // (1024 * 1024)}MB)')
+            raise MultipartError(400, 'Тело multipart оборвано или поле слишком длинное')
+
+        yield name, filename, headers.get('content-type', ''), body[data_start:data_end]
+        position = data_end + len(delimiter)
+
+
+def parse_form(event: dict, boundary: bytes, max_file_size: int, max_files: int) -> tuple:
+    """Поля формы {имя: строка} и файлы [(имя поля, байты), ...] в порядке следования"""
+    fields = {}
+    files = []
+    for name, filename, _, data in iter_parts(event_bytes(event), boundary, max_file_size, max_files):
+        if filename is not None:
+            files.append((name, data))
+        else:
+            fields[name] = data.decode('utf-8', 'replace')
+    return fields, files
@@ -0,0 +1,79 @@
+import base64
+import binascii
+
+MAX_PHOTOS = 3
+MAX_PHOTO_SIZE = 5 * 1024 * 1024
+
+VALID_IMAGE_SIGNATURES = {
+    b'\xff\xd8\xff': ('image/jpeg', 'jpg'),
+    b'\x89PNG\r\n\x1a\n': ('image/png', 'png'),
+    b'GIF87a': ('image/gif', 'gif'),
+    b'GIF89a': ('image/gif', 'gif'),
+    b'RIFF': ('image/webp', 'webp')
+}
+
+
+class PhotoError(Exception):
+    """Ошибка проверки фото с HTTP-статусом для ответа"""
+
+    def __init__(self, status_code: int, message: str):
+        super().__init__(message)
+        self.status_code = status_code
+        self.message = message
+
+
+def sniff_image_type(photo_bytes: bytes):
+    """Определяет (content-type, расширение) по сигнатуре файла"""
+    for signature, image_type in VALID_IMAGE_SIGNATURES.items():
+        if photo_bytes.startswith(signature):
+            return image_type
+    return None
+
+
+def validate_photos(photos_bytes: list) -> list:
+    """Проверяет размер и формат фото: [(байты, (content-type, расширение)), ...]"""
+    if len(photos_bytes) > MAX_PHOTOS:
+        raise PhotoError(400, f'Максимум {MAX_PHOTOS} фото')
+
+    photos = []
+    for idx, photo_bytes in enumerate(photos_bytes):
+        if len(photo_bytes) > MAX_PHOTO_SIZE:
+            raise PhotoError(413, f'Фото {idx + 1} слишком большое (максимум 5MB)')
+
+        image_type = sniff_image_type(photo_bytes)
+        if not image_type:
+            raise PhotoError(400, f'Файл {idx + 1} не является изображением')
+
+        photos.append((photo_bytes, image_type))
+
+    return photos
+
+
+def decode_photos(photos_base64: list) -> list:
+    """Декодирует фото из base64 (или data URL) и проверяет их, как validate_photos"""
+    if len(photos_base64) > MAX_PHOTOS:
+        raise PhotoError(400, f'Максимум {MAX_PHOTOS} фото')
+
+    photos_bytes = []
+    for idx, photo_data in enumerate(photos_base64):
+        if photo_data.startswith('data:image'):
+            photo_data = photo_data.split(',', 1)[-1]
+        try:
+            photos_bytes.append(base64.b64decode(photo_data, validate=True))
+        except (binascii.Error, ValueError):
+            raise PhotoError(400, f'Фото {idx + 1}: некорректные данные')
+
+    return validate_photos(photos_bytes)
+
+
+def photo_suffixes(photos: list) -> list:
+    """Часть ключа фото после id заявки: ['/photo_0.jpg', ...]"""
+    return [f'/photo_{idx}.{extension}' for idx, (_, (_, extension)) in enumerate(photos)]
+
+
+def photo_uploads(booking_id: int, photos: list, prefix: str = '') -> list:
+    """Ключи и содержимое для загрузки: [(ключ, байты, content-type), ...]; prefix — префикс арендатора"""
+    return [
+        (f'{prefix}bookings/{booking_id}{suffix}', photo_bytes, content_type)
+        for suffix, (photo_bytes, (content_type, _)) in zip(photo_suffixes(photos), photos)
+    ]
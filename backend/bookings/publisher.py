@@ -0,0 +1,54 @@
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from availability import mark_dirty, publish_availability, snapshots_enabled
+from db import acquire, release
+from storage import get_storage
+
+# Один фоновый поток на экземпляр: публикация держит не больше одного соединения из пула
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='availability')
+_pending = set()
+_pending_lock = threading.Lock()
+
+
+def _publish(tenant: dict):
+    with _pending_lock:
+        _pending.discard(tenant['id'])
+    conn = None
+    try:
+        conn = acquire()
+        publish_availability(conn, get_storage(), tenant)
+    except Exception as e:
+        # Признак устаревания остался в базе: снимок перестроит следующая публикация или cleanup
+        print(json.dumps({'event': 'availability_publish_failed', 'error': repr(e)}, ensure_ascii=False))
+    finally:
+        release(conn)
+
+
+def publish_later(tenant: dict, conn=None):
+    """Отмечает снимок арендатора устаревшим и публикует его в фоне, не задерживая ответ заявки.
+
+    Признак ставится синхронно (на соединении запроса, если оно передано), поэтому даже если
+    экземпляр заморозят до конца фоновой публикации, изменение подхватит следующий публикатор.
+    """
+    if not snapshots_enabled():
+        return
+
+    own = conn is None
+    if own:
+        conn = acquire()
+    cur = conn.cursor()
+    try:
+        mark_dirty(cur, tenant['id'])
+        conn.commit()
+    finally:
+        cur.close()
+        if own:
+            release(conn)
+
+    # Задача на арендатора ставится одна: пока она в очереди, новые записи видны ей через признак
+    with _pending_lock:
+        if tenant['id'] in _pending:
+            return
+        _pending.add(tenant['id'])
+    _executor.submit(_publish, tenant)
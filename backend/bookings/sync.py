@@ -0,0 +1,120 @@
+import os
+from datetime import datetime, timedelta
+
+# Фото собираются в массив тем же запросом, а не отдельным запросом на каждую заявку
+BOOKING_SELECT = """
+    SELECT b.id, b.client_name, b.client_contact,
+           b.booking_type, b.comment, b.payment_status,
+           ts.slot_date, ts.slot_time, b.receipt_url, b.created_at,
+           ARRAY(
+               SELECT p.photo_url FROM booking_photos p
+               WHERE p.booking_id = b.id AND p.slot_date = b.slot_date
+               ORDER BY p.id
+           )
+    FROM bookings b
+    JOIN time_slots ts ON b.slot_id = ts.id AND b.slot_date = ts.slot_date
+"""
+
+
+def tombstone_days() -> int:
+    return int(os.environ.get('SYNC_TOMBSTONE_DAYS', '7'))
+
+
+def overlap() -> timedelta:
+    # Транзакция могла записать строку раньше, а зафиксироваться позже выданного курсора:
+    # такие строки подхватываются повторно в пределах окна
+    return timedelta(seconds=float(os.environ.get('SYNC_OVERLAP_SECONDS', '5')))
+
+
+def booking_to_dict(row) -> dict:
+    return {
+        'id': row[0],
+        'name': row[1],
+        'contact': row[2],
+        'type': row[3],
+        'comment': row[4],
+        'payment_status': row[5],
+        'date': row[6].isoformat(),
+        'time': str(row[7]),
+        'receipt_url': row[8],
+        'created_at': row[9].isoformat() if row[9] else None,
+        'photos': list(row[10] or [])
+    }
+
+
+def slot_to_dict(row) -> dict:
+    return {
+        'id': row[0],
+        'date': row[1].isoformat(),
+        'time': str(row[2]),
+        'available': row[3]
+    }
+
+
+def sync_cursor(cur) -> datetime:
+    """Курсор берётся до чтения изменений, чтобы ничего не проскочить между запросами"""
+    cur.execute("SELECT clock_timestamp()::timestamp")
+    return cur.fetchone()[0]
+
+
+def parse_cursor(value: str):
+    try:
+        return datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def list_bookings(cur, tenant_id: int, limit: int = 50) -> list:
+    cur.execute(BOOKING_SELECT + """
+        WHERE b.tenant_id = %s
+        ORDER BY b.created_at DESC
+        LIMIT %s
+    """, (tenant_id, limit))
+    return [booking_to_dict(row) for row in cur.fetchall()]
+
+
+def changes_since(cur, tenant_id: int, since: datetime) -> dict:
+    """Заявки и слоты арендатора, созданные, изменённые или удалённые после курсора"""
+    cursor = sync_cursor(cur)
+
+    # Надгробия старше срока хранения уже удалены очисткой — клиенту нужна полная загрузка
+    if since < cursor - timedelta(days=tombstone_days()):
+        return {'cursor': cursor.isoformat(), 'reset': True}
+
+    since = since - overlap()
+
+    cur.execute(BOOKING_SELECT + """
+        WHERE b.tenant_id = %s AND (
+            b.updated_at > %s
+            OR b.id IN (SELECT booking_id FROM booking_photos WHERE tenant_id = %s AND updated_at > %s)
+            OR b.id IN (
+                SELECT parent_id FROM sync_tombstones
+                WHERE tenant_id = %s AND table_name = 'booking_photos' AND deleted_at > %s
+            )
+        )
+        ORDER BY b.created_at DESC
+    """, (tenant_id, since, tenant_id, since, tenant_id, since))
+    bookings = [booking_to_dict(row) for row in cur.fetchall()]
+
+    cur.execute("""
+        SELECT id, slot_date, slot_time, is_available
+        FROM time_slots
+        WHERE tenant_id = %s AND updated_at > %s AND slot_date >= CURRENT_DATE
+        ORDER BY slot_date, slot_time
+    """, (tenant_id, since))
+    slots = [slot_to_dict(row) for row in cur.fetchall()]
+
+    cur.execute("""
+        SELECT DISTINCT table_name, row_id FROM sync_tombstones
+        WHERE tenant_id = %s AND deleted_at > %s AND table_name IN ('bookings', 'time_slots')
+    """, (tenant_id, since))
+    deleted = cur.fetchall()
+
+    return {
+        'cursor': cursor.isoformat(),
+        'reset': False,
+        'bookings': bookings,
+        'deleted_bookings': [row_id for table_name, row_id in deleted if table_name == 'bookings'],
+        'slots': slots,
+        'deleted_slots': [row_id for table_name, row_id in deleted if table_name == 'time_slots']
+    }
@@ -0,0 +1,88 @@
+import os
+import threading
+import time
+from db import acquire, release, execute, register
+
+DEFAULT_TENANT = 'default'
+
+TENANT_COLUMNS = "id, slug, telegram_chat_id, admin_password_hash, storage_prefix"
+
+register('tenant_by_slug', f"SELECT {TENANT_COLUMNS} FROM tenants WHERE slug = %s")
+register('tenant_by_id', f"SELECT {TENANT_COLUMNS} FROM tenants WHERE id = %s")
+
+# Настройки арендаторов меняются редко: держим их в памяти экземпляра, а не читаем на каждый запрос
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+def cache_seconds() -> float:
+    return float(os.environ.get('TENANT_CACHE_SECONDS', '60'))
+
+
+def _to_tenant(row) -> dict:
+    tenant_id, slug, telegram_chat_id, admin_password_hash, storage_prefix = row
+    # Переменные окружения — настройки только основного мастера, другим арендаторам они не достаются
+    is_default = slug == DEFAULT_TENANT
+    return {
+        'id': tenant_id,
+        'slug': slug,
+        'telegram_chat_id': telegram_chat_id or (os.environ.get('TELEGRAM_CHAT_ID') if is_default else None),
+        'admin_password_hash': admin_password_hash or (os.environ.get('ADMIN_PASSWORD_HASH', '') if is_default else ''),
+        'storage_prefix': storage_prefix or '',
+        'is_default': is_default
+    }
+
+
+def _load(statement: str, key, cur=None):
+    cache_key = (statement, key)
+    now = time.monotonic()
+    with _cache_lock:
+        cached = _cache.get(cache_key)
+        if cached and cached[0] > now:
+            return cached[1]
+
+    conn = None
+    if cur is None:
+        conn = acquire(readonly=True)
+        cur = conn.cursor()
+    try:
+        execute(cur, statement, (key,))
+        row = cur.fetchone()
+    finally:
+        if conn is not None:
+            cur.close()
+            release(conn)
+
+    # Неизвестные значения не кэшируем: перебор имён не должен раздувать кэш
+    if not row:
+        return None
+
+    tenant = _to_tenant(row)
+    with _cache_lock:
+        _cache[cache_key] = (now + cache_seconds(), tenant)
+    return tenant
+
+
+def tenant_slug(event: dict) -> str:
+    """Арендатор публичного запроса: ?tenant=<slug> или заголовок X-Tenant, иначе основной мастер"""
+    params = event.get('queryStringParameters') or {}
+    headers = event.get('headers') or {}
+    return params.get('tenant') or headers.get('X-Tenant') or headers.get('x-tenant') or DEFAULT_TENANT
+
+
+def resolve_tenant(event: dict, cur=None):
+    """Настройки арендатора запроса или None, если такого нет.
+
+    Без курсора при промахе кэша берётся отдельное соединение с реплики.
+    """
+    return _load('tenant_by_slug', tenant_slug(event), cur)
+
+
+def tenant_by_id(tenant_id: int, cur=None):
+    return _load('tenant_by_id', tenant_id, cur)
+
+
+def list_tenants(cur) -> list:
+    """Все арендаторы — для фоновых задач, которые обходят каждого"""
+    cur.execute(f"SELECT {TENANT_COLUMNS} FROM tenants ORDER BY id")
+    return [_to_tenant(row) for row in cur.fetchall()]
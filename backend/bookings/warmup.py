@@ -0,0 +1,128 @@
+import hmac
+import json
+import os
+import time
+from db import QUERIES, acquire, release, prepare
+
+try:
+    from storage import get_storage
+except ImportError:
+    get_storage = None
+
+
+def is_warmup(event: dict) -> bool:
+    """Прогрев запрашивается внутренним вызовом {"warmup": true}, таймер-триггером с payload warmup
+    или HTTP-запросом с заголовком X-Warmup, равным секрету WARMUP_TOKEN.
+
+    Без WARMUP_TOKEN заголовок не действует: иначе любой мог бы гонять прогрев через публичный URL.
+    """
+    if 'httpMethod' not in event:
+        if event.get('warmup') is True:
+            return True
+        for message in event.get('messages') or []:
+            if (message.get('details') or {}).get('payload') == 'warmup':
+                return True
+        return False
+
+    secret = os.environ.get('WARMUP_TOKEN', '')
+    if not secret:
+        return False
+    for key, value in (event.get('headers') or {}).items():
+        if key.lower() == 'x-warmup' and value and hmac.compare_digest(value, secret):
+            return True
+    return False
+
+
+def warm_db(readonly: bool = False) -> dict:
+    """Открывает соединение из пула, проверяет его и подготавливает все зарегистрированные запросы функции"""
+    conn = acquire(readonly=readonly)
+    try:
+        cur = conn.cursor()
+        cur.execute("SELECT 1")
+        cur.fetchone()
+        for name in QUERIES:
+            prepare(cur, name)
+        cur.close()
+        return {'replica': conn.replica, 'prepared': sorted(QUERIES)}
+    finally:
+        release(conn)
+
+
+def warm_replica() -> dict:
+    if not os.environ.get('DATABASE_READONLY_URL'):
+        return {'skipped': 'DATABASE_READONLY_URL не задан'}
+    return warm_db(readonly=True)
+
+
+def warm_storage() -> dict:
+    """Создаёт клиент хранилища (импорт boto3) и открывает TLS-соединение к бакету"""
+    storage = get_storage()
+    storage.head('warmup/ping')
+    return {'backend': type(storage).__name__}
+
+
+def call_handler(handler, event: dict, context) -> int:
+    """Вызывает обработчик с обычным событием, чтобы заполнить его кэши; ответ 5xx считается ошибкой шага"""
+    response = handler(event, context)
+    if response['statusCode'] >= 500:
+        raise RuntimeError(response.get('body'))
+    return response['statusCode']
+
+
+def _record(report: dict, name: str, started: float, detail=None, error=None):
+    entry = {'step': name, 'ok': error is None}
+    if error is not None:
+        entry['error'] = repr(error)
+        report['ok'] = False
+    elif detail is not None:
+        entry['detail'] = detail
+    entry['ms'] = round((time.perf_counter() - started) * 1000, 1)
+    report['steps'].append(entry)
+
+
+def _log(report: dict):
+    print(json.dumps({'event': 'warmup', **report}, ensure_ascii=False))
+
+
+def warm_up(function_name: str, extra_steps: list = ()) -> dict:
+    """Выполняет шаги прогрева по очереди; ошибка шага не прерывает остальные.
+
+    Время и ошибки шагов пишутся в лог, вызывающему возвращается только итог.
+    """
+    steps = [('db', warm_db), ('db_replica', warm_replica)]
+    if get_storage is not None:
+        steps.append(('storage', warm_storage))
+    steps.extend(extra_steps)
+
+    report = {'function': function_name, 'warmup': True, 'ok': True, 'steps': []}
+    started = time.perf_counter()
+
+    for name, step in steps:
+        step_started = time.perf_counter()
+        try:
+            _record(report, name, step_started, detail=step())
+        except Exception as e:
+            _record(report, name, step_started, error=e)
+
+    report['total_ms'] = round((time.perf_counter() - started) * 1000, 1)
+    _log(report)
+    return {'function': function_name, 'warmup': True, 'ok': report['ok']}
+
+
+async def warm_up_async(response: dict, steps: list) -> dict:
+    """Дополняет итог синхронного прогрева шагами асинхронного варианта: пул asyncpg, клиенты aio"""
+    result = json.loads(response['body'])
+    report = {'function': result['function'], 'warmup': True, 'variant': 'async', 'ok': True, 'steps': []}
+    started = time.perf_counter()
+
+    for name, step in steps:
+        step_started = time.perf_counter()
+        try:
+            _record(report, name, step_started, detail=await step())
+        except Exception as e:
+            _record(report, name, step_started, error=e)
+
+    report['total_ms'] = round((time.perf_counter() - started) * 1000, 1)
+    _log(report)
+    result['ok'] = result['ok'] and report['ok']
+    return {**response, 'statusCode': 200 if result['ok'] else 503, 'body': json.dumps(result)}
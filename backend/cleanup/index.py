@@ -1,8 +1,21 @@
+import hmac
 import json
 import os
 import psycopg2
-import boto3
+import psycopg2.errors
+from availability import prune_snapshots, publish_availability
+from db import acquire, release
+from storage import get_storage
+from tenants import DEFAULT_TENANT, list_tenants
+from reconcile import reconcile
+from retention import (
+    CHUNK_SIZE, TimeBudget, booking_prefixes, ensure_partitions, retirable_months,
+    partition_stats, bookings_after, load_checkpoint, save_checkpoint,
+    finish_checkpoint, retire_partition, prune_tombstones, preview
+)
 from datetime import datetime, timedelta
+from profiling import profiled
+from warmup import is_warmup, warm_up
 
 SECURITY_HEADERS = {
     'X-Frame-Options': 'DENY',
@@ -10,18 +23,57 @@ SECURITY_HEADERS = {
     'Content-Security-Policy': "default-src 'none'; script-src 'self'; connect-src 'self'; img-src 'self'; style-src 'self'"
 }
 
+MAX_CHUNK_SIZE = 1000
+
+# Файл, загруженный моложе этого, может принадлежать заявке, которая ещё не зафиксирована
+MIN_RECONCILE_GRACE_MINUTES = int(os.environ.get('RECONCILE_MIN_GRACE_MINUTES', '15'))
+
+def reconcile_authorized(event: dict, cur) -> bool:
+    """Сверять и удалять файлы может планировщик с секретом CLEANUP_TOKEN или администратор основного мастера"""
+    headers = event.get('headers') or {}
+    secret = os.environ.get('CLEANUP_TOKEN', '')
+    token = headers.get('X-Cleanup-Token') or headers.get('x-cleanup-token') or ''
+    if secret and token and hmac.compare_digest(token, secret):
+        return True
+    
+    admin_token = headers.get('X-Admin-Token') or headers.get('x-admin-token')
+    if not admin_token:
+        return False
+    cur.execute("""
+        SELECT 1 FROM admin_sessions s
+        JOIN tenants t ON t.id = s.tenant_id
+        WHERE s.token = %s AND s.expires_at > NOW() AND t.slug = %s
+    """, (admin_token, DEFAULT_TENANT))
+    return cur.fetchone() is not None
+
+@profiled('cleanup')
 def handler(event: dict, context) -> dict:
-    """Автоматическая очистка старых записей (старше 1 дня)"""
+    """Автоматическая очистка старых записей: отсоединение секций прошедших месяцев"""
     frontend_domain = os.environ.get('FRONTEND_DOMAIN', '*')
     method = event.get('httpMethod', 'POST')
     
+    # Прогрев после деплоя или простоя: пулы, клиенты и кэши создаются до прихода пользователей
+    if is_warmup(event):
+        report = warm_up('cleanup')
+        return {
+            'statusCode': 200 if report['ok'] else 503,
+            'headers': {
+                'Content-Type': 'application/json',
+                'Access-Control-Allow-Origin': frontend_domain,
+                'Access-Control-Allow-Credentials': 'true',
+                **SECURITY_HEADERS
+            },
+            'body': json.dumps(report),
+            'isBase64Encoded': False
+        }
+    
     if method == 'OPTIONS':
         return {
             'statusCode': 200,
             'headers': {
                 'Access-Control-Allow-Origin': frontend_domain,
                 'Access-Control-Allow-Methods': 'POST, OPTIONS',
-                'Access-Control-Allow-Headers': 'Content-Type',
+                'Access-Control-Allow-Headers': 'Content-Type, X-Admin-Token, X-Cleanup-Token',
                 'Access-Control-Allow-Credentials': 'true',
                 **SECURITY_HEADERS
             },
@@ -42,44 +94,208 @@ def handler(event: dict, context) -> dict:
             'isBase64Encoded': False
         }
     
+    conn = None
+    cur = None
+    
     try:
-        conn = psycopg2.connect(os.environ['DATABASE_URL'])
-        cur = conn.cursor()
+        data = json.loads(event.get('body') or '{}')
+        params = event.get('queryStringParameters') or {}
+        dry_run = str(data.get('dry_run', params.get('dry_run', ''))).lower() in ('1', 'true', 'yes')
         
-        cutoff_date = datetime.now() - timedelta(days=1)
+        # 0 или отрицательный размер порции дал бы пустую выборку и ложный отчёт «готово»;
+        # слишком большой по-прежнему урезается до MAX_CHUNK_SIZE
+        try:
+            chunk_size = min(int(data.get('chunk_size', params.get('chunk_size', CHUNK_SIZE))), MAX_CHUNK_SIZE)
+        except (TypeError, ValueError):
+            chunk_size = 0
+        if chunk_size < 1:
+            return {
+                'statusCode': 400,
+                'headers': {
+                    'Content-Type': 'application/json',
+                    'Access-Control-Allow-Origin': frontend_domain,
+                    'Access-Control-Allow-Credentials': 'true',
+                    **SECURITY_HEADERS
+                },
+                'body': json.dumps({'error': f'chunk_size должен быть от 1 до {MAX_CHUNK_SIZE}'}),
+                'isBase64Encoded': False
+            }
         
-        cur.execute("""
-            SELECT b.id, ts.id as slot_id
-            FROM bookings b
-            JOIN time_slots ts ON b.slot_id = ts.id
-            WHERE ts.slot_date < %s
-        """, (cutoff_date.date(),))
+        budget = TimeBudget(
+            context,
+            default_ms=int(os.environ.get('CLEANUP_TIME_BUDGET_MS', '25000')),
+            reserve_ms=int(os.environ.get('CLEANUP_TIME_RESERVE_MS', '5000'))
+        )
         
-        old_bookings = cur.fetchall()
-        deleted_count = 0
+        conn = acquire()
+        cur = conn.cursor()
         
-        s3 = boto3.client('s3',
-            endpoint_url='https://bucket.poehali.dev',
-            aws_access_key_id=os.environ['AWS_ACCESS_KEY_ID'],
-            aws_secret_access_key=os.environ['AWS_SECRET_ACCESS_KEY']
-        )
+        storage = get_storage()
         
-        for booking_id, slot_id in old_bookings:
+        if data.get('action', params.get('action')) == 'reconcile':
+            # Отчёт тоже закрыт: в нём ключи файлов удалённых заявок (фото, чеки), а сам проход
+            # сканирует бакет каждого арендатора
+            delete = str(data.get('delete', params.get('delete', ''))).lower() in ('1', 'true', 'yes')
+            if not reconcile_authorized(event, cur):
+                return {
+                    'statusCode': 401,
+                    'headers': {
+                        'Content-Type': 'application/json',
+                        'Access-Control-Allow-Origin': frontend_domain,
+                        'Access-Control-Allow-Credentials': 'true',
+                        **SECURITY_HEADERS
+                    },
+                    'body': json.dumps({'error': 'Неавторизован'}),
+                    'isBase64Encoded': False
+                }
+            
             try:
-                s3.delete_object(Bucket='files', Key=f'bookings/{booking_id}/')
-                s3.delete_object(Bucket='files', Key=f'receipts/{booking_id}/')
-            except Exception:
-                pass
+                grace_minutes = int(data.get('grace_minutes', params.get('grace_minutes', 60)))
+            except (TypeError, ValueError):
+                return {
+                    'statusCode': 400,
+                    'headers': {
+                        'Content-Type': 'application/json',
+                        'Access-Control-Allow-Origin': frontend_domain,
+                        'Access-Control-Allow-Credentials': 'true',
+                        **SECURITY_HEADERS
+                    },
+                    'body': json.dumps({'error': 'Некорректный grace_minutes'}),
+                    'isBase64Encoded': False
+                }
+            
+            report = reconcile(
+                cur, storage,
+                budget=budget,
+                tenant_prefixes=[tenant['storage_prefix'] for tenant in list_tenants(cur)],
+                cursor=data.get('cursor', params.get('cursor', '')),
+                delete=delete,
+                grace_minutes=max(grace_minutes, MIN_RECONCILE_GRACE_MINUTES)
+            )
+            conn.rollback()
+            
+            return {
+                'statusCode': 200,
+                'headers': {
+                    'Content-Type': 'application/json',
+                    'Access-Control-Allow-Origin': frontend_domain,
+                    'Access-Control-Allow-Credentials': 'true',
+                    **SECURITY_HEADERS
+                },
+                'body': json.dumps({
+                    'message': f"Найдено {report['orphans']} файлов без заявок",
+                    **report
+                }),
+                'isBase64Encoded': False
+            }
+        
+        keep_history = os.environ.get('RETENTION_MODE', 'drop') == 'archive'
+        
+        if dry_run:
+            cutoff_date = (datetime.now() - timedelta(days=1)).date()
+            would_delete = preview(cur, storage, cutoff_date, keep_history, budget)
+            conn.rollback()
+            
+            return {
+                'statusCode': 200,
+                'headers': {
+                    'Content-Type': 'application/json',
+                    'Access-Control-Allow-Origin': frontend_domain,
+                    'Access-Control-Allow-Credentials': 'true',
+                    **SECURITY_HEADERS
+                },
+                'body': json.dumps({
+                    'message': f"Будет удалено {would_delete['bookings']} старых записей",
+                    'dry_run': True,
+                    'deleted': 0,
+                    'mode': 'archive' if keep_history else 'drop',
+                    'would_delete': would_delete,
+                    'cutoff_date': cutoff_date.isoformat()
+                }),
+                'isBase64Encoded': False
+            }
+        
+        partitions_created = ensure_partitions(cur, datetime.now().date())
+        checkpoint = load_checkpoint(cur, (datetime.now() - timedelta(days=1)).date())
+        conn.commit()
+        cutoff_date = checkpoint['cutoff_date']
+        
+        totals = {
+            'deleted': 0,
+            'slots_deleted': 0,
+            'photos_deleted': 0,
+            'objects_deleted': 0,
+            'bytes_freed': 0,
+            'storage_errors': []
+        }
+        partitions_retired = []
+        
+        has_more = False
+        for month_start in retirable_months(cur, cutoff_date):
+            conn.rollback()
             
-            cur.execute("DELETE FROM booking_photos WHERE booking_id = %s", (booking_id,))
-            cur.execute("DELETE FROM bookings WHERE id = %s", (booking_id,))
-            cur.execute("DELETE FROM time_slots WHERE id = %s", (slot_id,))
+            # При архивировании файлы остаются вместе с историей, иначе удаляем их до отсоединения секции
+            if not keep_history:
+                last_booking_id = 0
+                if checkpoint['partition_month'] == month_start:
+                    last_booking_id = checkpoint['last_booking_id']
+                
+                while not budget.exhausted():
+                    bookings = bookings_after(cur, month_start, last_booking_id, chunk_size)
+                    if not bookings:
+                        break
+                    
+                    result = storage.delete_prefixes(booking_prefixes(bookings))
+                    totals['objects_deleted'] += result['objects_deleted']
+                    totals['bytes_freed'] += result['bytes_freed']
+                    totals['storage_errors'].extend(result['errors'])
+                    
+                    last_booking_id = bookings[-1][0]
+                    save_checkpoint(cur, month_start, last_booking_id)
+                    conn.commit()
+                else:
+                    has_more = True
+                    break
             
-            deleted_count += 1
+            if budget.exhausted():
+                has_more = True
+                break
+            
+            stats = partition_stats(cur, month_start)
+            try:
+                retire_partition(cur, month_start, keep_history)
+                save_checkpoint(cur, None, 0, stats['bookings'])
+                conn.commit()
+            except (psycopg2.errors.LockNotAvailable, psycopg2.errors.QueryCanceled):
+                # Таблицы заняты пользовательскими транзакциями — продолжим в следующий запуск
+                conn.rollback()
+                has_more = True
+                break
+            
+            partitions_retired.append(stats['month'])
+            totals['deleted'] += stats['bookings']
+            totals['slots_deleted'] += stats['slots']
+            totals['photos_deleted'] += stats['photos']
+        
+        if not has_more:
+            finish_checkpoint(cur)
+            conn.commit()
         
+        totals['tombstones_deleted'] = prune_tombstones(cur)
         conn.commit()
-        cur.close()
-        conn.close()
+        
+        # Раз в запуск снимки каждого мастера пересобираются: из них уходят прошедшие дни, старые версии удаляются
+        totals['snapshots_deleted'] = 0
+        tenants = list_tenants(cur)
+        conn.rollback()
+        for tenant in tenants:
+            manifest = publish_availability(conn, storage, tenant)
+            if manifest:
+                result = prune_snapshots(storage, manifest, tenant['storage_prefix'])
+                totals['snapshots_deleted'] += result['objects_deleted']
+                totals['storage_errors'].extend(result['errors'])
+        
+        deleted_count = totals['deleted']
         
         return {
             'statusCode': 200,
@@ -91,12 +307,19 @@ def handler(event: dict, context) -> dict:
             },
             'body': json.dumps({
                 'message': f'Удалено {deleted_count} старых записей',
-                'deleted': deleted_count
+                **totals,
+                'mode': 'archive' if keep_history else 'drop',
+                'partitions_retired': partitions_retired,
+                'partitions_created': partitions_created,
+                'has_more': has_more,
+                'cutoff_date': cutoff_date.isoformat()
             }),
             'isBase64Encoded': False
         }
         
     except Exception as e:
+        if conn:
+            conn.rollback()
         return {
             'statusCode': 500,
             'headers': {
@@ -108,3 +331,7 @@ def handler(event: dict, context) -> dict:
             'body': json.dumps({'error': str(e)}),
             'isBase64Encoded': False
         }
+    finally:
+        if cur:
+            cur.close()
+        release(conn)
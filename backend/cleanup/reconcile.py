@@ -0,0 +1,102 @@
+from datetime import datetime, timedelta, timezone
+
+RECONCILE_PREFIXES = ['bookings/', 'receipts/']
+ORPHAN_SAMPLE_SIZE = 50
+
+
+def booking_id_from_key(key: str):
+    """Достаёт ID заявки из ключа вида [префикс арендатора]bookings/{id}/... или receipts/{id}/..."""
+    parts = key.split('/')
+    for idx in range(len(parts) - 2):
+        if parts[idx] + '/' in RECONCILE_PREFIXES and parts[idx + 1].isdigit():
+            return int(parts[idx + 1])
+    return None
+
+
+def live_urls(cur, booking_ids: list) -> set:
+    """Все URL фото и чеков этих заявок, включая архивные секции, одним запросом"""
+    cur.execute("""
+        SELECT photo_url FROM booking_photos WHERE booking_id = ANY(%s)
+        UNION
+        SELECT photo_url FROM booking_photos_archive WHERE booking_id = ANY(%s)
+        UNION
+        SELECT receipt_url FROM bookings WHERE id = ANY(%s) AND receipt_url IS NOT NULL
+        UNION
+        SELECT receipt_url FROM bookings_archive WHERE id = ANY(%s) AND receipt_url IS NOT NULL
+    """, (booking_ids, booking_ids, booking_ids, booking_ids))
+    return {row[0] for row in cur.fetchall()}
+
+
+def find_orphans(cur, objects: list, public_url, grace: timedelta) -> dict:
+    """Сверяет страницу листинга с базой: {ключ: размер} для объектов без ссылок"""
+    threshold = datetime.now(timezone.utc) - grace
+    candidates = []
+
+    for obj in objects:
+        last_modified = obj.get('last_modified')
+        # Свежие объекты могут принадлежать ещё не закоммиченной заявке
+        if last_modified and last_modified > threshold:
+            continue
+        candidates.append(obj)
+
+    booking_ids = list({booking_id_from_key(obj['key']) for obj in candidates} - {None})
+    referenced = live_urls(cur, booking_ids) if booking_ids else set()
+
+    return {
+        obj['key']: obj['size']
+        for obj in candidates
+        if public_url(obj['key']) not in referenced
+    }
+
+
+def reconcile(cur, storage, budget, tenant_prefixes: list, cursor: str = '', delete: bool = False,
+              grace_minutes: int = 60) -> dict:
+    """Проходит по листингу бакета страницами и находит (и при желании удаляет) сирот"""
+    grace = timedelta(minutes=grace_minutes)
+    report = {
+        'scanned': 0,
+        'orphans': 0,
+        'orphan_bytes': 0,
+        'objects_deleted': 0,
+        'bytes_freed': 0,
+        'sample': [],
+        'storage_errors': [],
+        'has_more': False,
+        'next_cursor': ''
+    }
+
+    # Курсор — последний просмотренный ключ, поэтому префиксы обходятся в лексикографическом порядке
+    prefixes = sorted(tenant_prefix + prefix for tenant_prefix in tenant_prefixes for prefix in RECONCILE_PREFIXES)
+
+    for prefix in prefixes:
+        if cursor and cursor >= prefix and not cursor.startswith(prefix):
+            continue
+        start_after = cursor if cursor.startswith(prefix) else ''
+
+        for objects in storage.list(prefix, start_after):
+            if budget.exhausted():
+                report['has_more'] = True
+                return report
+
+            if not objects:
+                continue
+
+            orphans = find_orphans(cur, objects, storage.public_url, grace)
+            report['scanned'] += len(objects)
+            report['orphans'] += len(orphans)
+            report['orphan_bytes'] += sum(orphans.values())
+
+            free_slots = ORPHAN_SAMPLE_SIZE - len(report['sample'])
+            if free_slots > 0:
+                report['sample'].extend(list(orphans)[:free_slots])
+
+            if delete and orphans:
+                result = storage.delete_many(orphans)
+                report['objects_deleted'] += result['objects_deleted']
+                report['bytes_freed'] += result['bytes_freed']
+                report['storage_errors'].extend(result['errors'])
+
+            report['next_cursor'] = objects[-1]['key']
+
+    report['next_cursor'] = ''
+    return report
@@ -0,0 +1,188 @@
+import os
+import time
+from datetime import date
+
+JOB_NAME = 'retention'
+CHUNK_SIZE = 200
+MONTHS_AHEAD = 12
+LOCK_TIMEOUT = '2s'
+TOMBSTONE_DAYS = 7
+
+
+class TimeBudget:
+    """Следит за оставшимся временем выполнения функции"""
+
+    def __init__(self, context, default_ms: int, reserve_ms: int):
+        self.context = context
+        self.reserve_ms = reserve_ms
+        self.deadline = time.monotonic() + default_ms / 1000
+
+    def remaining_ms(self) -> int:
+        get_remaining = getattr(self.context, 'get_remaining_time_in_millis', None)
+        if callable(get_remaining):
+            return int(get_remaining())
+        return int((self.deadline - time.monotonic()) * 1000)
+
+    def exhausted(self) -> bool:
+        return self.remaining_ms() < self.reserve_ms
+
+
+def month_end(month_start: date) -> date:
+    """Первый день следующего месяца"""
+    if month_start.month == 12:
+        return date(month_start.year + 1, 1, 1)
+    return date(month_start.year, month_start.month + 1, 1)
+
+
+def booking_prefixes(bookings: list) -> list:
+    """Префиксы хранилища, в которых лежат файлы заявок: [(id заявки, префикс арендатора), ...]"""
+    prefixes = []
+    for booking_id, tenant_prefix in bookings:
+        prefixes.append(f'{tenant_prefix}bookings/{booking_id}/')
+        prefixes.append(f'{tenant_prefix}receipts/{booking_id}/')
+    return prefixes
+
+
+def ensure_partitions(cur, today: date) -> int:
+    """Заранее создаёт секции на год вперёд, чтобы вставки не падали"""
+    cur.execute("SELECT ensure_booking_partitions(%s, %s)", (today, MONTHS_AHEAD))
+    return cur.fetchone()[0]
+
+
+def retirable_months(cur, cutoff_date: date) -> list:
+    """Месяцы, все слоты которых старше даты отсечения"""
+    cur.execute("""
+        SELECT c.relname
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = 'time_slots'::regclass
+        ORDER BY c.relname
+    """)
+
+    months = []
+    for (relname,) in cur.fetchall():
+        year, month = relname[len('time_slots_p'):].split('_')
+        month_start = date(int(year), int(month), 1)
+        if month_end(month_start) <= cutoff_date:
+            months.append(month_start)
+    return months
+
+
+def partition_stats(cur, month_start: date) -> dict:
+    """Количество строк в секциях месяца (запросы отсекаются до одной секции)"""
+    bounds = (month_start, month_end(month_start))
+
+    cur.execute("SELECT COUNT(*) FROM bookings WHERE slot_date >= %s AND slot_date < %s", bounds)
+    bookings = cur.fetchone()[0]
+    cur.execute("SELECT COUNT(*) FROM time_slots WHERE slot_date >= %s AND slot_date < %s", bounds)
+    slots = cur.fetchone()[0]
+    cur.execute("SELECT COUNT(*) FROM booking_photos WHERE slot_date >= %s AND slot_date < %s", bounds)
+    photos = cur.fetchone()[0]
+
+    return {'month': month_start.isoformat(), 'bookings': bookings, 'slots': slots, 'photos': photos}
+
+
+def bookings_after(cur, month_start: date, last_booking_id: int, limit: int) -> list:
+    """Следующая порция заявок месяца, чьи файлы ещё не удалены: [(id, префикс арендатора), ...]"""
+    cur.execute("""
+        SELECT b.id, t.storage_prefix FROM bookings b
+        JOIN tenants t ON t.id = b.tenant_id
+        WHERE b.slot_date >= %s AND b.slot_date < %s AND b.id > %s
+        ORDER BY b.id
+        LIMIT %s
+    """, (month_start, month_end(month_start), last_booking_id, limit))
+    return cur.fetchall()
+
+
+def load_checkpoint(cur, cutoff_date: date) -> dict:
+    """Читает контрольную точку или создаёт новую с текущей датой отсечения"""
+    cur.execute("""
+        INSERT INTO cleanup_checkpoints (job, cutoff_date)
+        VALUES (%s, %s)
+        ON CONFLICT (job) DO NOTHING
+    """, (JOB_NAME, cutoff_date))
+
+    cur.execute("""
+        SELECT cutoff_date, partition_month, last_booking_id, bookings_deleted
+        FROM cleanup_checkpoints
+        WHERE job = %s
+    """, (JOB_NAME,))
+    row = cur.fetchone()
+
+    return {
+        'cutoff_date': row[0],
+        'partition_month': row[1],
+        'last_booking_id': row[2],
+        'bookings_deleted': row[3]
+    }
+
+
+def save_checkpoint(cur, partition_month, last_booking_id: int, deleted_delta: int = 0):
+    """Запоминает секцию и последнюю заявку, файлы которой уже удалены"""
+    cur.execute("""
+        UPDATE cleanup_checkpoints
+        SET partition_month = %s,
+            last_booking_id = %s,
+            bookings_deleted = bookings_deleted + %s,
+            updated_at = CURRENT_TIMESTAMP
+        WHERE job = %s
+    """, (partition_month, last_booking_id, deleted_delta, JOB_NAME))
+
+
+def finish_checkpoint(cur):
+    """Завершает запуск: следующий начнётся с новой датой отсечения"""
+    cur.execute("DELETE FROM cleanup_checkpoints WHERE job = %s", (JOB_NAME,))
+
+
+def prune_tombstones(cur) -> int:
+    """Удаляет надгробия синхронизации старше SYNC_TOMBSTONE_DAYS: клиенты с таким курсором загрузят всё заново"""
+    days = int(os.environ.get('SYNC_TOMBSTONE_DAYS', TOMBSTONE_DAYS))
+    cur.execute("DELETE FROM sync_tombstones WHERE deleted_at < now() - make_interval(days => %s)", (days,))
+    return cur.rowcount
+
+
+def retire_partition(cur, month_start: date, keep_history: bool):
+    """Отсоединяет секции месяца: O(1) вместо удаления строк"""
+    cur.execute(f"SET LOCAL lock_timeout = '{LOCK_TIMEOUT}'")
+    cur.execute("SELECT retire_booking_partition(%s, %s)", (month_start, keep_history))
+    # Отсоединение не вызывает триггеры удаления. При архивации заявки сохраняются,
+    # и сводка дашборда за месяц остаётся; при удалении чистим её сами
+    if not keep_history:
+        cur.execute("DELETE FROM booking_stats WHERE slot_date >= %s AND slot_date < %s",
+                    (month_start, month_end(month_start)))
+
+
+def preview(cur, storage, cutoff_date: date, keep_history: bool, budget: TimeBudget) -> dict:
+    """Считает, что будет отсоединено и удалено, ничего не меняя"""
+    partitions = [partition_stats(cur, month) for month in retirable_months(cur, cutoff_date)]
+
+    objects = 0
+    total_bytes = 0
+    storage_complete = True
+
+    if not keep_history:
+        for partition in partitions:
+            month_start = date.fromisoformat(partition['month'])
+            last_id = 0
+            while storage_complete:
+                bookings = bookings_after(cur, month_start, last_id, CHUNK_SIZE)
+                if not bookings:
+                    break
+                last_id = bookings[-1][0]
+                if budget.exhausted():
+                    storage_complete = False
+                    break
+                for obj, error in storage.list_prefixes(booking_prefixes(bookings)):
+                    if obj:
+                        objects += 1
+                        total_bytes += obj['size']
+
+    return {
+        'partitions': partitions,
+        'bookings': sum(p['bookings'] for p in partitions),
+        'slots': sum(p['slots'] for p in partitions),
+        'photos': sum(p['photos'] for p in partitions),
+        'objects': objects,
+        'bytes': total_bytes,
+        'storage_estimate_complete': storage_complete
+    }
@@ -0,0 +1,102 @@
+import asyncio
+import json
+import index
+from aio import get_pool
+from compact import COMPACT_MEDIA_TYPE, encode_slots, wants_compact
+from compression import compress_response
+from tenants import resolve_tenant
+from profiling import profiled
+from warmup import is_warmup, warm_up_async
+
+SECURITY_HEADERS = index.SECURITY_HEADERS
+
+SLOTS_QUERY = """
+    SELECT id, slot_date, slot_time, is_available
+    FROM time_slots
+    WHERE tenant_id = $1 AND slot_date >= CURRENT_DATE
+    ORDER BY slot_date, slot_time
+"""
+
+
+async def _warm_statements(*queries) -> dict:
+    """Открывает пул asyncpg и подготавливает горячие запросы на одном из его соединений"""
+    pool = await get_pool()
+    async with pool.acquire() as conn:
+        for query in queries:
+            await conn.prepare(query)
+    return {'prepared': len(queries)}
+
+
+def _json_response(status_code: int, payload) -> dict:
+    return {
+        'statusCode': status_code,
+        'headers': {
+            'Content-Type': 'application/json',
+            'Access-Control-Allow-Origin': '*',
+            **SECURITY_HEADERS
+        },
+        'body': json.dumps(payload),
+        'isBase64Encoded': False
+    }
+
+
+@profiled('slots')
+async def handler(event: dict, context) -> dict:
+    """Асинхронный вариант API слотов: GET через asyncpg, остальные методы — синхронным обработчиком"""
+    method = event.get('httpMethod', 'GET')
+
+    # Синхронные пулы и кэши прогревает обычный обработчик, пул asyncpg — этот
+    if is_warmup(event):
+        response = await asyncio.to_thread(index.handler, event, context)
+        return await warm_up_async(response, [('asyncpg', lambda: _warm_statements(SLOTS_QUERY))])
+
+    if method != 'GET':
+        return await asyncio.to_thread(index.handler, event, context)
+
+    try:
+        # Настройки арендатора почти всегда берутся из кэша в памяти, без обращения к базе
+        tenant = await asyncio.to_thread(resolve_tenant, event)
+        if not tenant:
+            return _json_response(404, {'error': 'Мастер не найден'})
+
+        pool = await get_pool()
+        async with pool.acquire() as conn:
+            statement = await conn.prepare(SLOTS_QUERY)
+            rows = await statement.fetch(tenant['id'])
+
+        # Тот же ответ, что у синхронного GET: компактный формат по ?format=compact или Accept
+        if wants_compact(event):
+            response = {
+                'statusCode': 200,
+                'headers': {
+                    'Content-Type': COMPACT_MEDIA_TYPE,
+                    'Access-Control-Allow-Origin': '*',
+                    'Vary': 'Accept',
+                    **SECURITY_HEADERS
+                },
+                'body': json.dumps(encode_slots(rows), separators=(',', ':')),
+                'isBase64Encoded': False
+            }
+        else:
+            response = {
+                'statusCode': 200,
+                'headers': {
+                    'Content-Type': 'application/json',
+                    'Access-Control-Allow-Origin': '*',
+                    'Vary': 'Accept',
+                    **SECURITY_HEADERS
+                },
+                'body': json.dumps([{
+                    'id': row['id'],
+                    'date': row['slot_date'].isoformat(),
+                    'time': str(row['slot_time']),
+                    'available': row['is_available']
+                } for row in rows]),
+                'isBase64Encoded': False
+            }
+
+        # Сжатие нагружает CPU — уводим его из цикла событий
+        return await asyncio.to_thread(compress_response, event, response)
+    except Exception as e:
+        print(f"Error in async slots handler: {str(e)}")
+        return _json_response(500, {'error': str(e)})
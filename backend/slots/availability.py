@@ -0,0 +1,167 @@
+import hashlib
+import json
+import os
+from datetime import datetime, timedelta, timezone
+
+SNAPSHOT_PREFIX = 'availability/'
+MANIFEST_KEY = 'availability/manifest.json'
+# Общий для всех функций ключ блокировки публикации; второй ключ — id арендатора
+PUBLISH_LOCK_ID = 43043
+SNAPSHOT_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+MANIFEST_CACHE_CONTROL = 'public, max-age=15'
+
+
+def snapshots_enabled() -> bool:
+    return os.environ.get('AVAILABILITY_SNAPSHOTS', '1') != '0'
+
+
+def _load_slots(cur, tenant_id: int) -> list:
+    cur.execute("""
+        SELECT id, slot_date, slot_time, is_available
+        FROM time_slots
+        WHERE tenant_id = %s AND slot_date >= CURRENT_DATE
+        ORDER BY slot_date, slot_time
+    """, (tenant_id,))
+    return cur.fetchall()
+
+
+def _month_bodies(rows: list) -> dict:
+    """Снимок на месяц в том же виде, что отдаёт slots GET, без лишних пробелов"""
+    months = {}
+    for row in rows:
+        months.setdefault(row[1].strftime('%Y-%m'), []).append({
+            'id': row[0],
+            'date': row[1].isoformat(),
+            'time': str(row[2]),
+            'available': row[3]
+        })
+    return {
+        month: (json.dumps(slots, separators=(',', ':')).encode('utf-8'), len(slots))
+        for month, slots in months.items()
+    }
+
+
+def _upload(storage, prefix: str, rows: list) -> dict:
+    months = {}
+    for month, (body, count) in _month_bodies(rows).items():
+        version = hashlib.sha256(body).hexdigest()[:16]
+        key = f'{prefix}{SNAPSHOT_PREFIX}{month}/{version}.json'
+        # Ключ зависит от содержимого: неизменившийся месяц не загружается повторно
+        if not storage.head(key):
+            storage.put(key, body, 'application/json', cache_control=SNAPSHOT_CACHE_CONTROL)
+        months[month] = {'version': version, 'url': storage.public_url(key), 'slots': count}
+
+    manifest = {
+        'generated_at': datetime.now(timezone.utc).isoformat(),
+        'months': months
+    }
+    # Один PUT манифеста атомарно переключает клиентов на новые версии месяцев
+    storage.put(prefix + MANIFEST_KEY, json.dumps(manifest, separators=(',', ':')).encode('utf-8'),
+                'application/json', cache_control=MANIFEST_CACHE_CONTROL)
+    return manifest
+
+
+def mark_dirty(cur, tenant_id: int):
+    """Отмечает снимок арендатора устаревшим; уже отмеченную строку не трогает и не блокирует"""
+    cur.execute("""
+        UPDATE availability_publish_state SET dirty = true, marked_at = CURRENT_TIMESTAMP
+        WHERE tenant_id = %s AND NOT dirty
+    """, (tenant_id,))
+    if cur.rowcount == 0:
+        cur.execute("""
+            INSERT INTO availability_publish_state (tenant_id, dirty, marked_at)
+            VALUES (%s, true, CURRENT_TIMESTAMP)
+            ON CONFLICT (tenant_id) DO NOTHING
+        """, (tenant_id,))
+
+
+def _take_dirty(cur, tenant_id: int) -> bool:
+    cur.execute("""
+        UPDATE availability_publish_state SET dirty = false
+        WHERE tenant_id = %s AND dirty
+        RETURNING tenant_id
+    """, (tenant_id,))
+    return cur.fetchone() is not None
+
+
+def _is_dirty(cur, tenant_id: int) -> bool:
+    cur.execute("SELECT dirty FROM availability_publish_state WHERE tenant_id = %s", (tenant_id,))
+    row = cur.fetchone()
+    return bool(row and row[0])
+
+
+def publish_availability(conn, storage, tenant: dict):
+    """Публикует снимки свободных слотов арендатора по месяцам и манифест в CDN после записи в time_slots.
+
+    Вызывается после commit. Сначала снимок отмечается устаревшим. Если публикацию уже ведёт
+    другой экземпляр, выходим сразу: держатель блокировки публикует заново, пока признак не сброшен,
+    и проверяет его ещё раз уже после снятия блокировки — поэтому изменения не теряются.
+    """
+    if not snapshots_enabled():
+        return None
+
+    manifest = None
+    cur = conn.cursor()
+    try:
+        mark_dirty(cur, tenant['id'])
+        conn.commit()
+
+        while True:
+            cur.execute("SELECT pg_try_advisory_lock(%s, %s)", (PUBLISH_LOCK_ID, tenant['id']))
+            if not cur.fetchone()[0]:
+                conn.rollback()
+                return manifest
+
+            try:
+                # Признак сбрасывается до чтения слотов: запись после чтения поставит его снова
+                while _take_dirty(cur, tenant['id']):
+                    conn.commit()
+                    rows = _load_slots(cur, tenant['id'])
+                    conn.rollback()
+                    try:
+                        manifest = _upload(storage, tenant['storage_prefix'], rows)
+                    except Exception:
+                        # Снимок не опубликован — возвращаем признак, чтобы его подхватил следующий
+                        mark_dirty(cur, tenant['id'])
+                        conn.commit()
+                        raise
+                conn.rollback()
+            finally:
+                cur.execute("SELECT pg_advisory_unlock(%s, %s)", (PUBLISH_LOCK_ID, tenant['id']))
+                conn.rollback()
+
+            # Писатель, проигравший блокировку перед самым её снятием, мог поставить признак уже
+            # после последней проверки: тогда публикуем ещё раз, если блокировку никто не перехватил
+            if not _is_dirty(cur, tenant['id']):
+                conn.rollback()
+                return manifest
+            conn.rollback()
+    except Exception as e:
+        # Снимок — ускорение для чтения: ошибка публикации не должна ломать запись
+        conn.rollback()
+        print(json.dumps({'event': 'availability_publish_failed', 'error': repr(e)}, ensure_ascii=False))
+        return manifest
+    finally:
+        cur.close()
+
+
+def prune_snapshots(storage, manifest: dict, prefix: str = '', grace_hours: int = 24) -> dict:
+    """Удаляет версии месяцев, на которые манифест больше не ссылается и которые старше grace_hours"""
+    current = {
+        f"{prefix}{SNAPSHOT_PREFIX}{month}/{entry['version']}.json"
+        for month, entry in (manifest or {}).get('months', {}).items()
+    }
+    cutoff = datetime.now(timezone.utc) - timedelta(hours=grace_hours)
+    stale = {}
+
+    for page in storage.list(prefix + SNAPSHOT_PREFIX):
+        for obj in page:
+            if obj['key'] == prefix + MANIFEST_KEY or obj['key'] in current:
+                continue
+            last_modified = obj.get('last_modified')
+            if last_modified and last_modified.tzinfo is None:
+                last_modified = last_modified.replace(tzinfo=timezone.utc)
+            if last_modified and last_modified < cutoff:
+                stale[obj['key']] = obj['size']
+
+    return storage.delete_many(stale)
@@ -0,0 +1,59 @@
+import base64
+
+COMPACT_MEDIA_TYPE = 'application/vnd.slots.compact+json'
+COMPACT_VERSION = 1
+
+
+def wants_compact(event: dict) -> bool:
+    """Компактный формат включается параметром ?format=compact или заголовком Accept"""
+    params = event.get('queryStringParameters') or {}
+    if params.get('format') == 'compact':
+        return True
+    for key, value in (event.get('headers') or {}).items():
+        if key.lower() == 'accept' and COMPACT_MEDIA_TYPE in (value or ''):
+            return True
+    return False
+
+
+def encode_slots(rows) -> dict:
+    """Колоночное представление списка слотов, отсортированного по дате и времени.
+
+    d  — первая дата, dd — смещения дат в днях от неё,
+    n  — число слотов в каждой дате, t — время слота в минутах от полуночи,
+    i  — id: первый как есть, далее разности с предыдущим,
+    a  — доступность битами в base64, младший бит первым.
+    Декодер — src/lib/compactSlots.ts.
+    """
+    first_date = None
+    day_offsets = []
+    counts = []
+    minutes = []
+    id_deltas = []
+    bitmap = bytearray((len(rows) + 7) // 8)
+
+    previous_date = None
+    previous_id = 0
+    for index, (slot_id, slot_date, slot_time, is_available) in enumerate(rows):
+        if slot_date != previous_date:
+            if first_date is None:
+                first_date = slot_date
+            day_offsets.append((slot_date - first_date).days)
+            counts.append(0)
+            previous_date = slot_date
+        counts[-1] += 1
+
+        minutes.append(slot_time.hour * 60 + slot_time.minute)
+        id_deltas.append(slot_id - previous_id)
+        previous_id = slot_id
+        if is_available:
+            bitmap[index >> 3] |= 1 << (index & 7)
+
+    return {
+        'v': COMPACT_VERSION,
+        'd': first_date.isoformat() if first_date else None,
+        'dd': day_offsets,
+        'n': counts,
+        't': minutes,
+        'i': id_deltas,
+        'a': base64.b64encode(bytes(bitmap)).decode('ascii')
+    }
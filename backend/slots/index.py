@@ -1,46 +1,126 @@
 import json
-import os
-import psycopg2
-from datetime import datetime, date
-from utils import verify_admin_token
+from availability import publish_availability
+from compact import COMPACT_MEDIA_TYPE, encode_slots, wants_compact
+from compression import compress_response
+from db import acquire, release, execute, register
+from storage import get_storage
+from tenants import resolve_tenant, tenant_by_id
+from utils import admin_tenant
+from validation import SLOT_CREATE_SCHEMA, SLOT_DELETE_SCHEMA, SLOT_UPDATE_SCHEMA, ValidationError
+from profiling import profiled
+from warmup import call_handler, is_warmup, warm_up
+
+register('slots_list', """
+    SELECT id, slot_date, slot_time, is_available 
+    FROM time_slots 
+    WHERE tenant_id = %s AND slot_date >= CURRENT_DATE
+    ORDER BY slot_date, slot_time
+""")
 
 SECURITY_HEADERS = {
     'X-Frame-Options': 'DENY',
     'X-Content-Type-Options': 'nosniff'
 }
 
+# Схемы тела для записи слотов; GET тела не имеет
+SLOT_SCHEMAS = {
+    'POST': SLOT_CREATE_SCHEMA,
+    'PUT': SLOT_UPDATE_SCHEMA,
+    'DELETE': SLOT_DELETE_SCHEMA
+}
+
+@profiled('slots')
 def handler(event: dict, context) -> dict:
     """API для управления слотами времени записи"""
     method = event.get('httpMethod', 'GET')
     
+    # Прогрев после деплоя или простоя: пулы, клиенты и кэши создаются до прихода пользователей
+    if is_warmup(event):
+        report = warm_up('slots', [
+            ('tenant', lambda: resolve_tenant({})['slug']),
+            # Обычный GET заполняет кэш настроек арендатора и кэш сжатого списка слотов
+            ('slots_cache', lambda: call_handler(handler, {'httpMethod': 'GET', 'headers': {'Accept-Encoding': 'br, gzip'}}, context))
+        ])
+        return {
+            'statusCode': 200 if report['ok'] else 503,
+            'headers': {
+                'Content-Type': 'application/json',
+                'Access-Control-Allow-Origin': '*',
+                **SECURITY_HEADERS
+            },
+            'body': json.dumps(report),
+            'isBase64Encoded': False
+        }
+    
     if method == 'OPTIONS':
         return {
             'statusCode': 200,
             'headers': {
                 'Access-Control-Allow-Origin': '*',
                 'Access-Control-Allow-Methods': 'GET, POST, PUT, DELETE, OPTIONS',
-                'Access-Control-Allow-Headers': 'Content-Type, X-Admin-Token',
+                'Access-Control-Allow-Headers': 'Content-Type, X-Admin-Token, X-Tenant',
                 **SECURITY_HEADERS
             },
             'body': '',
             'isBase64Encoded': False
         }
     
+    # Тело проверяется по схеме до соединения с базой: дата и время приходят уже разобранными
+    payload = None
+    if method in SLOT_SCHEMAS:
+        try:
+            payload = SLOT_SCHEMAS[method].load(event.get('body'))
+        except ValidationError as e:
+            return {
+                'statusCode': e.status_code,
+                'headers': {
+                    'Content-Type': 'application/json',
+                    'Access-Control-Allow-Origin': '*',
+                    **SECURITY_HEADERS
+                },
+                'body': json.dumps({'error': e.message, 'fields': e.errors}),
+                'isBase64Encoded': False
+            }
+    
     conn = None
     cur = None
     
     try:
-        conn = psycopg2.connect(os.environ['DATABASE_URL'])
+        # Чтение идёт с реплики; ?consistent=1 после собственной записи читает с основной базы
+        consistent = (event.get('queryStringParameters') or {}).get('consistent') == '1'
+        conn = acquire(readonly=method == 'GET' and not consistent)
         cur = conn.cursor()
         if method == 'GET':
-            cur.execute("""
-                SELECT id, slot_date, slot_time, is_available 
-                FROM time_slots 
-                WHERE slot_date >= CURRENT_DATE
-                ORDER BY slot_date, slot_time
-            """)
+            tenant = resolve_tenant(event, cur)
+            if not tenant:
+                return {
+                    'statusCode': 404,
+                    'headers': {
+                        'Content-Type': 'application/json',
+                        'Access-Control-Allow-Origin': '*',
+                        **SECURITY_HEADERS
+                    },
+                    'body': json.dumps({'error': 'Мастер не найден'}),
+                    'isBase64Encoded': False
+                }
+            
+            # Условие по ключу секционирования отсекает секции прошедших месяцев
+            execute(cur, 'slots_list', (tenant['id'],))
             slots = cur.fetchall()
             
+            if wants_compact(event):
+                return compress_response(event, {
+                    'statusCode': 200,
+                    'headers': {
+                        'Content-Type': COMPACT_MEDIA_TYPE,
+                        'Access-Control-Allow-Origin': '*',
+                        'Vary': 'Accept',
+                        **SECURITY_HEADERS
+                    },
+                    'body': json.dumps(encode_slots(slots), separators=(',', ':')),
+                    'isBase64Encoded': False
+                })
+            
             result = [{
                 'id': row[0],
                 'date': row[1].isoformat(),
@@ -48,16 +128,17 @@ def handler(event: dict, context) -> dict:
                 'available': row[3]
             } for row in slots]
             
-            return {
+            return compress_response(event, {
                 'statusCode': 200,
                 'headers': {
                     'Content-Type': 'application/json',
                     'Access-Control-Allow-Origin': '*',
+                    'Vary': 'Accept',
                     **SECURITY_HEADERS
                 },
                 'body': json.dumps(result),
                 'isBase64Encoded': False
-            }
+            })
         
         elif method == 'POST':
             headers = event.get('headers', {})
@@ -71,7 +152,8 @@ def handler(event: dict, context) -> dict:
                             token = cookie.split('=', 1)[1]
                             break
             
-            if not verify_admin_token(token):
+            tenant_id = admin_tenant(token, cur)
+            if not tenant_id:
                 return {
                     'statusCode': 401,
                     'headers': {
@@ -83,21 +165,24 @@ def handler(event: dict, context) -> dict:
                     'isBase64Encoded': False
                 }
             
-            data = json.loads(event.get('body', '{}'))
-            slot_date = data.get('date')
-            slot_time = data.get('time')
+            slot_date = payload['date']
+            slot_time = payload['time']
+            
+            # Секция месяца могла ещё не быть создана, если слот добавляется далеко вперёд
+            cur.execute("SELECT ensure_booking_partitions(%s::date, 0)", (slot_date,))
             
             cur.execute("""
-                INSERT INTO time_slots (slot_date, slot_time, is_available)
-                VALUES (%s, %s, true)
-                ON CONFLICT (slot_date, slot_time) DO NOTHING
+                INSERT INTO time_slots (tenant_id, slot_date, slot_time, is_available)
+                VALUES (%s, %s, %s, true)
+                ON CONFLICT (tenant_id, slot_date, slot_time) DO NOTHING
                 RETURNING id
-            """, (slot_date, slot_time))
+            """, (tenant_id, slot_date, slot_time))
             
             result = cur.fetchone()
             conn.commit()
             
             if result:
+                publish_availability(conn, get_storage(), tenant_by_id(tenant_id, cur))
                 return {
                     'statusCode': 201,
                     'headers': {
@@ -132,7 +217,8 @@ def handler(event: dict, context) -> dict:
                             token = cookie.split('=', 1)[1]
                             break
             
-            if not verify_admin_token(token):
+            tenant_id = admin_tenant(token, cur)
+            if not tenant_id:
                 return {
                     'statusCode': 401,
                     'headers': {
@@ -144,17 +230,17 @@ def handler(event: dict, context) -> dict:
                     'isBase64Encoded': False
                 }
             
-            data = json.loads(event.get('body', '{}'))
-            slot_id = data.get('id')
-            is_available = data.get('available')
+            slot_id = payload['id']
+            is_available = payload['available']
             
             cur.execute("""
                 UPDATE time_slots 
                 SET is_available = %s
-                WHERE id = %s
-            """, (is_available, slot_id))
+                WHERE id = %s AND tenant_id = %s
+            """, (is_available, slot_id, tenant_id))
             
             conn.commit()
+            publish_availability(conn, get_storage(), tenant_by_id(tenant_id, cur))
             
             return {
                 'statusCode': 200,
@@ -179,7 +265,8 @@ def handler(event: dict, context) -> dict:
                             token = cookie.split('=', 1)[1]
                             break
             
-            if not verify_admin_token(token):
+            tenant_id = admin_tenant(token, cur)
+            if not tenant_id:
                 return {
                     'statusCode': 401,
                     'headers': {
@@ -191,13 +278,12 @@ def handler(event: dict, context) -> dict:
                     'isBase64Encoded': False
                 }
             
-            data = json.loads(event.get('body', '{}'))
-            slot_id = data.get('slot_id')
+            slot_id = payload['slot_id']
             
             # Получаем список ID бронирований для удаления связанных фото
             cur.execute("""
-                SELECT id FROM bookings WHERE slot_id = %s
-            """, (slot_id,))
+                SELECT id FROM bookings WHERE slot_id = %s AND tenant_id = %s
+            """, (slot_id, tenant_id))
             booking_ids = [row[0] for row in cur.fetchall()]
             
             # Удаляем связанные фотографии бронирований (если есть таблица)
@@ -211,15 +297,16 @@ def handler(event: dict, context) -> dict:
             
             # Удаляем бронирования на этот слот
             cur.execute("""
-                DELETE FROM bookings WHERE slot_id = %s
-            """, (slot_id,))
+                DELETE FROM bookings WHERE slot_id = %s AND tenant_id = %s
+            """, (slot_id, tenant_id))
             
             # Теперь можно удалить сам слот
             cur.execute("""
-                DELETE FROM time_slots WHERE id = %s
-            """, (slot_id,))
+                DELETE FROM time_slots WHERE id = %s AND tenant_id = %s
+            """, (slot_id, tenant_id))
             
             conn.commit()
+            publish_availability(conn, get_storage(), tenant_by_id(tenant_id, cur))
             
             return {
                 'statusCode': 200,
@@ -249,5 +336,4 @@ def handler(event: dict, context) -> dict:
     finally:
         if cur:
             cur.close()
-        if conn:
-            conn.close()
\ No newline at end of file
+        release(conn)
\ No newline at end of file
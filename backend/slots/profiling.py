@@ -0,0 +1,235 @@
+import contextvars
+import functools
+import hmac
+import inspect
+import json
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timezone
+
+try:
+    from storage import get_storage
+except ImportError:
+    get_storage = None
+
+PROFILE_PREFIX = 'profiles/'
+SPEEDSCOPE_SCHEMA = 'https://www.speedscope.app/file-format-schema.json'
+
+# Асинхронный обработчик вызывает синхронный через asyncio.to_thread, который копирует контекст:
+# вложенный вызов видит, что профиль уже снимается, и второй не запускает
+_active = contextvars.ContextVar('profiling_active', default=False)
+
+
+def _settings() -> dict:
+    return {
+        'sample_rate': float(os.environ.get('PROFILE_SAMPLE_RATE', '0')),
+        'token': os.environ.get('PROFILE_TOKEN', ''),
+        'interval_ms': float(os.environ.get('PROFILE_INTERVAL_MS', '5')),
+        'max_samples': int(os.environ.get('PROFILE_MAX_SAMPLES', '20000')),
+        'format': os.environ.get('PROFILE_FORMAT', 'collapsed'),
+        'destination': os.environ.get('PROFILE_DESTINATION', 'storage'),
+        'local_dir': os.environ.get('PROFILE_DIR', '/tmp/profiles')
+    }
+
+
+def _header(event: dict, name: str) -> str:
+    for key, value in (event.get('headers') or {}).items():
+        if key.lower() == name:
+            return value or ''
+    return ''
+
+
+def should_profile(event: dict, settings: dict) -> bool:
+    """Профиль снимается по заголовку X-Profile с секретом PROFILE_TOKEN или с вероятностью PROFILE_SAMPLE_RATE"""
+    token = _header(event, 'x-profile')
+    if token and settings['token'] and hmac.compare_digest(token, settings['token']):
+        return True
+    return settings['sample_rate'] > 0 and random.random() < settings['sample_rate']
+
+
+class Sampler:
+    """Статистический профилировщик: фоновый поток периодически снимает стек потока обработчика.
+
+    В отличие от cProfile не замедляет каждый вызов функции, поэтому годится для живого трафика.
+    """
+
+    def __init__(self, thread_id: int, interval_ms: float, max_samples: int, stop_code=None):
+        self.thread_id = thread_id
+        self.interval = interval_ms / 1000
+        self.max_samples = max_samples
+        self.stop_code = stop_code
+        self.stacks = Counter()
+        self.taken = 0
+        self.started = 0.0
+        self.elapsed_ms = 0.0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='profiling-sampler', daemon=True)
+
+    def _stack(self, frame) -> tuple:
+        stack = []
+        while frame is not None and frame.f_code is not self.stop_code:
+            code = frame.f_code
+            stack.append((code.co_name, code.co_filename, code.co_firstlineno))
+            frame = frame.f_back
+        stack.reverse()
+        return tuple(stack)
+
+    def _run(self):
+        while not self._stop.wait(self.interval) and self.taken < self.max_samples:
+            frame = sys._current_frames().get(self.thread_id)
+            # Обработчик мог завершиться, пока срез ждал GIL: такой срез показал бы сам профилировщик
+            if frame is not None and not self._stop.is_set():
+                self.stacks[self._stack(frame)] += 1
+                self.taken += 1
+
+    def start(self):
+        self.started = time.perf_counter()
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.elapsed_ms = (time.perf_counter() - self.started) * 1000
+
+
+def _frame_name(frame: tuple) -> str:
+    name, filename, line = frame
+    return f'{name} ({os.path.basename(filename)}:{line})'
+
+
+def collapsed(sampler: Sampler) -> str:
+    """Формат flamegraph.pl / speedscope: «корень;...;лист число_срезов» на строку"""
+    return ''.join(
+        f"{';'.join(_frame_name(frame) for frame in stack)} {count}\n"
+        for stack, count in sampler.stacks.most_common()
+        if stack
+    )
+
+
+def speedscope(sampler: Sampler, name: str) -> str:
+    frames = []
+    index = {}
+    samples = []
+    weights = []
+    interval_ms = sampler.interval * 1000
+
+    for stack, count in sampler.stacks.most_common():
+        if not stack:
+            continue
+        for frame in stack:
+            if frame not in index:
+                index[frame] = len(frames)
+                frames.append({'name': frame[0], 'file': frame[1], 'line': frame[2]})
+        samples.append([index[frame] for frame in stack])
+        weights.append(count * interval_ms)
+
+    return json.dumps({
+        '$schema': SPEEDSCOPE_SCHEMA,
+        'name': name,
+        'exporter': 'profiling.py',
+        'shared': {'frames': frames},
+        'profiles': [{
+            'type': 'sampled',
+            'name': name,
+            'unit': 'milliseconds',
+            'startValue': 0,
+            'endValue': round(sampler.elapsed_ms, 3),
+            'samples': samples,
+            'weights': weights
+        }]
+    }, separators=(',', ':'))
+
+
+def save_profile(function_name: str, request_id: str, sampler: Sampler, settings: dict) -> str:
+    """Сохраняет профиль в бакет (или на диск, если хранилища нет) по ключу функция/дата/ID запроса"""
+    if settings['format'] == 'speedscope':
+        body, extension, content_type = speedscope(sampler, f'{function_name} {request_id}'), 'speedscope.json', 'application/json'
+    else:
+        body, extension, content_type = collapsed(sampler), 'collapsed.txt', 'text/plain'
+
+    day = datetime.now(timezone.utc).strftime('%Y-%m-%d')
+    key = f'{PROFILE_PREFIX}{function_name}/{day}/{request_id}.{extension}'
+
+    if get_storage is not None and settings['destination'] == 'storage':
+        get_storage().put(key, body.encode('utf-8'), content_type)
+        return key
+
+    path = os.path.join(settings['local_dir'], key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(body)
+    return path
+
+
+def _request_id(event: dict, context) -> str:
+    request_id = getattr(context, 'request_id', None) or (event.get('requestContext') or {}).get('requestId')
+    return request_id or f'{int(time.time() * 1000)}-{random.getrandbits(32):08x}'
+
+
+def _finish(function_name: str, event: dict, context, sampler: Sampler, settings: dict, response):
+    sampler.stop()
+    try:
+        location = save_profile(function_name, _request_id(event, context), sampler, settings)
+    except Exception as e:
+        # Профиль — отладочные данные: ошибка сохранения не должна ломать ответ
+        print(json.dumps({'event': 'profile_save_failed', 'function': function_name, 'error': repr(e)}))
+        return response
+
+    print(json.dumps({
+        'event': 'profile_saved',
+        'function': function_name,
+        'location': location,
+        'samples': sampler.taken,
+        'elapsed_ms': round(sampler.elapsed_ms, 1)
+    }))
+    if isinstance(response, dict):
+        response = {**response, 'headers': {**(response.get('headers') or {}), 'X-Profile-Location': location}}
+    return response
+
+
+def profiled(function_name: str):
+    """Декоратор обработчика: при срабатывании триггера вызов идёт под статистическим профилировщиком"""
+    def decorate(handler):
+        if inspect.iscoroutinefunction(handler):
+            @functools.wraps(handler)
+            async def async_wrapper(event: dict, context):
+                settings = _settings()
+                if _active.get() or not should_profile(event, settings):
+                    return await handler(event, context)
+
+                token = _active.set(True)
+                sampler = Sampler(threading.get_ident(), settings['interval_ms'], settings['max_samples'],
+                                  async_wrapper.__code__)
+                sampler.start()
+                response = None
+                try:
+                    response = await handler(event, context)
+                finally:
+                    response = _finish(function_name, event, context, sampler, settings, response)
+                    _active.reset(token)
+                return response
+            return async_wrapper
+
+        @functools.wraps(handler)
+        def wrapper(event: dict, context):
+            settings = _settings()
+            if _active.get() or not should_profile(event, settings):
+                return handler(event, context)
+
+            token = _active.set(True)
+            sampler = Sampler(threading.get_ident(), settings['interval_ms'], settings['max_samples'],
+                              wrapper.__code__)
+            sampler.start()
+            response = None
+            try:
+                response = handler(event, context)
+            finally:
+                response = _finish(function_name, event, context, sampler, settings, response)
+                _active.reset(token)
+            return response
+        return wrapper
+    return decorate
@@ -0,0 +1,187 @@
+import re
+import html
+import json
+from datetime import date, time
+
+# Шаблоны компилируются один раз при загрузке модуля, а не на каждом вызове re.match
+NAME_PATTERN = re.compile(r'[а-яА-ЯёЁa-zA-Z\s\-]{2,100}')
+# Телефон, email или Telegram — одна альтернатива вместо трёх проходов
+CONTACT_PATTERN = re.compile(
+    r'[\d\s\+\-\(\)]{7,20}'
+    r'|[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}'
+    r'|@[a-zA-Z0-9_]{5,32}'
+)
+TIME_PATTERN = re.compile(r'([01]\d|2[0-3]):([0-5]\d)(?::([0-5]\d))?')
+BOOKING_TYPES = frozenset({'know_what_i_want', 'not_sure', 'no_design'})
+
+
+class ValidationError(Exception):
+    """Ошибки проверки тела запроса: все поля сразу, {поле: сообщение} в errors"""
+
+    def __init__(self, status_code: int, message: str, errors: dict = None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.message = message
+        self.errors = errors or {}
+
+
+def sanitize_text(text: str, max_length: int = 500) -> str:
+    """Очищает текст от опасных символов и ограничивает длину"""
+    if not text:
+        return ''
+    
+    text = text[:max_length]
+    text = html.escape(text)
+    
+    return text.strip()
+
+def validate_contact(contact: str) -> bool:
+    """Проверяет корректность контакта (телефон, email или Telegram)"""
+    return isinstance(contact, str) and len(contact) <= 100 and bool(CONTACT_PATTERN.fullmatch(contact))
+
+def validate_booking_type(booking_type: str) -> bool:
+    """Проверяет тип записи"""
+    return booking_type in BOOKING_TYPES
+
+def validate_name(name: str) -> bool:
+    """Проверяет имя клиента"""
+    return isinstance(name, str) and bool(NAME_PATTERN.fullmatch(name))
+
+
+def _name(value) -> str:
+    if not validate_name(value):
+        raise ValueError(value)
+    return sanitize_text(value, 100)
+
+
+def _contact(value) -> str:
+    if not validate_contact(value):
+        raise ValueError(value)
+    return sanitize_text(value, 100)
+
+
+def _booking_type(value) -> str:
+    if not validate_booking_type(value):
+        raise ValueError(value)
+    return value
+
+
+def _comment(value) -> str:
+    if not isinstance(value, str):
+        raise TypeError(value)
+    return sanitize_text(value, 500)
+
+
+def _identifier(value) -> int:
+    # bool — подкласс int, а '1.5' из формы не должен превращаться в 1
+    if isinstance(value, bool) or isinstance(value, float):
+        raise TypeError(value)
+    identifier = int(value)
+    if identifier <= 0:
+        raise ValueError(value)
+    return identifier
+
+
+def _flag(value) -> bool:
+    if isinstance(value, bool):
+        return value
+    if value in ('true', '1'):
+        return True
+    if value in ('false', '0'):
+        return False
+    raise ValueError(value)
+
+
+def _date(value) -> date:
+    if not isinstance(value, str):
+        raise TypeError(value)
+    return date.fromisoformat(value)
+
+
+def _time(value) -> time:
+    match = TIME_PATTERN.fullmatch(value) if isinstance(value, str) else None
+    if not match:
+        raise ValueError(value)
+    return time(int(match.group(1)), int(match.group(2)), int(match.group(3) or 0))
+
+
+def _strings(value) -> list:
+    if not isinstance(value, list) or not all(isinstance(item, str) for item in value):
+        raise TypeError(value)
+    return value
+
+
+class Field:
+    """Поле схемы: функция разбора (ValueError/TypeError — ошибка) и сообщение для клиента"""
+
+    __slots__ = ('parse', 'message', 'required', 'default')
+
+    def __init__(self, parse, message: str, required: bool = True, default=None):
+        self.parse = parse
+        self.message = message
+        self.required = required
+        self.default = default
+
+
+class Schema:
+    """Декларативная схема тела запроса; собирается один раз на экземпляр функции"""
+
+    def __init__(self, **fields):
+        self.fields = tuple(fields.items())
+
+    def validate(self, data) -> dict:
+        """Очищенные значения всех полей или ValidationError со всеми ошибками сразу"""
+        if not isinstance(data, dict):
+            raise ValidationError(400, 'Некорректное тело запроса')
+
+        clean = {}
+        errors = {}
+        for name, field in self.fields:
+            value = data.get(name)
+            if value is None or value == '':
+                if field.required:
+                    errors[name] = field.message
+                else:
+                    clean[name] = field.default
+                continue
+            try:
+                clean[name] = field.parse(value)
+            except (TypeError, ValueError):
+                errors[name] = field.message
+
+        if errors:
+            raise ValidationError(400, '; '.join(errors.values()), errors)
+        return clean
+
+    def load(self, body: str) -> dict:
+        """Разбирает JSON-тело и проверяет его по схеме"""
+        try:
+            data = json.loads(body or '{}')
+        except ValueError:
+            raise ValidationError(400, 'Некорректное тело запроса')
+        return self.validate(data)
+
+
+# Фото здесь проверяются только по типу: размер и формат — в photos, после семафора
+BOOKING_SCHEMA = Schema(
+    slot_id=Field(_identifier, 'Некорректный слот'),
+    name=Field(_name, 'Некорректное имя'),
+    contact=Field(_contact, 'Некорректный контакт'),
+    type=Field(_booking_type, 'Некорректный тип записи'),
+    comment=Field(_comment, 'Некорректный комментарий', required=False, default=''),
+    photos=Field(_strings, 'Некорректный список фото', required=False, default=())
+)
+
+SLOT_CREATE_SCHEMA = Schema(
+    date=Field(_date, 'Некорректная дата'),
+    time=Field(_time, 'Некорректное время')
+)
+
+SLOT_UPDATE_SCHEMA = Schema(
+    id=Field(_identifier, 'Некорректный слот'),
+    available=Field(_flag, 'Некорректный признак доступности')
+)
+
+SLOT_DELETE_SCHEMA = Schema(
+    slot_id=Field(_identifier, 'Некорректный слот')
+)
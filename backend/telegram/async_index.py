@@ -0,0 +1,183 @@
+import asyncio
+import json
+import os
+import index
+from aio import get_pool, get_http_client, get_s3_client, head_object, put_objects, public_url
+from message import format_booking_message
+from multipart import MultipartError, form_boundary, parse_form
+from receipt import prepare_receipt, receipt_from_bytes, ReceiptError, MAX_RECEIPT_SIZE
+from storage import get_storage, storage_settings
+from tenants import tenant_by_id
+from profiling import profiled
+from warmup import is_warmup, warm_up_async
+
+SECURITY_HEADERS = index.SECURITY_HEADERS
+
+SELECT_BOOKING = """
+    SELECT b.client_name, b.client_contact, b.booking_type,
+           b.comment, ts.slot_date, ts.slot_time, b.tenant_id
+    FROM bookings b
+    JOIN time_slots ts ON b.slot_id = ts.id AND b.slot_date = ts.slot_date
+    WHERE b.id = $1
+"""
+
+SELECT_PHOTOS = """
+    SELECT photo_url FROM booking_photos WHERE booking_id = $1
+"""
+
+
+async def _warm_statements(*queries) -> dict:
+    """Открывает пул asyncpg и подготавливает горячие запросы на одном из его соединений"""
+    pool = await get_pool()
+    async with pool.acquire() as conn:
+        for query in queries:
+            await conn.prepare(query)
+    return {'prepared': len(queries)}
+
+
+async def _warm_s3() -> dict:
+    settings = storage_settings()
+    if settings['backend'] == 's3':
+        await get_s3_client(settings)
+    return {'backend': settings['backend']}
+
+
+async def _warm_telegram() -> int:
+    response = await get_http_client().head('https://api.telegram.org')
+    return response.status_code
+
+
+def _json_response(status_code: int, payload, frontend_domain: str) -> dict:
+    return {
+        'statusCode': status_code,
+        'headers': {
+            'Content-Type': 'application/json',
+            'Access-Control-Allow-Origin': frontend_domain,
+            'Access-Control-Allow-Credentials': 'true',
+            **SECURITY_HEADERS
+        },
+        'body': json.dumps(payload),
+        'isBase64Encoded': False
+    }
+
+
+@profiled('telegram')
+async def handler(event: dict, context) -> dict:
+    """Асинхронная отправка заявки мастеру: ожидание сети не блокирует другие запросы"""
+    frontend_domain = os.environ.get('FRONTEND_DOMAIN', '*')
+    method = event.get('httpMethod', 'POST')
+
+    # Синхронные пулы и кэши прогревает обычный обработчик, пул asyncpg и клиенты aio — этот
+    if is_warmup(event):
+        response = await asyncio.to_thread(index.handler, event, context)
+        return await warm_up_async(response, [
+            ('asyncpg', lambda: _warm_statements(SELECT_BOOKING, SELECT_PHOTOS)),
+            ('aio_storage', _warm_s3),
+            ('aio_telegram', _warm_telegram)
+        ])
+
+    if method != 'POST':
+        return await asyncio.to_thread(index.handler, event, context)
+
+    try:
+        receipt_bytes = None
+        try:
+            boundary = form_boundary(event)
+            if boundary:
+                data, files = await asyncio.to_thread(parse_form, event, boundary, MAX_RECEIPT_SIZE, 1)
+                receipt_bytes = next((part for name, part in files if name == 'receipt'), None)
+            else:
+                data = json.loads(event.get('body', '{}'))
+        except MultipartError as e:
+            return _json_response(e.status_code, {'error': e.message}, frontend_domain)
+        receipt_base64 = data.get('receipt_url', '')
+
+        try:
+            booking_id = int(data.get('booking_id'))
+        except (TypeError, ValueError):
+            return _json_response(404, {'error': 'Заявка не найдена'}, frontend_domain)
+
+        pool = await get_pool()
+
+        # Соединение нужно только на чтение заявки и её фото: загрузка чека и запросы
+        # к Telegram идут без него, иначе медленная сеть держит соединения пула
+        async with pool.acquire() as conn:
+            booking = await (await conn.prepare(SELECT_BOOKING)).fetchrow(booking_id)
+            rows = await (await conn.prepare(SELECT_PHOTOS)).fetch(booking_id) if booking else []
+        photo_urls = [row['photo_url'] for row in rows]
+
+        if not booking:
+            return _json_response(404, {'error': 'Заявка не найдена'}, frontend_domain)
+
+        booking = tuple(booking)
+        tenant = await asyncio.to_thread(tenant_by_id, booking[6])
+        if not tenant:
+            return _json_response(404, {'error': 'Заявка не найдена'}, frontend_domain)
+
+        receipt_cdn_url = ''
+        if receipt_bytes is not None or receipt_base64:
+            try:
+                if receipt_bytes is not None:
+                    receipt = receipt_from_bytes(receipt_bytes)
+                else:
+                    receipt = await asyncio.to_thread(prepare_receipt, receipt_base64)
+            except ReceiptError as e:
+                return _json_response(e.status_code, {'error': e.message}, frontend_domain)
+
+            settings = storage_settings()
+            file_key = f"{tenant['storage_prefix']}receipts/{booking_id}/receipt.{receipt['extension']}"
+
+            # Повторная отправка того же чека не должна приводить к повторной загрузке
+            stored = await head_object(settings, file_key, get_storage)
+            if not stored or stored['md5'] != receipt['md5']:
+                await put_objects(settings, [(file_key, receipt['bytes'], receipt['content_type'])], get_storage)
+
+            receipt_cdn_url = public_url(settings, file_key, get_storage)
+
+        message = format_booking_message(booking[:6], bool(receipt_cdn_url))
+
+        bot_token = os.environ.get('TELEGRAM_BOT_TOKEN')
+        chat_id = tenant['telegram_chat_id']
+
+        if not bot_token or not chat_id:
+            async with pool.acquire() as conn:
+                await conn.execute("UPDATE bookings SET telegram_sent = false WHERE id = $1", booking_id)
+            return _json_response(200, {'message': 'Заявка сохранена (Telegram не настроен)'}, frontend_domain)
+
+        http = get_http_client()
+        response = await http.post(f'https://api.telegram.org/bot{bot_token}/sendMessage', json={
+            'chat_id': chat_id,
+            'text': message,
+            'parse_mode': 'HTML'
+        })
+
+        if not response.is_success:
+            return _json_response(500, {'error': 'Ошибка отправки в Telegram'}, frontend_domain)
+
+        photos = [(photo_url, '📸 Примеры работ от клиента') for photo_url in photo_urls]
+        if receipt_cdn_url:
+            photos.append((receipt_cdn_url, '💳 Чек об оплате предоплаты'))
+
+        # По очереди, как в синхронном обработчике: одновременные запросы Telegram
+        # доставляет в произвольном порядке, и чек может прийти раньше примеров работ
+        for photo_url, caption in photos:
+            await http.post(f'https://api.telegram.org/bot{bot_token}/sendPhoto', json={
+                'chat_id': chat_id,
+                'photo': photo_url,
+                'caption': caption
+            })
+
+        async with pool.acquire() as conn:
+            if receipt_cdn_url:
+                await conn.execute(
+                    "UPDATE bookings SET receipt_url = $1, telegram_sent = true WHERE id = $2",
+                    receipt_cdn_url, booking_id
+                )
+            else:
+                await conn.execute("UPDATE bookings SET telegram_sent = true WHERE id = $1", booking_id)
+
+        return _json_response(200, {'message': 'Заявка отправлена мастеру'}, frontend_domain)
+
+    except Exception as e:
+        print(json.dumps({'event': 'error', 'function': 'telegram', 'method': method, 'error': repr(e)}, ensure_ascii=False))
+        return _json_response(500, {'error': 'Внутренняя ошибка, попробуйте позже'}, frontend_domain)
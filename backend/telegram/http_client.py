@@ -0,0 +1,15 @@
+import threading
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_http_session():
+    """HTTP-сессия с keep-alive к api.telegram.org, общая для тёплых вызовов"""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                import requests
+                _session = requests.Session()
+    return _session
@@ -1,9 +1,26 @@
 import json
 import os
-import psycopg2
-import requests
-import base64
-import boto3
+from db import acquire, release, execute, register
+from multipart import MultipartError, form_boundary, parse_form
+from receipt import prepare_receipt, receipt_from_bytes, ReceiptError, MAX_RECEIPT_SIZE
+from storage import get_storage
+from http_client import get_http_session
+from message import format_booking_message
+from tenants import tenant_by_id
+from profiling import profiled
+from warmup import is_warmup, warm_up
+
+register('booking_lookup', """
+    SELECT b.client_name, b.client_contact, b.booking_type, 
+           b.comment, ts.slot_date, ts.slot_time, b.tenant_id
+    FROM bookings b
+    JOIN time_slots ts ON b.slot_id = ts.id AND b.slot_date = ts.slot_date
+    WHERE b.id = %s
+""")
+
+register('booking_photo_urls', """
+    SELECT photo_url FROM booking_photos WHERE booking_id = %s
+""")
 
 SECURITY_HEADERS = {
     'X-Frame-Options': 'DENY',
@@ -11,11 +28,30 @@ SECURITY_HEADERS = {
     'Content-Security-Policy': "default-src 'none'; script-src 'self'; connect-src 'self'; img-src 'self' https://cdn.poehali.dev; style-src 'self'"
 }
 
+@profiled('telegram')
 def handler(event: dict, context) -> dict:
     """Отправка заявки мастеру в Telegram"""
     frontend_domain = os.environ.get('FRONTEND_DOMAIN', '*')
     method = event.get('httpMethod', 'POST')
     
+    # Прогрев после деплоя или простоя: пулы, клиенты и кэши создаются до прихода пользователей
+    if is_warmup(event):
+        report = warm_up('telegram', [
+            # TLS-соединение к api.telegram.org остаётся в keep-alive сессии
+            ('telegram', lambda: get_http_session().head('https://api.telegram.org', timeout=5).status_code)
+        ])
+        return {
+            'statusCode': 200 if report['ok'] else 503,
+            'headers': {
+                'Content-Type': 'application/json',
+                'Access-Control-Allow-Origin': frontend_domain,
+                'Access-Control-Allow-Credentials': 'true',
+                **SECURITY_HEADERS
+            },
+            'body': json.dumps(report),
+            'isBase64Encoded': False
+        }
+    
     if method == 'OPTIONS':
         return {
             'statusCode': 200,
@@ -43,47 +79,42 @@ def handler(event: dict, context) -> dict:
             'isBase64Encoded': False
         }
     
+    conn = None
+    
     try:
-        data = json.loads(event.get('body', '{}'))
+        # Чек может прийти двоичной частью multipart/form-data вместо base64 в JSON
+        receipt_bytes = None
+        try:
+            boundary = form_boundary(event)
+            if boundary:
+                data, files = parse_form(event, boundary, MAX_RECEIPT_SIZE, 1)
+                receipt_bytes = next((part for name, part in files if name == 'receipt'), None)
+            else:
+                data = json.loads(event.get('body', '{}'))
+        except MultipartError as e:
+            return {
+                'statusCode': e.status_code,
+                'headers': {
+                    'Content-Type': 'application/json',
+                    'Access-Control-Allow-Origin': frontend_domain,
+                    'Access-Control-Allow-Credentials': 'true',
+                    **SECURITY_HEADERS
+                },
+                'body': json.dumps({'error': e.message}),
+                'isBase64Encoded': False
+            }
         booking_id = data.get('booking_id')
         receipt_base64 = data.get('receipt_url', '')
         
-        receipt_cdn_url = ''
-        if receipt_base64:
-            if receipt_base64.startswith('data:image'):
-                receipt_base64 = receipt_base64.split(',')[1]
-            
-            receipt_bytes = base64.b64decode(receipt_base64)
-            
-            s3 = boto3.client('s3',
-                endpoint_url='https://bucket.poehali.dev',
-                aws_access_key_id=os.environ['AWS_ACCESS_KEY_ID'],
-                aws_secret_access_key=os.environ['AWS_SECRET_ACCESS_KEY']
-            )
-            
-            file_key = f'receipts/{booking_id}/receipt.jpg'
-            s3.put_object(
-                Bucket='files',
-                Key=file_key,
-                Body=receipt_bytes,
-                ContentType='image/jpeg'
-            )
-            
-            receipt_cdn_url = f"https://cdn.poehali.dev/projects/{os.environ['AWS_ACCESS_KEY_ID']}/bucket/{file_key}"
-        
-        conn = psycopg2.connect(os.environ['DATABASE_URL'])
+        conn = acquire()
         cur = conn.cursor()
         
-        cur.execute("""
-            SELECT b.client_name, b.client_contact, b.booking_type, 
-                   b.comment, ts.slot_date, ts.slot_time
-            FROM bookings b
-            JOIN time_slots ts ON b.slot_id = ts.id
-            WHERE b.id = %s
-        """, (booking_id,))
+        # Сначала проверяем заявку, чтобы не декодировать и не загружать чек впустую
+        execute(cur, 'booking_lookup', (booking_id,))
         
         booking = cur.fetchone()
-        if not booking:
+        tenant = tenant_by_id(booking[6], cur) if booking else None
+        if not tenant:
             return {
                 'statusCode': 404,
                 'headers': {
@@ -96,27 +127,42 @@ def handler(event: dict, context) -> dict:
                 'isBase64Encoded': False
             }
         
-        name, contact, booking_type, comment, slot_date, slot_time = booking
-        
-        type_labels = {
-            'know_what_i_want': '✅ Знаю, что хочу',
-            'not_sure': '🤔 Пока не определилась',
-            'no_design': '⭕ Без дизайна'
-        }
+        receipt_cdn_url = ''
+        if receipt_bytes is not None or receipt_base64:
+            try:
+                if receipt_bytes is not None:
+                    receipt = receipt_from_bytes(receipt_bytes)
+                else:
+                    receipt = prepare_receipt(receipt_base64)
+            except ReceiptError as e:
+                return {
+                    'statusCode': e.status_code,
+                    'headers': {
+                        'Content-Type': 'application/json',
+                        'Access-Control-Allow-Origin': frontend_domain,
+                        'Access-Control-Allow-Credentials': 'true',
+                        **SECURITY_HEADERS
+                    },
+                    'body': json.dumps({'error': e.message}),
+                    'isBase64Encoded': False
+                }
+            
+            storage = get_storage()
+            
+            file_key = f"{tenant['storage_prefix']}receipts/{booking_id}/receipt.{receipt['extension']}"
+            
+            # Повторная отправка того же чека не должна приводить к повторной загрузке
+            stored = storage.head(file_key)
+            if not stored or stored['md5'] != receipt['md5']:
+                storage.put(file_key, receipt['bytes'], receipt['content_type'])
+            
+            receipt_cdn_url = storage.public_url(file_key)
         
-        message = f"""💅 <b>Новая запись!</b>
-
-👤 <b>Имя:</b> {name}
-📱 <b>Контакт:</b> {contact}
-📅 <b>Дата:</b> {slot_date.strftime('%d.%m.%Y')}
-🕐 <b>Время:</b> {slot_time}
-💡 <b>Сценарий:</b> {type_labels.get(booking_type, booking_type)}
-💬 <b>Комментарий:</b> {comment if comment else 'нет'}
-💳 <b>Предоплата:</b> {'✅ чек приложен' if receipt_cdn_url else '⏳ ожидается'}
-"""
+        message = format_booking_message(booking[:6], bool(receipt_cdn_url))
         
+        # Бот общий для всех мастеров, чат у каждого свой
         bot_token = os.environ.get('TELEGRAM_BOT_TOKEN')
-        chat_id = os.environ.get('TELEGRAM_CHAT_ID')
+        chat_id = tenant['telegram_chat_id']
         
         if not bot_token or not chat_id:
             cur.execute("""
@@ -125,8 +171,6 @@ def handler(event: dict, context) -> dict:
                 WHERE id = %s
             """, (booking_id,))
             conn.commit()
-            cur.close()
-            conn.close()
             
             return {
                 'statusCode': 200,
@@ -140,8 +184,9 @@ def handler(event: dict, context) -> dict:
                 'isBase64Encoded': False
             }
         
+        http = get_http_session()
         telegram_url = f'https://api.telegram.org/bot{bot_token}/sendMessage'
-        response = requests.post(telegram_url, json={
+        response = http.post(telegram_url, json={
             'chat_id': chat_id,
             'text': message,
             'parse_mode': 'HTML'
@@ -160,21 +205,19 @@ def handler(event: dict, context) -> dict:
                 'isBase64Encoded': False
             }
         
-        cur.execute("""
-            SELECT photo_url FROM booking_photos WHERE booking_id = %s
-        """, (booking_id,))
+        execute(cur, 'booking_photo_urls', (booking_id,))
         
         photos = cur.fetchall()
         for photo in photos:
             photo_url = photo[0]
-            requests.post(f'https://api.telegram.org/bot{bot_token}/sendPhoto', json={
+            http.post(f'https://api.telegram.org/bot{bot_token}/sendPhoto', json={
                 'chat_id': chat_id,
                 'photo': photo_url,
                 'caption': '📸 Примеры работ от клиента'
             })
         
         if receipt_cdn_url:
-            requests.post(f'https://api.telegram.org/bot{bot_token}/sendPhoto', json={
+            http.post(f'https://api.telegram.org/bot{bot_token}/sendPhoto', json={
                 'chat_id': chat_id,
                 'photo': receipt_cdn_url,
                 'caption': '💳 Чек об оплате предоплаты'
@@ -192,8 +235,6 @@ def handler(event: dict, context) -> dict:
             """, (booking_id,))
         
         conn.commit()
-        cur.close()
-        conn.close()
         
         return {
             'statusCode': 200,
@@ -208,6 +249,7 @@ def handler(event: dict, context) -> dict:
         }
         
     except Exception as e:
+        print(json.dumps({'event': 'error', 'function': 'telegram', 'method': method, 'error': repr(e)}, ensure_ascii=False))
         return {
             'statusCode': 500,
             'headers': {
@@ -216,6 +258,8 @@ def handler(event: dict, context) -> dict:
                 'Access-Control-Allow-Credentials': 'true',
                 **SECURITY_HEADERS
             },
-            'body': json.dumps({'error': str(e)}),
+            'body': json.dumps({'error': 'Внутренняя ошибка, попробуйте позже'}),
             'isBase64Encoded': False
-        }
\ No newline at end of file
+        }
+    finally:
+        release(conn)
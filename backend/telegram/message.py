@@ -0,0 +1,21 @@
+TYPE_LABELS = {
+    'know_what_i_want': '✅ Знаю, что хочу',
+    'not_sure': '🤔 Пока не определилась',
+    'no_design': '⭕ Без дизайна'
+}
+
+
+def format_booking_message(booking: tuple, has_receipt: bool) -> str:
+    """Текст уведомления мастеру о новой записи (HTML-разметка Telegram)"""
+    name, contact, booking_type, comment, slot_date, slot_time = booking
+
+    return f"""💅 <b>Новая запись!</b>
+
+👤 <b>Имя:</b> {name}
+📱 <b>Контакт:</b> {contact}
+📅 <b>Дата:</b> {slot_date.strftime('%d.%m.%Y')}
+🕐 <b>Время:</b> {slot_time}
+💡 <b>Сценарий:</b> {TYPE_LABELS.get(booking_type, booking_type)}
+💬 <b>Комментарий:</b> {comment if comment else 'нет'}
+💳 <b>Предоплата:</b> {'✅ чек приложен' if has_receipt else '⏳ ожидается'}
+"""
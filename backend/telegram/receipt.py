@@ -0,0 +1,110 @@
+import base64
+import binascii
+import hashlib
+
+MAX_RECEIPT_SIZE = 5 * 1024 * 1024
+
+VALID_IMAGE_SIGNATURES = {
+    b'\xff\xd8\xff': ('image/jpeg', 'jpg'),
+    b'\x89PNG\r\n\x1a\n': ('image/png', 'png'),
+    b'GIF87a': ('image/gif', 'gif'),
+    b'GIF89a': ('image/gif', 'gif'),
+    b'RIFF': ('image/webp', 'webp')
+}
+
+# 16 символов base64 = 12 байт, этого хватает для любой сигнатуры выше
+SIGNATURE_PREFIX_CHARS = 16
+
+
+class ReceiptError(Exception):
+    """Ошибка проверки чека с HTTP-статусом для ответа"""
+
+    def __init__(self, status_code: int, message: str):
+        super().__init__(message)
+        self.status_code = status_code
+        self.message = message
+
+
+def strip_data_url(payload: str) -> str:
+    """Убирает префикс data:image/...;base64, если он есть"""
+    if payload.startswith('data:'):
+        return payload.split(',', 1)[1] if ',' in payload else ''
+    return payload
+
+
+def estimate_decoded_size(payload: str) -> int:
+    """Размер данных после декодирования base64 без самого декодирования"""
+    length = len(payload)
+    padding = 0
+    if payload.endswith('=='):
+        padding = 2
+    elif payload.endswith('='):
+        padding = 1
+    return (length * 3) // 4 - padding
+
+
+def sniff_bytes_type(head: bytes):
+    """Определяет (content-type, расширение) по сигнатуре в начале файла"""
+    for signature, image_type in VALID_IMAGE_SIGNATURES.items():
+        if head.startswith(signature):
+            return image_type
+    return None
+
+
+def sniff_image_type(payload: str):
+    """Определяет тип изображения по первым байтам base64-строки"""
+    try:
+        head = base64.b64decode(payload[:SIGNATURE_PREFIX_CHARS])
+    except (binascii.Error, ValueError):
+        return None
+    return sniff_bytes_type(head)
+
+
+def prepare_receipt(payload: str) -> dict:
+    """Проверяет размер и формат чека, затем декодирует его целиком"""
+    payload = strip_data_url(payload).strip()
+
+    if not payload:
+        raise ReceiptError(400, 'Пустой файл чека')
+
+    if estimate_decoded_size(payload) > MAX_RECEIPT_SIZE:
+        raise ReceiptError(413, 'Чек слишком большой (максимум 5MB)')
+
+    image_type = sniff_image_type(payload)
+    if not image_type:
+        raise ReceiptError(400, 'Чек не является изображением')
+
+    try:
+        receipt_bytes = base64.b64decode(payload, validate=True)
+    except (binascii.Error, ValueError):
+        raise ReceiptError(400, 'Некорректные данные чека')
+
+    content_type, extension = image_type
+    return {
+        'bytes': receipt_bytes,
+        'content_type': content_type,
+        'extension': extension,
+        'md5': hashlib.md5(receipt_bytes).hexdigest()
+    }
+
+
+
+def receipt_from_bytes(receipt_bytes: bytes) -> dict:
+    """То же, что prepare_receipt, для чека, пришедшего двоичной частью multipart"""
+    if not receipt_bytes:
+        raise ReceiptError(400, 'Пустой файл чека')
+
+    if len(receipt_bytes) > MAX_RECEIPT_SIZE:
+        raise ReceiptError(413, 'Чек слишком большой (максимум 5MB)')
+
+    image_type = sniff_bytes_type(receipt_bytes)
+    if not image_type:
+        raise ReceiptError(400, 'Чек не является изображением')
+
+    content_type, extension = image_type
+    return {
+        'bytes': receipt_bytes,
+        'content_type': content_type,
+        'extension': extension,
+        'md5': hashlib.md5(receipt_bytes).hexdigest()
+    }
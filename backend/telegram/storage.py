@@ -0,0 +1,427 @@
+import hashlib
+import io
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+DELETE_BATCH_SIZE = 1000
+
+_storage = None
+_storage_lock = threading.Lock()
+
+
+def _env_int(name: str, default: int) -> int:
+    return int(os.environ.get(name, default))
+
+
+class S3Storage:
+    """Хранилище файлов в S3-совместимом бакете с общим пулом соединений"""
+
+    def __init__(self, endpoint: str, bucket: str, access_key: str, secret_key: str, public_base: str,
+                 max_pool_connections: int = 10, max_concurrency: int = 4,
+                 multipart_threshold: int = 8 * 1024 * 1024):
+        import boto3
+        from boto3.s3.transfer import TransferConfig
+        from botocore.config import Config
+
+        self.bucket = bucket
+        self.public_base = public_base.rstrip('/')
+        self.max_concurrency = max_concurrency
+        self.multipart_threshold = multipart_threshold
+        self.client = boto3.client('s3',
+            endpoint_url=endpoint,
+            aws_access_key_id=access_key,
+            aws_secret_access_key=secret_key,
+            config=Config(max_pool_connections=max_pool_connections, retries={'max_attempts': 3})
+        )
+        self.transfer_config = TransferConfig(
+            multipart_threshold=multipart_threshold,
+            multipart_chunksize=multipart_threshold,
+            max_concurrency=max_concurrency
+        )
+
+    def public_url(self, key: str) -> str:
+        return f'{self.public_base}/{key}'
+
+    def put(self, key: str, data: bytes, content_type: str, cache_control: str = '') -> dict:
+        """Загружает объект; большие файлы уходят multipart-загрузкой в несколько потоков"""
+        md5 = hashlib.md5(data).hexdigest()
+        extra = {'ContentType': content_type, 'Metadata': {'md5': md5}}
+        if cache_control:
+            extra['CacheControl'] = cache_control
+
+        if len(data) >= self.multipart_threshold:
+            self.client.upload_fileobj(io.BytesIO(data), self.bucket, key,
+                                       ExtraArgs=extra, Config=self.transfer_config)
+        else:
+            self.client.put_object(Bucket=self.bucket, Key=key, Body=data, **extra)
+
+        return {'key': key, 'size': len(data), 'md5': md5}
+
+    def get(self, key: str):
+        try:
+            response = self.client.get_object(Bucket=self.bucket, Key=key)
+        except self.client.exceptions.NoSuchKey:
+            return None
+        return response['Body'].read()
+
+    def head(self, key: str):
+        """Метаданные объекта или None, если его нет"""
+        try:
+            response = self.client.head_object(Bucket=self.bucket, Key=key)
+        except Exception:
+            return None
+        etag = response.get('ETag', '').strip('"')
+        return {
+            'key': key,
+            'size': response.get('ContentLength', 0),
+            'etag': etag,
+            'md5': response.get('Metadata', {}).get('md5', etag),
+            'content_type': response.get('ContentType', ''),
+            'last_modified': response.get('LastModified')
+        }
+
+    def list(self, prefix: str, start_after: str = ''):
+        """Постранично перечисляет объекты под префиксом, начиная после указанного ключа"""
+        paginator = self.client.get_paginator('list_objects_v2')
+        params = {'Bucket': self.bucket, 'Prefix': prefix}
+        if start_after:
+            params['StartAfter'] = start_after
+        for page in paginator.paginate(**params):
+            yield [{
+                'key': obj['Key'],
+                'size': obj.get('Size', 0),
+                'etag': obj.get('ETag', '').strip('"'),
+                'last_modified': obj.get('LastModified')
+            } for obj in page.get('Contents', [])]
+
+    def _delete_batch(self, keys: list) -> dict:
+        response = self.client.delete_objects(
+            Bucket=self.bucket,
+            Delete={'Objects': [{'Key': key} for key in keys], 'Quiet': True}
+        )
+        errors = response.get('Errors', [])
+        failed = {error['Key'] for error in errors}
+        return {
+            'deleted': [key for key in keys if key not in failed],
+            'errors': [f"{error['Key']}: {error.get('Message', error.get('Code', ''))}" for error in errors]
+        }
+
+    def put_many(self, items: list) -> list:
+        return _parallel(self.max_concurrency, lambda item: self.put(*item), items)
+
+    def delete_many(self, sizes: dict) -> dict:
+        return _delete_many(self, sizes)
+
+    def list_prefixes(self, prefixes: list):
+        return _list_prefixes(self, prefixes)
+
+    def delete_prefixes(self, prefixes: list) -> dict:
+        return _delete_prefixes(self, prefixes)
+
+
+class LocalStorage:
+    """Хранилище в локальной папке с той же семантикой, что и S3 — для тестов и бенчмарков"""
+
+    META_DIR = '.meta'
+    TMP_MARKER = '.tmp'
+
+    def __init__(self, root: str, public_base: str = '', max_concurrency: int = 4):
+        self.root = os.path.abspath(root)
+        self.public_base = (public_base or f'file://{self.root}').rstrip('/')
+        self.max_concurrency = max_concurrency
+        os.makedirs(self.root, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        path = os.path.abspath(os.path.join(self.root, key))
+        if not path.startswith(self.root + os.sep):
+            raise ValueError(f'Недопустимый ключ: {key}')
+        return path
+
+    def _meta_path(self, key: str) -> str:
+        return self._path(os.path.join(self.META_DIR, key + '.json'))
+
+    def public_url(self, key: str) -> str:
+        return f'{self.public_base}/{key}'
+
+    def put(self, key: str, data: bytes, content_type: str, cache_control: str = '') -> dict:
+        md5 = hashlib.md5(data).hexdigest()
+        path = self._path(key)
+        meta_path = self._meta_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.makedirs(os.path.dirname(meta_path), exist_ok=True)
+
+        # Запись через временный файл, чтобы читатели не видели половину объекта
+        tmp_path = f'{path}{self.TMP_MARKER}{threading.get_ident()}'
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+        with open(meta_path, 'w') as f:
+            json.dump({'content_type': content_type, 'md5': md5, 'cache_control': cache_control}, f)
+
+        return {'key': key, 'size': len(data), 'md5': md5}
+
+    def get(self, key: str):
+        try:
+            with open(self._path(key), 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def head(self, key: str):
+        path = self._path(key)
+        if not os.path.isfile(path):
+            return None
+        try:
+            with open(self._meta_path(key)) as f:
+                meta = json.load(f)
+        except FileNotFoundError:
+            meta = {}
+        stat = os.stat(path)
+        return {
+            'key': key,
+            'size': stat.st_size,
+            'etag': meta.get('md5', ''),
+            'md5': meta.get('md5', ''),
+            'content_type': meta.get('content_type', 'application/octet-stream'),
+            'last_modified': datetime.fromtimestamp(stat.st_mtime, timezone.utc)
+        }
+
+    @classmethod
+    def _is_temp(cls, filename: str) -> bool:
+        """Временный файл незавершённой записи: <имя>.tmp<id потока>, как в put"""
+        _, marker, thread_id = filename.rpartition(cls.TMP_MARKER)
+        return bool(marker) and thread_id.isdigit()
+
+    def list(self, prefix: str, start_after: str = '', page_size: int = 1000):
+        # Обход начинается с папки префикса, а не со всего корня
+        directory = os.path.dirname(prefix)
+        top = self._path(directory) if directory else self.root
+        keys = []
+        for dirpath, dirnames, filenames in os.walk(top):
+            if dirpath == self.root and self.META_DIR in dirnames:
+                dirnames.remove(self.META_DIR)
+            for filename in filenames:
+                key = os.path.relpath(os.path.join(dirpath, filename), self.root).replace(os.sep, '/')
+                if key.startswith(prefix) and key > start_after and not self._is_temp(filename):
+                    keys.append(key)
+        keys.sort()
+
+        for i in range(0, len(keys), page_size):
+            page = []
+            for key in keys[i:i + page_size]:
+                head = self.head(key)
+                if head:
+                    page.append({key_: head[key_] for key_ in ('key', 'size', 'etag', 'last_modified')})
+            yield page
+
+    def _delete_batch(self, keys: list) -> dict:
+        deleted = []
+        errors = []
+        for key in keys:
+            try:
+                os.remove(self._path(key))
+                deleted.append(key)
+            except FileNotFoundError:
+                deleted.append(key)
+            except OSError as e:
+                errors.append(f'{key}: {e}')
+                continue
+            try:
+                os.remove(self._meta_path(key))
+            except FileNotFoundError:
+                pass
+        return {'deleted': deleted, 'errors': errors}
+
+    def put_many(self, items: list) -> list:
+        return _parallel(self.max_concurrency, lambda item: self.put(*item), items)
+
+    def delete_many(self, sizes: dict) -> dict:
+        return _delete_many(self, sizes)
+
+    def list_prefixes(self, prefixes: list):
+        return _list_prefixes(self, prefixes)
+
+    def delete_prefixes(self, prefixes: list) -> dict:
+        return _delete_prefixes(self, prefixes)
+
+
+def _parallel(max_workers: int, func, items: list) -> list:
+    """Выполняет func для каждого элемента в пуле потоков, сохраняя порядок результатов"""
+    if len(items) <= 1:
+        return [func(item) for item in items]
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(items))) as pool:
+        return list(pool.map(func, items))
+
+
+def _delete_many(storage, sizes: dict) -> dict:
+    """Удаляет ключи пакетами по 1000 в несколько потоков; sizes — {ключ: размер}"""
+    keys = list(sizes)
+    batches = [keys[i:i + DELETE_BATCH_SIZE] for i in range(0, len(keys), DELETE_BATCH_SIZE)]
+
+    objects_deleted = 0
+    bytes_freed = 0
+    errors = []
+
+    if batches:
+        with ThreadPoolExecutor(max_workers=min(storage.max_concurrency, len(batches))) as pool:
+            futures = [pool.submit(storage._delete_batch, batch) for batch in batches]
+            for future in futures:
+                try:
+                    result = future.result()
+                except Exception as e:
+                    errors.append(str(e))
+                    continue
+                objects_deleted += len(result['deleted'])
+                bytes_freed += sum(sizes[key] for key in result['deleted'])
+                errors.extend(result['errors'])
+
+    return {
+        'objects_deleted': objects_deleted,
+        'bytes_freed': bytes_freed,
+        'errors': errors
+    }
+
+
+# Серия id для одного прохода по диапазону: разрыв между соседними id не больше этого
+RANGE_MAX_GAP = 8
+# Сколько чужих ключей на префикс серии можно пролистать, прежде чем перейти на LIST по префиксам
+RANGE_SCAN_SLACK = 4
+
+
+def _prefix_groups(prefixes: list) -> list:
+    """Делит префиксы вида <родитель>/<id>/ на плотные серии: [(родитель, [префиксы]), ...].
+
+    В серию попадают id одной длины с разрывом не больше RANGE_MAX_GAP — тогда ключи серии лежат
+    в узком диапазоне по алфавиту и перечисляются одним проходом по родителю. Разреженные id
+    (между ними по алфавиту лежат чужие ключи, в том числе длинные id с теми же цифрами в начале)
+    остаются одиночными и перечисляются обычным LIST по своему префиксу.
+    """
+    runs = {}
+    groups = []
+    for prefix in set(prefixes):
+        parent, _, name = prefix.rstrip('/').rpartition('/')
+        if not name.isdigit():
+            groups.append(('', [prefix]))
+            continue
+        runs.setdefault((parent + '/' if parent else '', len(name)), []).append((int(name), prefix))
+
+    for (parent, _), items in runs.items():
+        items.sort()
+        run = [items[0]]
+        for item in items[1:]:
+            if item[0] - run[-1][0] > RANGE_MAX_GAP:
+                groups.append((parent, [prefix for _, prefix in run]))
+                run = []
+            run.append(item)
+        groups.append((parent, [prefix for _, prefix in run]))
+    return groups
+
+
+def _scan_group(storage, parent: str, group: list):
+    if len(group) == 1:
+        for page in storage.list(group[0]):
+            yield from page
+        return
+
+    first, last = group[0], group[-1]
+    targets = set(group)
+    # Чужие ключи внутри диапазона: если их слишком много, оставшиеся префиксы перечисляются по одному
+    foreign = 0
+    foreign_limit = RANGE_SCAN_SLACK * len(group)
+    # StartAfter без завершающего «/» меньше любого ключа под первым префиксом
+    for page in storage.list(parent, start_after=first[:-1]):
+        for obj in page:
+            key = obj['key']
+            # Ключи идут по алфавиту: после последнего префикса группы искать нечего
+            if key > last and not key.startswith(last):
+                return
+            if key[:len(first)] in targets:
+                yield obj
+                continue
+            foreign += 1
+            if foreign > foreign_limit:
+                # Префиксы до текущего ключа уже пройдены целиком, остальные ещё не начинались
+                for prefix in group:
+                    if prefix > key:
+                        for rest in storage.list(prefix):
+                            yield from rest
+                return
+
+
+def _list_prefixes(storage, prefixes: list):
+    """Объекты под префиксами: (объект, None) или (None, ошибка) — по одному проходу на группу"""
+    for parent, group in _prefix_groups(prefixes):
+        try:
+            for obj in _scan_group(storage, parent, group):
+                yield obj, None
+        except Exception as e:
+            yield None, f'{group[0]}..{group[-1]}: {e}' if len(group) > 1 else f'{group[0]}: {e}'
+
+
+def _delete_prefixes(storage, prefixes: list) -> dict:
+    """Удаляет все объекты под указанными префиксами"""
+    sizes = {}
+    errors = []
+
+    for obj, error in _list_prefixes(storage, prefixes):
+        if error:
+            errors.append(error)
+        else:
+            sizes[obj['key']] = obj['size']
+
+    result = _delete_many(storage, sizes)
+    result['errors'] = errors + result['errors']
+    return result
+
+
+def get_storage():
+    """Хранилище создаётся при первом обращении и переиспользуется между вызовами"""
+    global _storage
+    if _storage is None:
+        with _storage_lock:
+            if _storage is None:
+                _storage = _create_storage()
+    return _storage
+
+
+def storage_settings() -> dict:
+    """Настройки хранилища из переменных окружения"""
+    access_key = os.environ.get('AWS_ACCESS_KEY_ID', '')
+    return {
+        'backend': os.environ.get('STORAGE_BACKEND', 's3'),
+        'local_root': os.environ.get('STORAGE_LOCAL_ROOT', '/tmp/storage'),
+        'endpoint': os.environ.get('STORAGE_ENDPOINT', 'https://bucket.poehali.dev'),
+        'bucket': os.environ.get('STORAGE_BUCKET', 'files'),
+        'access_key': access_key,
+        'secret_key': os.environ.get('AWS_SECRET_ACCESS_KEY', ''),
+        'public_base': os.environ.get('STORAGE_PUBLIC_URL', f'https://cdn.poehali.dev/projects/{access_key}/bucket'),
+        'max_pool_connections': _env_int('STORAGE_MAX_POOL_CONNECTIONS', 10),
+        'max_concurrency': _env_int('STORAGE_MAX_CONCURRENCY', 4),
+        'multipart_threshold': _env_int('STORAGE_MULTIPART_THRESHOLD_MB', 8) * 1024 * 1024
+    }
+
+
+def _create_storage():
+    settings = storage_settings()
+
+    if settings['backend'] == 'local':
+        return LocalStorage(
+            root=settings['local_root'],
+            public_base=os.environ.get('STORAGE_PUBLIC_URL', ''),
+            max_concurrency=settings['max_concurrency']
+        )
+
+    return S3Storage(
+        endpoint=settings['endpoint'],
+        bucket=settings['bucket'],
+        access_key=settings['access_key'],
+        secret_key=settings['secret_key'],
+        public_base=settings['public_base'],
+        max_pool_connections=settings['max_pool_connections'],
+        max_concurrency=settings['max_concurrency'],
+        multipart_threshold=settings['multipart_threshold']
+    )
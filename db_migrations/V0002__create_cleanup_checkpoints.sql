@@ -0,0 +1,8 @@
+-- Контрольные точки очистки: позволяют продолжить прерванный по таймауту запуск
+CREATE TABLE IF NOT EXISTS cleanup_checkpoints (
+    job VARCHAR(50) PRIMARY KEY,
+    cutoff_date DATE NOT NULL,
+    pending_booking_ids INTEGER[] NOT NULL DEFAULT '{}',
+    bookings_deleted INTEGER NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
@@ -0,0 +1,254 @@
+-- Переводим time_slots, bookings и booking_photos на секционирование по месяцу слота.
+-- Очистка и архивирование становятся отсоединением целых секций вместо построчного DELETE.
+
+-- Старые таблицы и их индексы переименовываем, чтобы освободить имена
+ALTER TABLE booking_photos RENAME TO booking_photos_legacy;
+ALTER TABLE bookings RENAME TO bookings_legacy;
+ALTER TABLE time_slots RENAME TO time_slots_legacy;
+
+ALTER INDEX IF EXISTS time_slots_pkey RENAME TO time_slots_legacy_pkey;
+ALTER INDEX IF EXISTS time_slots_slot_date_slot_time_key RENAME TO time_slots_legacy_slot_date_slot_time_key;
+ALTER INDEX IF EXISTS bookings_pkey RENAME TO bookings_legacy_pkey;
+ALTER INDEX IF EXISTS booking_photos_pkey RENAME TO booking_photos_legacy_pkey;
+ALTER INDEX IF EXISTS idx_slots_date RENAME TO idx_slots_date_legacy;
+ALTER INDEX IF EXISTS idx_bookings_slot RENAME TO idx_bookings_slot_legacy;
+ALTER INDEX IF EXISTS idx_bookings_status RENAME TO idx_bookings_status_legacy;
+ALTER INDEX IF EXISTS idx_photos_booking RENAME TO idx_photos_booking_legacy;
+
+-- Последовательности переживут удаление старых таблиц и сохранят нумерацию
+ALTER SEQUENCE time_slots_id_seq OWNED BY NONE;
+ALTER SEQUENCE bookings_id_seq OWNED BY NONE;
+ALTER SEQUENCE booking_photos_id_seq OWNED BY NONE;
+
+-- Таблица слотов времени
+CREATE TABLE time_slots (
+    id INTEGER NOT NULL DEFAULT nextval('time_slots_id_seq'),
+    slot_date DATE NOT NULL,
+    slot_time TIME NOT NULL,
+    is_available BOOLEAN DEFAULT true,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id, slot_date),
+    UNIQUE (slot_date, slot_time)
+) PARTITION BY RANGE (slot_date);
+
+-- Таблица заявок на запись (slot_date дублируется из слота как ключ секционирования)
+CREATE TABLE bookings (
+    id INTEGER NOT NULL DEFAULT nextval('bookings_id_seq'),
+    slot_id INTEGER NOT NULL,
+    slot_date DATE NOT NULL,
+    client_name VARCHAR(255) NOT NULL,
+    client_contact VARCHAR(255) NOT NULL,
+    booking_type VARCHAR(50) NOT NULL CHECK (booking_type IN ('know_what_i_want', 'not_sure', 'no_design')),
+    comment TEXT,
+    payment_status VARCHAR(50) DEFAULT 'pending' CHECK (payment_status IN ('pending', 'paid', 'cancelled')),
+    receipt_url TEXT,
+    telegram_sent BOOLEAN DEFAULT false,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id, slot_date),
+    CONSTRAINT bookings_slot_fk FOREIGN KEY (slot_id, slot_date) REFERENCES time_slots (id, slot_date)
+) PARTITION BY RANGE (slot_date);
+
+-- Таблица фотографий к заявкам
+CREATE TABLE booking_photos (
+    id INTEGER NOT NULL DEFAULT nextval('booking_photos_id_seq'),
+    booking_id INTEGER NOT NULL,
+    slot_date DATE NOT NULL,
+    photo_url TEXT NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id, slot_date),
+    CONSTRAINT booking_photos_booking_fk FOREIGN KEY (booking_id, slot_date) REFERENCES bookings (id, slot_date)
+) PARTITION BY RANGE (slot_date);
+
+ALTER SEQUENCE time_slots_id_seq OWNED BY time_slots.id;
+ALTER SEQUENCE bookings_id_seq OWNED BY bookings.id;
+ALTER SEQUENCE booking_photos_id_seq OWNED BY booking_photos.id;
+
+-- Архив: сюда переезжают секции прошедших месяцев, если историю нужно сохранить
+CREATE TABLE time_slots_archive (
+    id INTEGER NOT NULL,
+    slot_date DATE NOT NULL,
+    slot_time TIME NOT NULL,
+    is_available BOOLEAN DEFAULT true,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id, slot_date)
+) PARTITION BY RANGE (slot_date);
+
+CREATE TABLE bookings_archive (
+    id INTEGER NOT NULL,
+    slot_id INTEGER NOT NULL,
+    slot_date DATE NOT NULL,
+    client_name VARCHAR(255) NOT NULL,
+    client_contact VARCHAR(255) NOT NULL,
+    booking_type VARCHAR(50) NOT NULL,
+    comment TEXT,
+    payment_status VARCHAR(50) DEFAULT 'pending',
+    receipt_url TEXT,
+    telegram_sent BOOLEAN DEFAULT false,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id, slot_date)
+) PARTITION BY RANGE (slot_date);
+
+CREATE TABLE booking_photos_archive (
+    id INTEGER NOT NULL,
+    booking_id INTEGER NOT NULL,
+    slot_date DATE NOT NULL,
+    photo_url TEXT NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id, slot_date)
+) PARTITION BY RANGE (slot_date);
+
+-- Создаёт месячные секции всех трёх таблиц начиная с месяца from_date
+CREATE OR REPLACE FUNCTION ensure_booking_partitions(from_date DATE, months_ahead INTEGER)
+RETURNS INTEGER AS $$
+DECLARE
+    month_start DATE := date_trunc('month', from_date)::date;
+    month_end DATE;
+    suffix TEXT;
+    created INTEGER := 0;
+BEGIN
+    FOR i IN 0..months_ahead LOOP
+        month_end := (month_start + INTERVAL '1 month')::date;
+        suffix := to_char(month_start, 'YYYY_MM');
+
+        IF to_regclass('time_slots_p' || suffix) IS NULL THEN
+            EXECUTE format('CREATE TABLE %I PARTITION OF time_slots FOR VALUES FROM (%L) TO (%L)',
+                           'time_slots_p' || suffix, month_start, month_end);
+            created := created + 1;
+        END IF;
+
+        IF to_regclass('bookings_p' || suffix) IS NULL THEN
+            EXECUTE format('CREATE TABLE %I PARTITION OF bookings FOR VALUES FROM (%L) TO (%L)',
+                           'bookings_p' || suffix, month_start, month_end);
+            created := created + 1;
+        END IF;
+
+        IF to_regclass('booking_photos_p' || suffix) IS NULL THEN
+            EXECUTE format('CREATE TABLE %I PARTITION OF booking_photos FOR VALUES FROM (%L) TO (%L)',
+                           'booking_photos_p' || suffix, month_start, month_end);
+            created := created + 1;
+        END IF;
+
+        month_start := month_end;
+    END LOOP;
+
+    RETURN created;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Отсоединяет секции месяца от рабочих таблиц и переносит их в архив или удаляет
+CREATE OR REPLACE FUNCTION retire_booking_partition(month_start DATE, keep_history BOOLEAN)
+RETURNS VOID AS $$
+DECLARE
+    suffix TEXT := to_char(month_start, 'YYYY_MM');
+    month_end DATE := (date_trunc('month', month_start) + INTERVAL '1 month')::date;
+    part TEXT;
+    fk RECORD;
+BEGIN
+    -- Порядок важен: сначала ссылающиеся таблицы, затем слоты
+    FOREACH part IN ARRAY ARRAY['booking_photos', 'bookings', 'time_slots'] LOOP
+        IF to_regclass(part || '_p' || suffix) IS NULL THEN
+            CONTINUE;
+        END IF;
+
+        EXECUTE format('ALTER TABLE %I DETACH PARTITION %I', part, part || '_p' || suffix);
+
+        -- Внешние ключи отсоединённой секции остаются и мешают отсоединить слоты
+        FOR fk IN
+            SELECT conname FROM pg_constraint
+            WHERE conrelid = (part || '_p' || suffix)::regclass AND contype = 'f'
+        LOOP
+            EXECUTE format('ALTER TABLE %I DROP CONSTRAINT %I', part || '_p' || suffix, fk.conname);
+        END LOOP;
+
+        IF keep_history THEN
+            EXECUTE format('ALTER TABLE %I ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+                           part || '_archive', part || '_p' || suffix, month_start, month_end);
+        ELSE
+            EXECUTE format('DROP TABLE %I', part || '_p' || suffix);
+        END IF;
+    END LOOP;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Секции под существующие данные и на год вперёд
+DO $$
+DECLARE
+    first_date DATE := LEAST(COALESCE((SELECT MIN(slot_date) FROM time_slots_legacy), CURRENT_DATE), CURRENT_DATE);
+    last_date DATE := GREATEST(COALESCE((SELECT MAX(slot_date) FROM time_slots_legacy), CURRENT_DATE), (CURRENT_DATE + INTERVAL '12 months')::date);
+    span INTERVAL := age(date_trunc('month', last_date), date_trunc('month', first_date));
+BEGIN
+    PERFORM ensure_booking_partitions(first_date, (EXTRACT(YEAR FROM span) * 12 + EXTRACT(MONTH FROM span))::int);
+END;
+$$;
+
+-- Переносим данные
+INSERT INTO time_slots (id, slot_date, slot_time, is_available, created_at)
+SELECT id, slot_date, slot_time, is_available, created_at
+FROM time_slots_legacy;
+
+INSERT INTO bookings (id, slot_id, slot_date, client_name, client_contact, booking_type,
+                      comment, payment_status, receipt_url, telegram_sent, created_at)
+SELECT b.id, b.slot_id, ts.slot_date, b.client_name, b.client_contact, b.booking_type,
+       b.comment, b.payment_status, b.receipt_url, b.telegram_sent, b.created_at
+FROM bookings_legacy b
+JOIN time_slots_legacy ts ON b.slot_id = ts.id;
+
+INSERT INTO booking_photos (id, booking_id, slot_date, photo_url, created_at)
+SELECT p.id, p.booking_id, ts.slot_date, p.photo_url, p.created_at
+FROM booking_photos_legacy p
+JOIN bookings_legacy b ON p.booking_id = b.id
+JOIN time_slots_legacy ts ON b.slot_id = ts.id;
+
+-- Заявки без слота (slot_id NULL или ссылка на удалённый слот) и их фото не попадают в секции:
+-- без даты слота у них нет ключа секционирования. Сохраняем их как есть, а не теряем вместе с legacy
+CREATE TABLE bookings_orphaned AS
+SELECT b.* FROM bookings_legacy b
+WHERE NOT EXISTS (SELECT 1 FROM time_slots_legacy ts WHERE ts.id = b.slot_id);
+
+CREATE TABLE booking_photos_orphaned AS
+SELECT p.* FROM booking_photos_legacy p
+WHERE NOT EXISTS (
+    SELECT 1 FROM bookings_legacy b
+    JOIN time_slots_legacy ts ON b.slot_id = ts.id
+    WHERE b.id = p.booking_id
+);
+
+-- Старые таблицы удаляются безвозвратно: сначала сверяем, что каждая строка куда-то перенесена
+DO $$
+DECLARE
+    expected BIGINT;
+    moved BIGINT;
+BEGIN
+    SELECT COUNT(*) INTO expected FROM time_slots_legacy;
+    SELECT COUNT(*) INTO moved FROM time_slots;
+    IF moved <> expected THEN
+        RAISE EXCEPTION 'Перенос слотов: % строк вместо %', moved, expected;
+    END IF;
+
+    SELECT COUNT(*) INTO expected FROM bookings_legacy;
+    SELECT (SELECT COUNT(*) FROM bookings) + (SELECT COUNT(*) FROM bookings_orphaned) INTO moved;
+    IF moved <> expected THEN
+        RAISE EXCEPTION 'Перенос заявок: % строк вместо %', moved, expected;
+    END IF;
+
+    SELECT COUNT(*) INTO expected FROM booking_photos_legacy;
+    SELECT (SELECT COUNT(*) FROM booking_photos) + (SELECT COUNT(*) FROM booking_photos_orphaned) INTO moved;
+    IF moved <> expected THEN
+        RAISE EXCEPTION 'Перенос фото: % строк вместо %', moved, expected;
+    END IF;
+END;
+$$;
+
+DROP TABLE booking_photos_legacy;
+DROP TABLE bookings_legacy;
+DROP TABLE time_slots_legacy;
+
+-- Индексы создаются на родительских таблицах и наследуются секциями
+CREATE INDEX idx_bookings_slot ON bookings(slot_id);
+CREATE INDEX idx_bookings_status ON bookings(payment_status);
+CREATE INDEX idx_photos_booking ON booking_photos(booking_id);
+
+-- Контрольная точка очистки теперь указывает на секцию и последнюю заявку с удалёнными файлами
+ALTER TABLE cleanup_checkpoints DROP COLUMN pending_booking_ids;
+ALTER TABLE cleanup_checkpoints ADD COLUMN partition_month DATE;
+ALTER TABLE cleanup_checkpoints ADD COLUMN last_booking_id INTEGER NOT NULL DEFAULT 0;
@@ -0,0 +1,13 @@
+-- Медленные запросы обработчиков с планами EXPLAIN; пишутся при SLOW_QUERY_TABLE=1
+CREATE TABLE IF NOT EXISTS slow_queries (
+    id SERIAL PRIMARY KEY,
+    captured_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    function_name VARCHAR(50) NOT NULL,
+    query_name VARCHAR(100),
+    sql_text TEXT NOT NULL,
+    row_count INTEGER,
+    duration_ms NUMERIC(12, 3) NOT NULL,
+    plan TEXT
+);
+
+CREATE INDEX IF NOT EXISTS idx_slow_queries_captured_at ON slow_queries(captured_at);
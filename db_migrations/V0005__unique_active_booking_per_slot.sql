@@ -0,0 +1,5 @@
+-- Не больше одной активной заявки на слот; отменённые заявки слот не занимают.
+-- Индекс на секционированной таблице включает ключ секционирования и создаётся в каждой секции
+CREATE UNIQUE INDEX IF NOT EXISTS idx_bookings_active_slot
+    ON bookings (slot_id, slot_date)
+    WHERE payment_status <> 'cancelled';
@@ -0,0 +1,63 @@
+-- Время последнего изменения строк для инкрементальной синхронизации админки
+ALTER TABLE time_slots ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP;
+ALTER TABLE bookings ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP;
+ALTER TABLE booking_photos ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP;
+
+-- Архивные таблицы должны совпадать по составу колонок, иначе секцию к ним не присоединить
+ALTER TABLE time_slots_archive ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP;
+ALTER TABLE bookings_archive ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP;
+ALTER TABLE booking_photos_archive ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP;
+
+CREATE INDEX IF NOT EXISTS idx_time_slots_updated_at ON time_slots(updated_at);
+CREATE INDEX IF NOT EXISTS idx_bookings_updated_at ON bookings(updated_at);
+CREATE INDEX IF NOT EXISTS idx_booking_photos_updated_at ON booking_photos(updated_at);
+
+-- Надгробия удалённых строк: по ним клиент узнаёт, что убрать из своей копии
+CREATE TABLE IF NOT EXISTS sync_tombstones (
+    id BIGSERIAL PRIMARY KEY,
+    table_name VARCHAR(50) NOT NULL,
+    row_id INTEGER NOT NULL,
+    parent_id INTEGER,
+    deleted_at TIMESTAMP NOT NULL DEFAULT clock_timestamp()
+);
+
+CREATE INDEX IF NOT EXISTS idx_sync_tombstones_deleted_at ON sync_tombstones(deleted_at);
+
+-- clock_timestamp(), а не now(): время изменения строки, а не начала транзакции
+CREATE OR REPLACE FUNCTION touch_updated_at()
+RETURNS TRIGGER AS $$
+BEGIN
+    NEW.updated_at := clock_timestamp();
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Имя таблицы передаётся аргументом: TG_TABLE_NAME в секции — это имя секции.
+-- Для фото в parent_id сохраняется заявка: её список фото у клиента нужно обновить
+CREATE OR REPLACE FUNCTION record_sync_tombstone()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_ARGV[0] = 'booking_photos' THEN
+        INSERT INTO sync_tombstones (table_name, row_id, parent_id) VALUES (TG_ARGV[0], OLD.id, OLD.booking_id);
+    ELSE
+        INSERT INTO sync_tombstones (table_name, row_id) VALUES (TG_ARGV[0], OLD.id);
+    END IF;
+    RETURN OLD;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Триггеры на секционированных таблицах наследуются всеми секциями, в том числе будущими.
+-- Отсоединение секции при очистке строки не удаляет, поэтому надгробий не создаёт
+CREATE TRIGGER time_slots_touch_updated_at BEFORE INSERT OR UPDATE ON time_slots
+    FOR EACH ROW EXECUTE FUNCTION touch_updated_at();
+CREATE TRIGGER bookings_touch_updated_at BEFORE INSERT OR UPDATE ON bookings
+    FOR EACH ROW EXECUTE FUNCTION touch_updated_at();
+CREATE TRIGGER booking_photos_touch_updated_at BEFORE INSERT OR UPDATE ON booking_photos
+    FOR EACH ROW EXECUTE FUNCTION touch_updated_at();
+
+CREATE TRIGGER time_slots_sync_tombstone AFTER DELETE ON time_slots
+    FOR EACH ROW EXECUTE FUNCTION record_sync_tombstone('time_slots');
+CREATE TRIGGER bookings_sync_tombstone AFTER DELETE ON bookings
+    FOR EACH ROW EXECUTE FUNCTION record_sync_tombstone('bookings');
+CREATE TRIGGER booking_photos_sync_tombstone AFTER DELETE ON booking_photos
+    FOR EACH ROW EXECUTE FUNCTION record_sync_tombstone('booking_photos');
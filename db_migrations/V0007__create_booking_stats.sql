@@ -0,0 +1,47 @@
+-- Сводка заявок для дашборда админки: число заявок по дню, статусу оплаты и типу записи.
+-- Поддерживается триггером на каждую запись в bookings, поэтому чтение не пересчитывает всю таблицу
+CREATE TABLE IF NOT EXISTS booking_stats (
+    slot_date DATE NOT NULL,
+    payment_status VARCHAR(50) NOT NULL,
+    booking_type VARCHAR(50) NOT NULL,
+    bookings INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (slot_date, payment_status, booking_type)
+);
+
+CREATE OR REPLACE FUNCTION maintain_booking_stats()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        UPDATE booking_stats SET bookings = bookings - 1
+        WHERE slot_date = OLD.slot_date
+          AND payment_status = COALESCE(OLD.payment_status, 'pending')
+          AND booking_type = OLD.booking_type;
+    END IF;
+
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO booking_stats (slot_date, payment_status, booking_type, bookings)
+        VALUES (NEW.slot_date, COALESCE(NEW.payment_status, 'pending'), NEW.booking_type, 1)
+        ON CONFLICT (slot_date, payment_status, booking_type)
+        DO UPDATE SET bookings = booking_stats.bookings + 1;
+    END IF;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Обновления, не меняющие ключ сводки (фото, чек, telegram_sent), триггер не вызывают
+CREATE TRIGGER bookings_stats_insert_delete AFTER INSERT OR DELETE ON bookings
+    FOR EACH ROW EXECUTE FUNCTION maintain_booking_stats();
+CREATE TRIGGER bookings_stats_update AFTER UPDATE OF slot_date, payment_status, booking_type ON bookings
+    FOR EACH ROW
+    WHEN (OLD.slot_date IS DISTINCT FROM NEW.slot_date
+          OR OLD.payment_status IS DISTINCT FROM NEW.payment_status
+          OR OLD.booking_type IS DISTINCT FROM NEW.booking_type)
+    EXECUTE FUNCTION maintain_booking_stats();
+
+-- Начальное заполнение по уже существующим заявкам
+INSERT INTO booking_stats (slot_date, payment_status, booking_type, bookings)
+SELECT slot_date, COALESCE(payment_status, 'pending'), booking_type, COUNT(*)
+FROM bookings
+GROUP BY 1, 2, 3
+ON CONFLICT (slot_date, payment_status, booking_type) DO UPDATE SET bookings = EXCLUDED.bookings;
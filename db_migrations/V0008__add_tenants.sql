@@ -0,0 +1,94 @@
+-- Несколько мастеров (салонов) на одном развёртывании: у каждой строки есть владелец-арендатор.
+-- Все существующие данные принадлежат арендатору default, настройки которого по-прежнему берутся из окружения
+CREATE TABLE IF NOT EXISTS tenants (
+    id SERIAL PRIMARY KEY,
+    slug VARCHAR(50) UNIQUE NOT NULL,
+    name VARCHAR(255) NOT NULL,
+    telegram_chat_id VARCHAR(64),
+    admin_password_hash VARCHAR(255),
+    -- Префикс ключей в хранилище; у default пустой, чтобы не переносить существующие файлы.
+    -- Новым арендаторам задаётся свой, например 'tenants/<slug>/'
+    storage_prefix VARCHAR(100) NOT NULL DEFAULT '',
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+INSERT INTO tenants (id, slug, name) VALUES (1, 'default', 'Основной мастер')
+ON CONFLICT (id) DO NOTHING;
+SELECT setval('tenants_id_seq', GREATEST((SELECT MAX(id) FROM tenants), 1));
+
+-- Таблица сессий раньше создавалась функцией auth при первом входе
+CREATE TABLE IF NOT EXISTS admin_sessions (
+    id SERIAL PRIMARY KEY,
+    token VARCHAR(64) UNIQUE NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    expires_at TIMESTAMP NOT NULL
+);
+
+ALTER TABLE time_slots ADD COLUMN IF NOT EXISTS tenant_id INTEGER NOT NULL DEFAULT 1 REFERENCES tenants(id);
+ALTER TABLE bookings ADD COLUMN IF NOT EXISTS tenant_id INTEGER NOT NULL DEFAULT 1 REFERENCES tenants(id);
+ALTER TABLE booking_photos ADD COLUMN IF NOT EXISTS tenant_id INTEGER NOT NULL DEFAULT 1 REFERENCES tenants(id);
+ALTER TABLE admin_sessions ADD COLUMN IF NOT EXISTS tenant_id INTEGER NOT NULL DEFAULT 1 REFERENCES tenants(id);
+ALTER TABLE sync_tombstones ADD COLUMN IF NOT EXISTS tenant_id INTEGER NOT NULL DEFAULT 1;
+ALTER TABLE booking_stats ADD COLUMN IF NOT EXISTS tenant_id INTEGER NOT NULL DEFAULT 1;
+
+-- Архивные таблицы должны совпадать по составу колонок, иначе секцию к ним не присоединить
+ALTER TABLE time_slots_archive ADD COLUMN IF NOT EXISTS tenant_id INTEGER NOT NULL DEFAULT 1;
+ALTER TABLE bookings_archive ADD COLUMN IF NOT EXISTS tenant_id INTEGER NOT NULL DEFAULT 1;
+ALTER TABLE booking_photos_archive ADD COLUMN IF NOT EXISTS tenant_id INTEGER NOT NULL DEFAULT 1;
+
+-- Одно и то же время может быть занято у разных мастеров
+ALTER TABLE time_slots DROP CONSTRAINT IF EXISTS time_slots_slot_date_slot_time_key;
+ALTER TABLE time_slots ADD CONSTRAINT time_slots_tenant_slot_key UNIQUE (tenant_id, slot_date, slot_time);
+
+-- Индексы начинаются с tenant_id: запрос одного мастера читает только его строки,
+-- и его стоимость не растёт с числом арендаторов
+DROP INDEX IF EXISTS idx_time_slots_updated_at;
+DROP INDEX IF EXISTS idx_bookings_updated_at;
+DROP INDEX IF EXISTS idx_booking_photos_updated_at;
+DROP INDEX IF EXISTS idx_sync_tombstones_deleted_at;
+
+CREATE INDEX IF NOT EXISTS idx_time_slots_tenant_updated_at ON time_slots(tenant_id, updated_at);
+CREATE INDEX IF NOT EXISTS idx_bookings_tenant_created_at ON bookings(tenant_id, created_at DESC);
+CREATE INDEX IF NOT EXISTS idx_bookings_tenant_updated_at ON bookings(tenant_id, updated_at);
+CREATE INDEX IF NOT EXISTS idx_booking_photos_tenant_updated_at ON booking_photos(tenant_id, updated_at);
+CREATE INDEX IF NOT EXISTS idx_sync_tombstones_tenant_deleted_at ON sync_tombstones(tenant_id, deleted_at);
+-- Очистка надгробий идёт по всем арендаторам сразу
+CREATE INDEX IF NOT EXISTS idx_sync_tombstones_deleted_at ON sync_tombstones(deleted_at);
+
+ALTER TABLE booking_stats DROP CONSTRAINT IF EXISTS booking_stats_pkey;
+ALTER TABLE booking_stats ADD PRIMARY KEY (tenant_id, slot_date, payment_status, booking_type);
+
+CREATE OR REPLACE FUNCTION record_sync_tombstone()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_ARGV[0] = 'booking_photos' THEN
+        INSERT INTO sync_tombstones (tenant_id, table_name, row_id, parent_id)
+        VALUES (OLD.tenant_id, TG_ARGV[0], OLD.id, OLD.booking_id);
+    ELSE
+        INSERT INTO sync_tombstones (tenant_id, table_name, row_id) VALUES (OLD.tenant_id, TG_ARGV[0], OLD.id);
+    END IF;
+    RETURN OLD;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION maintain_booking_stats()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        UPDATE booking_stats SET bookings = bookings - 1
+        WHERE tenant_id = OLD.tenant_id
+          AND slot_date = OLD.slot_date
+          AND payment_status = COALESCE(OLD.payment_status, 'pending')
+          AND booking_type = OLD.booking_type;
+    END IF;
+
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO booking_stats (tenant_id, slot_date, payment_status, booking_type, bookings)
+        VALUES (NEW.tenant_id, NEW.slot_date, COALESCE(NEW.payment_status, 'pending'), NEW.booking_type, 1)
+        ON CONFLICT (tenant_id, slot_date, payment_status, booking_type)
+        DO UPDATE SET bookings = booking_stats.bookings + 1;
+    END IF;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
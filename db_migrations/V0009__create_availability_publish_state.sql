@@ -0,0 +1,13 @@
+-- Признак «снимок свободных слотов устарел» по арендатору.
+-- Запись, не получившая блокировку публикации, только ставит признак; держатель блокировки
+-- публикует заново, пока признак не сброшен, так что последняя запись наплыва не теряется
+CREATE TABLE IF NOT EXISTS availability_publish_state (
+    tenant_id INTEGER PRIMARY KEY REFERENCES tenants(id) ON DELETE CASCADE,
+    dirty BOOLEAN NOT NULL DEFAULT false,
+    marked_at TIMESTAMP
+);
+
+-- Снимки ещё не публиковались по новой схеме: первый же публикатор перестроит их для всех
+INSERT INTO availability_publish_state (tenant_id, dirty, marked_at)
+SELECT id, true, CURRENT_TIMESTAMP FROM tenants
+ON CONFLICT (tenant_id) DO NOTHING;
@@ -0,0 +1,33 @@
+-- Сводка дашборда без горячей строки: все заявки на один день раньше увеличивали одну и ту же
+-- строку booking_stats, и одновременные записи на этот день выстраивались в очередь за её блокировкой.
+-- Теперь счётчик разбит на шарды; шард выбирается по процессу сервера, так что параллельные
+-- транзакции почти всегда обновляют разные строки, а читатель суммирует шарды
+ALTER TABLE booking_stats ADD COLUMN IF NOT EXISTS shard SMALLINT NOT NULL DEFAULT 0;
+
+ALTER TABLE booking_stats DROP CONSTRAINT IF EXISTS booking_stats_pkey;
+ALTER TABLE booking_stats ADD PRIMARY KEY (tenant_id, slot_date, payment_status, booking_type, shard);
+
+CREATE OR REPLACE FUNCTION maintain_booking_stats()
+RETURNS TRIGGER AS $$
+DECLARE
+    -- Число шардов на ключ сводки; изменение не требует пересчёта, суммы остаются верными
+    stats_shard SMALLINT := pg_backend_pid() % 8;
+BEGIN
+    -- Уменьшение тоже идёт в свой шард: отдельный шард может уйти в минус, сумма — нет
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        INSERT INTO booking_stats (tenant_id, slot_date, payment_status, booking_type, shard, bookings)
+        VALUES (OLD.tenant_id, OLD.slot_date, COALESCE(OLD.payment_status, 'pending'), OLD.booking_type, stats_shard, -1)
+        ON CONFLICT (tenant_id, slot_date, payment_status, booking_type, shard)
+        DO UPDATE SET bookings = booking_stats.bookings - 1;
+    END IF;
+
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO booking_stats (tenant_id, slot_date, payment_status, booking_type, shard, bookings)
+        VALUES (NEW.tenant_id, NEW.slot_date, COALESCE(NEW.payment_status, 'pending'), NEW.booking_type, stats_shard, 1)
+        ON CONFLICT (tenant_id, slot_date, payment_status, booking_type, shard)
+        DO UPDATE SET bookings = booking_stats.bookings + 1;
+    END IF;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
@@ -1,9 +1,11 @@
-import { useState, useEffect } from 'react';
+import { useState, useEffect, useRef } from 'react';
 import { Card, CardContent, CardHeader, CardTitle } from '@/components/ui/card';
 import { Button } from '@/components/ui/button';
 import { useToast } from '@/hooks/use-toast';
 import Icon from '@/components/ui/icon';
 import { ScrollArea } from '@/components/ui/scroll-area';
+import { fetchChanges, mergeById, SYNC_INTERVAL_MS } from '@/lib/adminSync';
+import type { InitialData } from '@/lib/adminDashboard';
 import {
   Dialog,
   DialogContent,
@@ -12,7 +14,7 @@ import {
   DialogDescription,
 } from '@/components/ui/dialog';
 
-interface Booking {
+export interface Booking {
   id: number;
   slot_id: number;
   name: string;
@@ -26,20 +28,31 @@ interface Booking {
   created_at: string;
 }
 
-const AdminBookings = () => {
-  const [bookings, setBookings] = useState<Booking[]>([]);
+interface AdminBookingsProps {
+  initial?: InitialData<Booking>;
+}
+
+const AdminBookings = ({ initial }: AdminBookingsProps) => {
+  const [bookings, setBookings] = useState<Booking[]>(initial?.items ?? []);
   const [selectedBooking, setSelectedBooking] = useState<Booking | null>(null);
   const [isDetailOpen, setIsDetailOpen] = useState(false);
+  const cursorRef = useRef<string | null>(initial?.cursor ?? null);
   const { toast } = useToast();
 
   useEffect(() => {
-    fetchBookings();
+    if (!initial) {
+      fetchBookings();
+    }
+    // Опрос забирает только изменения с прошлого раза, а не весь список
+    const interval = setInterval(syncBookings, SYNC_INTERVAL_MS);
+    return () => clearInterval(interval);
   }, []);
 
   const fetchBookings = async () => {
     try {
       const token = localStorage.getItem('admin_token');
-      const response = await fetch('https://functions.poehali.dev/406a4a18-71da-46ec-a8a4-efc9c7c87810', {
+      // Полный список задаёт курсор синхронизации, поэтому читаем его с основной базы, а не с реплики
+      const response = await fetch('https://functions.poehali.dev/406a4a18-71da-46ec-a8a4-efc9c7c87810?consistent=1', {
         headers: {
           'X-Admin-Token': token || ''
         }
@@ -47,6 +60,7 @@ const AdminBookings = () => {
       const data = await response.json();
       
       if (Array.isArray(data)) {
+        cursorRef.current = response.headers.get('X-Sync-Cursor');
         setBookings(data);
       } else {
         toast({
@@ -64,6 +78,32 @@ const AdminBookings = () => {
     }
   };
 
+  const syncBookings = async () => {
+    if (!cursorRef.current) {
+      fetchBookings();
+      return;
+    }
+
+    try {
+      const changes = await fetchChanges<Booking, never>(cursorRef.current);
+
+      if (changes.reset) {
+        fetchBookings();
+        return;
+      }
+
+      cursorRef.current = changes.cursor;
+      if (changes.bookings?.length || changes.deleted_bookings?.length) {
+        setBookings((current) =>
+          mergeById(current, changes.bookings, changes.deleted_bookings)
+            .sort((a, b) => (b.created_at || '').localeCompare(a.created_at || ''))
+        );
+      }
+    } catch (error) {
+      // Следующий опрос повторит запрос с тем же курсором
+    }
+  };
+
   const getTypeLabel = (type: string) => {
     const labels: Record<string, string> = {
       'know_what_i_want': 'Знаю, что хочу',
@@ -99,7 +139,7 @@ const AdminBookings = () => {
           title: 'Успешно',
           description: 'Заявка удалена, слот освобожден'
         });
-        fetchBookings();
+        syncBookings();
       } else {
         const data = await response.json();
         toast({
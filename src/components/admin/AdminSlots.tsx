@@ -1,9 +1,11 @@
-import { useState, useEffect } from 'react';
+import { useState, useEffect, useRef } from 'react';
 import { Button } from '@/components/ui/button';
 import { Input } from '@/components/ui/input';
 import { Label } from '@/components/ui/label';
 import { Card, CardContent, CardHeader, CardTitle } from '@/components/ui/card';
 import { useToast } from '@/hooks/use-toast';
+import { fetchChanges, mergeById, INITIAL_CURSOR, SYNC_INTERVAL_MS } from '@/lib/adminSync';
+import type { InitialData } from '@/lib/adminDashboard';
 import Icon from '@/components/ui/icon';
 import Calendar from 'react-calendar';
 import 'react-calendar/dist/Calendar.css';
@@ -15,29 +17,43 @@ import {
   DialogTrigger,
   DialogDescription,
 } from '@/components/ui/dialog';
+import { withTenant } from '@/lib/tenant';
 
-interface TimeSlot {
+export interface TimeSlot {
   id: number;
   date: string;
   time: string;
   available: boolean;
 }
 
-const AdminSlots = () => {
-  const [slots, setSlots] = useState<TimeSlot[]>([]);
+interface AdminSlotsProps {
+  initial?: InitialData<TimeSlot>;
+}
+
+const AdminSlots = ({ initial }: AdminSlotsProps) => {
+  const [slots, setSlots] = useState<TimeSlot[]>(initial?.items ?? []);
   const [selectedDate, setSelectedDate] = useState<Date | null>(null);
   const [newSlotTime, setNewSlotTime] = useState('');
   const [isAddDialogOpen, setIsAddDialogOpen] = useState(false);
+  const cursorRef = useRef<string | null>(initial?.cursor ?? null);
   const { toast } = useToast();
 
   useEffect(() => {
-    fetchSlots();
+    // Данные дашборда уже загружены: дальше достаточно синхронизации по курсору
+    if (!initial) {
+      fetchSlots();
+    }
+    const interval = setInterval(syncSlots, SYNC_INTERVAL_MS);
+    return () => clearInterval(interval);
   }, []);
 
   const fetchSlots = async () => {
     try {
-      const response = await fetch('https://functions.poehali.dev/9689b825-c9ac-49db-b85b-f1310460470d');
+      // Сначала берём курсор, потом полный список с основной базы: изменения между ними придут при синхронизации
+      const { cursor } = await fetchChanges<never, TimeSlot>(INITIAL_CURSOR);
+      const response = await fetch(withTenant('https://functions.poehali.dev/9689b825-c9ac-49db-b85b-f1310460470d?consistent=1'));
       const data = await response.json();
+      cursorRef.current = cursor;
       setSlots(data);
     } catch (error) {
       toast({
@@ -48,6 +64,32 @@ const AdminSlots = () => {
     }
   };
 
+  const syncSlots = async () => {
+    if (!cursorRef.current) {
+      fetchSlots();
+      return;
+    }
+
+    try {
+      const changes = await fetchChanges<never, TimeSlot>(cursorRef.current);
+
+      if (changes.reset) {
+        fetchSlots();
+        return;
+      }
+
+      cursorRef.current = changes.cursor;
+      if (changes.slots?.length || changes.deleted_slots?.length) {
+        setSlots((current) =>
+          mergeById(current, changes.slots, changes.deleted_slots)
+            .sort((a, b) => `${a.date} ${a.time}`.localeCompare(`${b.date} ${b.time}`))
+        );
+      }
+    } catch (error) {
+      // Следующий опрос повторит запрос с тем же курсором
+    }
+  };
+
   const handleAddSlot = async () => {
     if (!selectedDate || !newSlotTime) {
       toast({
@@ -87,7 +129,7 @@ const AdminSlots = () => {
         });
         setNewSlotTime('');
         setIsAddDialogOpen(false);
-        fetchSlots();
+        syncSlots();
       } else {
         toast({
           title: 'Ошибка',
@@ -122,7 +164,7 @@ const AdminSlots = () => {
           title: 'Успешно',
           description: 'Слот удален'
         });
-        fetchSlots();
+        syncSlots();
       } else {
         throw new Error('Failed to delete slot');
       }
@@ -198,7 +240,7 @@ const AdminSlots = () => {
           title: 'Успешно',
           description: `Слот ${time} добавлен`
         });
-        fetchSlots();
+        syncSlots();
       } else {
         toast({
           title: 'Ошибка',
@@ -0,0 +1,72 @@
+import { Card, CardContent, CardHeader, CardTitle } from '@/components/ui/card';
+import type { DashboardStats } from '@/lib/adminDashboard';
+
+const STATUS_LABELS: Record<string, string> = {
+  pending: 'Ожидают оплаты',
+  paid: 'Оплачено',
+  cancelled: 'Отменено'
+};
+
+const TYPE_LABELS: Record<string, string> = {
+  know_what_i_want: 'Знаю, что хочу',
+  not_sure: 'Не определилась',
+  no_design: 'Без дизайна'
+};
+
+interface AdminStatsProps {
+  stats: DashboardStats;
+}
+
+const AdminStats = ({ stats }: AdminStatsProps) => {
+  const today = new Date();
+  const todayStr = `${today.getFullYear()}-${String(today.getMonth() + 1).padStart(2, '0')}-${String(today.getDate()).padStart(2, '0')}`;
+  const upcomingDays = stats.by_day.filter((day) => day.date >= todayStr).slice(0, 7);
+
+  return (
+    <Card>
+      <CardHeader>
+        <CardTitle>Сводка за {stats.days} дн. и вперёд: {stats.total} заявок</CardTitle>
+      </CardHeader>
+      <CardContent className="grid gap-6 md:grid-cols-3">
+        <div>
+          <p className="text-sm text-muted-foreground mb-2">По статусу оплаты</p>
+          {Object.entries(stats.by_status).map(([status, count]) => (
+            <div key={status} className="flex justify-between">
+              <span>{STATUS_LABELS[status] || status}</span>
+              <span className="font-medium">{count}</span>
+            </div>
+          ))}
+        </div>
+        <div>
+          <p className="text-sm text-muted-foreground mb-2">По типу записи</p>
+          {Object.entries(stats.by_type).map(([type, count]) => (
+            <div key={type} className="flex justify-between">
+              <span>{TYPE_LABELS[type] || type}</span>
+              <span className="font-medium">{count}</span>
+            </div>
+          ))}
+        </div>
+        <div>
+          <p className="text-sm text-muted-foreground mb-2">Ближайшие дни</p>
+          {upcomingDays.length === 0 ? (
+            <p className="text-muted-foreground">Записей нет</p>
+          ) : (
+            upcomingDays.map((day) => {
+              const [year, month, date] = day.date.split('-').map(Number);
+              return (
+                <div key={day.date} className="flex justify-between">
+                  <span>
+                    {new Date(year, month - 1, date).toLocaleDateString('ru-RU', { day: 'numeric', month: 'short' })}
+                  </span>
+                  <span className="font-medium">{day.count}</span>
+                </div>
+              );
+            })
+          )}
+        </div>
+      </CardContent>
+    </Card>
+  );
+};
+
+export default AdminStats;
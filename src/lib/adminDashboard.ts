@@ -0,0 +1,39 @@
+const BOOKINGS_URL = 'https://functions.poehali.dev/406a4a18-71da-46ec-a8a4-efc9c7c87810';
+
+export interface DashboardStats {
+  days: number;
+  by_day: { date: string; count: number }[];
+  by_status: Record<string, number>;
+  by_type: Record<string, number>;
+  total: number;
+}
+
+export interface Dashboard<TBooking, TSlot> {
+  cursor: string;
+  slots: TSlot[];
+  bookings: TBooking[];
+  stats: DashboardStats;
+}
+
+// Начальные данные вкладки: список и курсор, с которого продолжается синхронизация
+export interface InitialData<T> {
+  items: T[];
+  cursor: string;
+}
+
+// Слоты, заявки и сводка одним вызовом вместо отдельных запросов каждой вкладки
+export const fetchDashboard = async <TBooking, TSlot>(): Promise<Dashboard<TBooking, TSlot>> => {
+  const token = localStorage.getItem('admin_token');
+  const response = await fetch(`${BOOKINGS_URL}?view=dashboard`, {
+    headers: {
+      'X-Admin-Token': token || ''
+    }
+  });
+  const data = await response.json();
+
+  if (!response.ok) {
+    throw new Error(data.error || 'Не удалось загрузить данные админки');
+  }
+
+  return data;
+};
@@ -0,0 +1,44 @@
+const BOOKINGS_URL = 'https://functions.poehali.dev/406a4a18-71da-46ec-a8a4-efc9c7c87810';
+
+export const SYNC_INTERVAL_MS = 30000;
+
+// Курсор, который сервер гарантированно сочтёт устаревшим и вернёт reset со свежим курсором
+export const INITIAL_CURSOR = '1970-01-01T00:00:00';
+
+export interface SyncChanges<TBooking, TSlot> {
+  cursor: string;
+  reset: boolean;
+  bookings?: TBooking[];
+  deleted_bookings?: number[];
+  slots?: TSlot[];
+  deleted_slots?: number[];
+}
+
+export const fetchChanges = async <TBooking, TSlot>(since: string): Promise<SyncChanges<TBooking, TSlot>> => {
+  const token = localStorage.getItem('admin_token');
+  const response = await fetch(`${BOOKINGS_URL}?since=${encodeURIComponent(since)}`, {
+    headers: {
+      'X-Admin-Token': token || ''
+    }
+  });
+  const data = await response.json();
+
+  if (!response.ok) {
+    throw new Error(data.error || 'Не удалось получить изменения');
+  }
+
+  return data;
+};
+
+export const mergeById = <T extends { id: number }>(items: T[], changed: T[] = [], deleted: number[] = []): T[] => {
+  const removed = new Set(deleted);
+  const byId = new Map(items.filter((item) => !removed.has(item.id)).map((item) => [item.id, item]));
+
+  changed.forEach((item) => {
+    if (!removed.has(item.id)) {
+      byId.set(item.id, item);
+    }
+  });
+
+  return Array.from(byId.values());
+};
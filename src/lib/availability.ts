@@ -0,0 +1,51 @@
+import { decodeCompactSlots, type CompactSlots } from '@/lib/compactSlots';
+import { withTenant } from '@/lib/tenant';
+
+const SLOTS_URL = 'https://functions.poehali.dev/9689b825-c9ac-49db-b85b-f1310460470d';
+
+// Манифест снимков в CDN; без него календарь читается из функции slots
+const MANIFEST_URL = import.meta.env.VITE_AVAILABILITY_MANIFEST_URL as string | undefined;
+
+export interface AvailabilitySlot {
+  id: number;
+  date: string;
+  time: string;
+  available: boolean;
+}
+
+interface AvailabilityManifest {
+  generated_at: string;
+  months: Record<string, { version: string; url: string; slots: number }>;
+}
+
+const fetchJson = async <T>(url: string): Promise<T> => {
+  const response = await fetch(url);
+  if (!response.ok) {
+    throw new Error(`HTTP ${response.status}`);
+  }
+  return response.json();
+};
+
+const loadFromSnapshots = async (manifestUrl: string): Promise<AvailabilitySlot[]> => {
+  const manifest = await fetchJson<AvailabilityManifest>(manifestUrl);
+  const months = await Promise.all(
+    Object.keys(manifest.months)
+      .sort()
+      .map((month) => fetchJson<AvailabilitySlot[]>(manifest.months[month].url))
+  );
+  // Снимок мог быть собран вчера: прошедшие дни отбрасываем так же, как это делает функция
+  const now = new Date();
+  const today = `${now.getFullYear()}-${String(now.getMonth() + 1).padStart(2, '0')}-${String(now.getDate()).padStart(2, '0')}`;
+  return months.flat().filter((slot) => slot.date >= today);
+};
+
+export const loadSlots = async (): Promise<AvailabilitySlot[]> => {
+  if (MANIFEST_URL) {
+    try {
+      return await loadFromSnapshots(MANIFEST_URL);
+    } catch (error) {
+      // CDN недоступен или снимок ещё не опубликован — читаем из функции
+    }
+  }
+  return decodeCompactSlots(await fetchJson<CompactSlots>(withTenant(`${SLOTS_URL}?format=compact`)));
+};
@@ -0,0 +1,56 @@
+// Декодер компактного формата slots GET (?format=compact), см. backend/slots/compact.py
+export const COMPACT_MEDIA_TYPE = 'application/vnd.slots.compact+json';
+
+export interface CompactSlots {
+  v: number;
+  d: string | null;
+  dd: number[];
+  n: number[];
+  t: number[];
+  i: number[];
+  a: string;
+}
+
+export interface DecodedSlot {
+  id: number;
+  date: string;
+  time: string;
+  available: boolean;
+}
+
+const DAY_MS = 24 * 60 * 60 * 1000;
+
+const pad = (value: number) => String(value).padStart(2, '0');
+
+export const decodeCompactSlots = (payload: CompactSlots): DecodedSlot[] => {
+  if (payload.v !== 1) {
+    throw new Error(`Неизвестная версия формата слотов: ${payload.v}`);
+  }
+  if (!payload.d) {
+    return [];
+  }
+
+  const bitmap = atob(payload.a);
+  // Даты считаются в UTC, чтобы смещения в днях не зависели от часового пояса браузера
+  const firstDay = Date.parse(`${payload.d}T00:00:00Z`);
+  const slots: DecodedSlot[] = new Array(payload.t.length);
+
+  let index = 0;
+  let id = 0;
+  payload.dd.forEach((offset, group) => {
+    const date = new Date(firstDay + offset * DAY_MS).toISOString().slice(0, 10);
+
+    for (let k = 0; k < payload.n[group]; k++, index++) {
+      id += payload.i[index];
+      const minutes = payload.t[index];
+      slots[index] = {
+        id,
+        date,
+        time: `${pad(Math.floor(minutes / 60))}:${pad(minutes % 60)}:00`,
+        available: ((bitmap.charCodeAt(index >> 3) >> (index & 7)) & 1) === 1
+      };
+    }
+  });
+
+  return slots;
+};
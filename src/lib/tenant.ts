@@ -0,0 +1,9 @@
+// Мастер, которому принадлежит этот сайт; без него запросы идут к основному мастеру развёртывания
+export const TENANT = import.meta.env.VITE_TENANT as string | undefined;
+
+export const withTenant = (url: string): string => {
+  if (!TENANT) {
+    return url;
+  }
+  return `${url}${url.includes('?') ? '&' : '?'}tenant=${encodeURIComponent(TENANT)}`;
+};
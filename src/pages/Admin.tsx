@@ -6,14 +6,19 @@ import { Card, CardContent, CardHeader, CardTitle } from '@/components/ui/card';
 import { Tabs, TabsContent, TabsList, TabsTrigger } from '@/components/ui/tabs';
 import { useToast } from '@/hooks/use-toast';
 import Icon from '@/components/ui/icon';
-import AdminSlots from '@/components/admin/AdminSlots';
-import AdminBookings from '@/components/admin/AdminBookings';
+import AdminSlots, { type TimeSlot } from '@/components/admin/AdminSlots';
+import AdminBookings, { type Booking } from '@/components/admin/AdminBookings';
+import AdminStats from '@/components/admin/AdminStats';
+import { fetchDashboard, type Dashboard } from '@/lib/adminDashboard';
+import { withTenant } from '@/lib/tenant';
 
 const Admin = () => {
   const [isAuthenticated, setIsAuthenticated] = useState(false);
   const [password, setPassword] = useState('');
   const [isLoading, setIsLoading] = useState(false);
   const [tokenExpiry, setTokenExpiry] = useState<string | null>(null);
+  const [dashboard, setDashboard] = useState<Dashboard<Booking, TimeSlot> | null>(null);
+  const [isDashboardLoaded, setIsDashboardLoaded] = useState(false);
   const { toast } = useToast();
 
   useEffect(() => {
@@ -33,6 +38,20 @@ const Admin = () => {
     checkAuth();
   }, []);
 
+  useEffect(() => {
+    if (!isAuthenticated) {
+      setDashboard(null);
+      setIsDashboardLoaded(false);
+      return;
+    }
+
+    // Один вызов вместо отдельных запросов вкладок; при ошибке вкладки загрузят данные сами
+    fetchDashboard<Booking, TimeSlot>()
+      .then(setDashboard)
+      .catch(() => setDashboard(null))
+      .finally(() => setIsDashboardLoaded(true));
+  }, [isAuthenticated]);
+
   const handleLogin = async () => {
     if (!password) {
       toast({
@@ -46,7 +65,7 @@ const Admin = () => {
     setIsLoading(true);
 
     try {
-      const response = await fetch('https://functions.poehali.dev/a6d698fe-c92a-4d08-b994-4fc13e0a8679', {
+      const response = await fetch(withTenant('https://functions.poehali.dev/a6d698fe-c92a-4d08-b994-4fc13e0a8679'), {
         method: 'POST',
         headers: { 'Content-Type': 'application/json' },
         body: JSON.stringify({ password })
@@ -184,27 +203,33 @@ const Admin = () => {
         </div>
       </nav>
 
-      <div className="container mx-auto px-6 py-8">
-        <Tabs defaultValue="slots" className="space-y-6">
-          <TabsList className="grid w-full max-w-md grid-cols-2">
-            <TabsTrigger value="slots">
-              <Icon name="Calendar" size={18} className="mr-2" />
-              Слоты
-            </TabsTrigger>
-            <TabsTrigger value="bookings">
-              <Icon name="Users" size={18} className="mr-2" />
-              Заявки
-            </TabsTrigger>
-          </TabsList>
-
-          <TabsContent value="slots">
-            <AdminSlots />
-          </TabsContent>
-
-          <TabsContent value="bookings">
-            <AdminBookings />
-          </TabsContent>
-        </Tabs>
+      <div className="container mx-auto px-6 py-8 space-y-6">
+        {dashboard && <AdminStats stats={dashboard.stats} />}
+
+        {!isDashboardLoaded ? (
+          <div className="text-center py-12 text-muted-foreground">Загрузка...</div>
+        ) : (
+          <Tabs defaultValue="slots" className="space-y-6">
+            <TabsList className="grid w-full max-w-md grid-cols-2">
+              <TabsTrigger value="slots">
+                <Icon name="Calendar" size={18} className="mr-2" />
+                Слоты
+              </TabsTrigger>
+              <TabsTrigger value="bookings">
+                <Icon name="Users" size={18} className="mr-2" />
+                Заявки
+              </TabsTrigger>
+            </TabsList>
+
+            <TabsContent value="slots">
+              <AdminSlots initial={dashboard ? { items: dashboard.slots, cursor: dashboard.cursor } : undefined} />
+            </TabsContent>
+
+            <TabsContent value="bookings">
+              <AdminBookings initial={dashboard ? { items: dashboard.bookings, cursor: dashboard.cursor } : undefined} />
+            </TabsContent>
+          </Tabs>
+        )}
       </div>
     </div>
   );
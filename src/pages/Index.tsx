@@ -6,6 +6,9 @@ import PortfolioSection from '@/components/sections/PortfolioSection';
 import BookingModal from '@/components/sections/BookingModal';
 import GalleryModal from '@/components/sections/GalleryModal';
 import Icon from '@/components/ui/icon';
+import { loadSlots } from '@/lib/availability';
+import { withTenant } from '@/lib/tenant';
+import { buildForm } from '@/lib/formUpload';
 
 interface TimeSlot {
   id: number;
@@ -102,8 +105,7 @@ const Index = () => {
 
   const fetchSlots = async () => {
     try {
-      const response = await fetch('https://functions.poehali.dev/9689b825-c9ac-49db-b85b-f1310460470d');
-      const data = await response.json();
+      const data = await loadSlots();
       const availableSlots = data.filter((slot: TimeSlot) => slot.available);
       setSlots(availableSlots);
     } catch (error) {
@@ -210,17 +212,15 @@ const Index = () => {
     }
 
     try {
-      const response = await fetch('https://functions.poehali.dev/406a4a18-71da-46ec-a8a4-efc9c7c87810', {
+      const response = await fetch(withTenant('https://functions.poehali.dev/406a4a18-71da-46ec-a8a4-efc9c7c87810'), {
         method: 'POST',
-        headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({
+        body: buildForm({
           slot_id: selectedSlot.id,
           name: formData.name,
           contact: formData.contact,
           type: formData.type,
-          comment: formData.comment,
-          photos: selectedImages
-        })
+          comment: formData.comment
+        }, { photos: selectedImages })
       });
 
       const data = await response.json();
@@ -261,11 +261,7 @@ const Index = () => {
     try {
       const response = await fetch('https://functions.poehali.dev/07e0a713-f93f-4b65-b2a7-9c7d8d9afe18', {
         method: 'POST',
-        headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({
-          booking_id: bookingId,
-          receipt_url: receiptImage
-        })
+        body: buildForm({ booking_id: bookingId }, { receipt: [receiptImage] })
       });
 
       const data = await response.json();
@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк ажиотажа: много клиентов одновременно записываются на несколько новых слотов.
+
+В локальном Postgres (DATABASE_URL) создаются слоты на отдельную дату, после чего
+пул потоков одновременно отправляет заявки в обработчик bookings — напрямую
+в процессе (как в tools/gateway.py) или по HTTP через --url. Проверяется, что ни
+один слот не занят дважды, и выводятся пропускная способность, время ожидания
+блокировки слота и перцентили задержки отдельно для победителей (201) и
+проигравших (409); заявки, отсечённые семафором допуска или таймаутом блокировки
+(503), считаются отдельным исходом.
+
+Запуск:
+    DATABASE_URL=postgres://... python3 tools/bench_booking_rush.py
+    python3 tools/bench_booking_rush.py --clients 200 --slots 10 --photos 0 --photos 3
+    python3 tools/bench_booking_rush.py --url http://127.0.0.1:8000/bookings --json
+    python3 tools/bench_booking_rush.py --clients 200 --max-inflight 4 --admission-wait-ms 200
+"""
+import argparse
+import base64
+import json
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, time as dt_time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import psycopg2
+from gateway import Context, build_event, load_function
+
+# Минимальный PNG: обработчик проверяет только сигнатуру, размер задаёт нагрузку на загрузку
+PHOTO_BYTES = b'\x89PNG\r\n\x1a\n' + os.urandom(200 * 1024)
+PHOTO_DATA_URL = 'data:image/png;base64,' + base64.b64encode(PHOTO_BYTES).decode('ascii')
+
+
+def seed_slots(dsn: str, slot_date: date, count: int) -> list:
+    """Создаёт слоты на дату бенчмарка; дата должна быть свободна, чтобы не задеть настоящие записи"""
+    conn = psycopg2.connect(dsn)
+    cur = conn.cursor()
+    try:
+        cur.execute("SELECT count(*) FROM time_slots WHERE slot_date = %s", (slot_date,))
+        if cur.fetchone()[0]:
+            raise SystemExit(f'На {slot_date} уже есть слоты — выберите другую дату через --date')
+
+        cur.execute("SELECT ensure_booking_partitions(%s::date, 0)", (slot_date,))
+        slot_ids = []
+        for idx in range(count):
+            cur.execute("""
+                INSERT INTO time_slots (slot_date, slot_time, is_available)
+                VALUES (%s, %s, true)
+                RETURNING id
+            """, (slot_date, dt_time(idx // 60, idx % 60)))
+            slot_ids.append(cur.fetchone()[0])
+        conn.commit()
+        return slot_ids
+    finally:
+        cur.close()
+        conn.close()
+
+
+def verify_and_clean(dsn: str, slot_date: date, slot_ids: list, keep: bool) -> dict:
+    """Проверяет, что на каждый слот не больше одной заявки, и удаляет данные бенчмарка"""
+    conn = psycopg2.connect(dsn)
+    cur = conn.cursor()
+    try:
+        cur.execute("""
+            SELECT slot_id, count(*) FROM bookings
+            WHERE slot_date = %s AND slot_id = ANY(%s)
+            GROUP BY slot_id
+        """, (slot_date, slot_ids))
+        per_slot = dict(cur.fetchall())
+
+        cur.execute("""
+            SELECT count(*) FROM time_slots
+            WHERE slot_date = %s AND id = ANY(%s) AND is_available = true
+        """, (slot_date, slot_ids))
+        still_available = cur.fetchone()[0]
+
+        cur.execute("SELECT count(*) FROM booking_photos WHERE slot_date = %s", (slot_date,))
+        photo_rows = cur.fetchone()[0]
+
+        if not keep:
+            cur.execute("DELETE FROM booking_photos WHERE slot_date = %s", (slot_date,))
+            cur.execute("DELETE FROM bookings WHERE slot_date = %s", (slot_date,))
+            cur.execute("DELETE FROM time_slots WHERE slot_date = %s", (slot_date,))
+        conn.commit()
+
+        return {
+            'booked_slots': len(per_slot),
+            'double_booked': sorted(slot_id for slot_id, count in per_slot.items() if count > 1),
+            'still_available': still_available,
+            'photo_rows': photo_rows
+        }
+    finally:
+        cur.close()
+        conn.close()
+
+
+def client_name(client: int) -> str:
+    """Уникальное имя только из букв: validate_name отклоняет цифры, и заявка получила бы 400"""
+    letters = 'абвгдежзик'
+    return 'Клиент ' + ''.join(letters[int(digit)] for digit in str(client))
+
+
+def booking_body(slot_id: int, client: int, photos: int) -> str:
+    return json.dumps({
+        'slot_id': slot_id,
+        'name': client_name(client),
+        'contact': f'+7900{client:07d}',
+        'type': 'know_what_i_want',
+        'comment': 'bench_booking_rush',
+        'photos': [PHOTO_DATA_URL] * photos
+    })
+
+
+def make_sender(url: str, timeout_s: int):
+    """Функция отправки заявки: в процессе через обработчик bookings или по HTTP"""
+    if url:
+        def send(body: str) -> int:
+            request = urllib.request.Request(url, data=body.encode('utf-8'), method='POST',
+                                             headers={'Content-Type': 'application/json'})
+            try:
+                with urllib.request.urlopen(request, timeout=timeout_s) as response:
+                    return response.status
+            except urllib.error.HTTPError as e:
+                return e.code
+        return send, None
+
+    module = load_function('bookings')
+
+    def send(body: str) -> int:
+        event = build_event('POST', '/', '', {'Content-Type': 'application/json'}, body.encode('utf-8'),
+                            '127.0.0.1', 'bench-booking-rush')
+        return module.handler(event, Context('bookings', 'bench-booking-rush', timeout_s * 1000))['statusCode']
+
+    return send, module
+
+
+def percentiles(values: list) -> dict:
+    if not values:
+        return {}
+    ordered = sorted(values)
+
+    def pick(q: float) -> float:
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))], 1)
+
+    return {
+        'p50': pick(0.5),
+        'p90': pick(0.9),
+        'p99': pick(0.99),
+        'max': round(ordered[-1], 1),
+        'mean': round(statistics.fmean(ordered), 1)
+    }
+
+
+def run_scenario(args, send, module, photos: int) -> dict:
+    slot_date = date.fromisoformat(args.date)
+    slot_ids = seed_slots(args.dsn, slot_date, args.slots)
+
+    if module is not None:
+        # Статистика запросов копится за жизнь процесса — сбрасываем её перед сценарием
+        module.execute.__globals__['_stats'].clear()
+
+    start_barrier = threading.Barrier(args.clients)
+    results = []
+
+    def client(idx: int):
+        # Клиенты выбирают слоты по кругу, чтобы на каждый слот приходилась своя очередь
+        body = booking_body(slot_ids[idx % len(slot_ids)], idx, photos)
+        start_barrier.wait()
+        started = time.perf_counter()
+        try:
+            status = send(body)
+        except Exception as e:
+            status = type(e).__name__
+        results.append((status, (time.perf_counter() - started) * 1000))
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.clients) as executor:
+        for idx in range(args.clients):
+            executor.submit(client, idx)
+    elapsed_s = time.perf_counter() - started
+
+    check = verify_and_clean(args.dsn, slot_date, slot_ids, args.keep)
+    by_status = {}
+    for status, _ in results:
+        by_status[str(status)] = by_status.get(str(status), 0) + 1
+
+    report = {
+        'photos': photos,
+        'clients': args.clients,
+        'slots': args.slots,
+        'elapsed_s': round(elapsed_s, 3),
+        'requests_per_s': round(len(results) / elapsed_s, 1),
+        'statuses': by_status,
+        'winners_ms': percentiles([ms for status, ms in results if status == 201]),
+        'losers_ms': percentiles([ms for status, ms in results if status == 409]),
+        **check,
+        # 503 — отдельный исход: заявку отсёк семафор допуска или таймаут блокировки слота
+        'overloaded_ms': percentiles([ms for status, ms in results if status == 503]),
+        # Каждый занятый слот — ровно один 201; без отказов 503 заняты все слоты, которым хватило клиентов.
+        # 400 или исключение означают, что сценарий не измерил борьбу за слоты
+        'ok': (
+            not check['double_booked']
+            and by_status.get('201', 0) == check['booked_slots']
+            and (by_status.get('503', 0) > 0 or check['booked_slots'] == min(args.clients, args.slots))
+            and all(status in (201, 409, 503) for status, _ in results)
+        )
+    }
+
+    if module is not None:
+        stats = module.execute.__globals__['query_stats']()
+        # Время booking_claim — это в основном ожидание блокировки строки слота за соседними транзакциями
+        report['lock_wait_ms'] = stats.get('booking_claim')
+        report['query_stats'] = stats
+
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Одновременная запись множества клиентов на несколько слотов')
+    parser.add_argument('--dsn', default=os.environ.get('DATABASE_URL'), help='Строка подключения к Postgres')
+    parser.add_argument('--clients', type=int, default=200, help='Число одновременных клиентов')
+    parser.add_argument('--slots', type=int, default=10, help='Число новых слотов')
+    parser.add_argument('--photos', type=int, action='append', default=[],
+                        help='Фото в заявке; можно указать несколько раз (по умолчанию 0 и 3)')
+    parser.add_argument('--date', default='2099-12-31', help='Дата слотов бенчмарка, на которой нет настоящих слотов')
+    parser.add_argument('--url', help='Отправлять заявки по HTTP на этот адрес вместо вызова в процессе')
+    parser.add_argument('--timeout', type=int, default=30, help='Таймаут одной заявки в секундах')
+    parser.add_argument('--max-inflight', type=int,
+                        help='BOOKING_MAX_INFLIGHT обработчика в процессе (по умолчанию — число клиентов)')
+    parser.add_argument('--admission-wait-ms', type=int,
+                        help='BOOKING_ADMISSION_WAIT_MS обработчика в процессе (по умолчанию — таймаут заявки)')
+    parser.add_argument('--keep', action='store_true', help='Не удалять созданные слоты и заявки')
+    parser.add_argument('--json', action='store_true', help='Вывести результат в JSON')
+    args = parser.parse_args()
+
+    if not args.dsn:
+        parser.error('нужен --dsn или DATABASE_URL')
+    scenarios = args.photos or [0, 3]
+    if args.keep and len(scenarios) > 1:
+        parser.error('--keep оставляет слоты на дате бенчмарка, поэтому совместим только с одним --photos')
+    if not 0 < args.slots <= 1440:
+        parser.error('--slots должно быть от 1 до 1440')
+
+    if not args.url:
+        # Обработчик в процессе: локальное хранилище и пул, в который помещаются все клиенты
+        os.environ['DATABASE_URL'] = args.dsn
+        os.environ.setdefault('STORAGE_BACKEND', 'local')
+        os.environ.setdefault('STORAGE_LOCAL_ROOT', tempfile.mkdtemp(prefix='bench-rush-'))
+        # Плюс одно соединение фоновому публикатору снимков
+        os.environ.setdefault('DB_POOL_MAX', str(args.clients + 2))
+        # Семафор допуска по умолчанию пропускает всех: измеряется борьба за строку слота, а не отсев.
+        # Меньшие значения показывают, сколько заявок отсекается с 503
+        os.environ['BOOKING_MAX_INFLIGHT'] = str(args.max_inflight or args.clients)
+        os.environ['BOOKING_ADMISSION_WAIT_MS'] = str(
+            args.admission_wait_ms if args.admission_wait_ms is not None else args.timeout * 1000
+        )
+
+    send, module = make_sender(args.url, args.timeout)
+    reports = [run_scenario(args, send, module, photos) for photos in scenarios]
+
+    if args.json:
+        print(json.dumps(reports, indent=2, ensure_ascii=False))
+    else:
+        for report in reports:
+            print(f"фото: {report['photos']}, клиентов: {report['clients']}, слотов: {report['slots']}")
+            print(f"  {report['elapsed_s']} с, {report['requests_per_s']} заявок/с, ответы: {report['statuses']}")
+            print(f"  победители, мс: {report['winners_ms']}")
+            print(f"  проигравшие, мс: {report['losers_ms']}")
+            if report['overloaded_ms']:
+                print(f"  отсечены с 503, мс: {report['overloaded_ms']}")
+            if report.get('lock_wait_ms'):
+                print(f"  ожидание блокировки слота, мс: {report['lock_wait_ms']}")
+            print(f"  занято слотов: {report['booked_slots']}, свободно: {report['still_available']}, "
+                  f"строк фото: {report['photo_rows']}")
+            print(f"  двойные записи: {report['double_booked'] or 'нет'}")
+
+    if not all(report['ok'] for report in reports):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк холодного старта функций из backend/func2url.json.
+
+Для каждой функции в отдельном процессе измеряется время импорта index.py,
+первого вызова handler и повторного (тёплого) вызова, а также какие тяжёлые
+зависимости оказались загружены.
+
+Запуск:
+    python3 tools/bench_startup.py
+    python3 tools/bench_startup.py --runs 10 --json
+    python3 tools/bench_startup.py --event bookings=events/bookings_get.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend')
+HEAVY_MODULES = ['boto3', 'botocore', 'requests', 'psycopg2', 'bcrypt']
+
+CHILD_SCRIPT = r'''
+import json
+import sys
+import time
+
+function_dir, event_json, heavy = sys.argv[1], sys.argv[2], sys.argv[3].split(',')
+
+class Context:
+    request_id = 'bench-startup'
+    function_name = 'bench'
+    def get_remaining_time_in_millis(self):
+        return 30000
+
+sys.path.insert(0, function_dir)
+
+started = time.perf_counter()
+import index
+imported = time.perf_counter()
+
+event = json.loads(event_json)
+error = None
+try:
+    index.handler(event, Context())
+except Exception as e:
+    error = repr(e)
+first = time.perf_counter()
+
+try:
+    index.handler(event, Context())
+except Exception as e:
+    error = error or repr(e)
+warm = time.perf_counter()
+
+print(json.dumps({
+    'import_ms': (imported - started) * 1000,
+    'first_ms': (first - imported) * 1000,
+    'warm_ms': (warm - first) * 1000,
+    'loaded': [name for name in heavy if name in sys.modules],
+    'error': error
+}))
+'''
+
+
+def load_functions() -> list:
+    with open(os.path.join(BACKEND_DIR, 'func2url.json')) as f:
+        return sorted(json.load(f))
+
+
+def run_once(name: str, event: dict) -> dict:
+    function_dir = os.path.abspath(os.path.join(BACKEND_DIR, name))
+    result = subprocess.run(
+        [sys.executable, '-c', CHILD_SCRIPT, function_dir, json.dumps(event), ','.join(HEAVY_MODULES)],
+        capture_output=True, text=True, cwd=function_dir
+    )
+    if result.returncode != 0:
+        return {'error': result.stderr.strip().splitlines()[-1] if result.stderr else 'failed'}
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Холодный старт функций')
+    parser.add_argument('--runs', type=int, default=5, help='Число холодных запусков на функцию')
+    parser.add_argument('--event', action='append', default=[],
+                        help='Событие для функции: имя=путь.json (по умолчанию OPTIONS)')
+    parser.add_argument('--only', action='append', default=[], help='Измерить только эти функции')
+    parser.add_argument('--json', action='store_true', help='Вывести результат в JSON')
+    args = parser.parse_args()
+
+    events = {}
+    for item in args.event:
+        name, path = item.split('=', 1)
+        with open(path) as f:
+            events[name] = json.load(f)
+
+    report = {}
+    for name in load_functions():
+        if args.only and name not in args.only:
+            continue
+
+        event = events.get(name, {'httpMethod': 'OPTIONS', 'headers': {}, 'body': ''})
+        runs = [run_once(name, event) for _ in range(args.runs)]
+        ok = [run for run in runs if 'import_ms' in run]
+
+        if not ok:
+            report[name] = {'error': runs[0].get('error')}
+            continue
+
+        report[name] = {
+            'import_ms': statistics.median(run['import_ms'] for run in ok),
+            'first_ms': statistics.median(run['first_ms'] for run in ok),
+            'warm_ms': statistics.median(run['warm_ms'] for run in ok),
+            'loaded': ok[-1]['loaded'],
+            'error': ok[-1]['error']
+        }
+
+    if args.json:
+        print(json.dumps(report, indent=2, ensure_ascii=False))
+        return
+
+    print(f"{'function':<10} {'import ms':>10} {'first ms':>10} {'warm ms':>10}  loaded")
+    for name, row in report.items():
+        if 'import_ms' not in row:
+            print(f"{name:<10} ошибка: {row['error']}")
+            continue
+        print(f"{name:<10} {row['import_ms']:>10.1f} {row['first_ms']:>10.1f} {row['warm_ms']:>10.1f}  "
+              f"{', '.join(row['loaded']) or '-'}")
+        if row['error']:
+            print(f"{'':<10} ошибка вызова: {row['error']}")
+
+
+if __name__ == '__main__':
+    main()
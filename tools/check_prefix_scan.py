@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Проверка перечисления префиксов заявок в storage.delete_prefixes / list_prefixes.
+
+На локальном хранилище раскладываются файлы заявок с id разной длины, в том числе
+«соседи по алфавиту» (12, 120..129, 1200..1299, 12000..12999 и т. д.), и считается,
+сколько ключей пришлось пролистать, чтобы найти файлы одной порции заявок.
+Разреженная порция не должна листать чужие диапазоны, плотная — должна укладываться
+в несколько LIST-вызовов.
+
+Запуск:
+    python3 tools/check_prefix_scan.py
+"""
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend', 'cleanup'))
+
+from storage import LocalStorage, RANGE_SCAN_SLACK  # noqa: E402
+from retention import booking_prefixes  # noqa: E402
+
+
+# Страница меньше, чем у S3 (1000), чтобы подсчёт ключей не округлялся до целой страницы
+PAGE_SIZE = 50
+
+
+class CountingStorage(LocalStorage):
+    """Локальное хранилище, считающее запросы страниц (как LIST-запросы к S3) и перечисленные ключи"""
+
+    def __init__(self, root: str):
+        super().__init__(root)
+        self.list_calls = 0
+        self.listed_keys = 0
+
+    def list(self, prefix: str, start_after: str = '', page_size: int = PAGE_SIZE):
+        for page in super().list(prefix, start_after, page_size):
+            self.list_calls += 1
+            self.listed_keys += len(page)
+            yield page
+
+
+def seed(storage: LocalStorage, booking_ids) -> None:
+    for booking_id in booking_ids:
+        storage.put(f'bookings/{booking_id}/photo_0.jpg', b'x', 'image/jpeg')
+        storage.put(f'receipts/{booking_id}/receipt.png', b'y', 'image/png')
+
+
+def check(name: str, storage: CountingStorage, booking_ids: list, max_listed: int, max_calls: int) -> bool:
+    storage.list_calls = 0
+    storage.listed_keys = 0
+    found = sorted(obj['key'] for obj, error in storage.list_prefixes(booking_prefixes([(i, '') for i in booking_ids])))
+    expected = sorted(
+        key for i in booking_ids
+        for key in (f'bookings/{i}/photo_0.jpg', f'receipts/{i}/receipt.png')
+    )
+    ok = found == expected and storage.listed_keys <= max_listed and storage.list_calls <= max_calls
+    print(f"{'OK  ' if ok else 'FAIL'} {name}: найдено {len(found)} из {len(expected)}, "
+          f"перечислено ключей {storage.listed_keys} (предел {max_listed}), "
+          f"LIST-вызовов {storage.list_calls} (предел {max_calls})")
+    return ok
+
+
+def main():
+    with tempfile.TemporaryDirectory() as root:
+        storage = CountingStorage(root)
+        # Шум: длинные id с теми же первыми цифрами, что и у проверяемых
+        seed(storage, list(range(12000, 13000)) + list(range(120000, 121000)))
+        seed(storage, [12, 13, 129] + list(range(1200, 1300)) + [4000, 87000])
+
+        results = [
+            # Разреженная порция: каждый префикс — отдельный LIST, чужие ключи не листаются
+            check('разреженные id', storage, [12, 1250, 4000, 87000], max_listed=8, max_calls=8),
+            # Плотная порция: один проход на родителя; под диапазон 1200..1299 попадают
+            # длинные id 12000..12989, поэтому проход обрывается и доходит по префиксам
+            check('плотные id', storage, list(range(1200, 1300)),
+                  max_listed=2 * (100 * (1 + RANGE_SCAN_SLACK) + PAGE_SIZE), max_calls=2 * (100 + 100 * (1 + RANGE_SCAN_SLACK) // PAGE_SIZE + 1)),
+            # Плотная порция без длинных соседей: несколько страниц на родителя, чужих ключей не больше страницы
+            check('плотные id без шума', storage, list(range(120100, 120200)),
+                  max_listed=2 * (100 + PAGE_SIZE), max_calls=2 * (100 // PAGE_SIZE + 1)),
+        ]
+
+    if not all(results):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+"""
+Локальный шлюз: все функции из backend/func2url.json в одном HTTP-сервере.
+
+Каждая функция монтируется по двум путям — по имени (/slots) и по пути из её
+боевого URL (/9689b825-...), так что во фронтенде достаточно заменить хост
+https://functions.poehali.dev на адрес шлюза. HTTP-запрос превращается в событие
+того же вида, что приходит в облачную функцию.
+
+Запуск:
+    python3 tools/gateway.py --port 8000 --workers 16
+    python3 tools/gateway.py --env-file .env --only slots --only bookings
+    python3 tools/gateway.py --async   # async_index.py там, где он есть
+"""
+import argparse
+import asyncio
+import base64
+import importlib.util
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+TEXT_CONTENT_TYPES = ('application/json', 'text/', 'application/x-www-form-urlencoded')
+
+
+class Context:
+    """Контекст вызова с тем же интерфейсом, что у облачной функции"""
+
+    def __init__(self, function_name: str, request_id: str, timeout_ms: int):
+        self.function_name = function_name
+        self.function_version = 'local'
+        self.request_id = request_id
+        self.memory_limit_in_mb = 128
+        self.deadline = time.monotonic() + timeout_ms / 1000
+
+    def get_remaining_time_in_millis(self) -> int:
+        return max(0, int((self.deadline - time.monotonic()) * 1000))
+
+
+def load_function(name: str, function_dir: str = '', entry: str = 'index'):
+    """Импортирует index.py функции так, чтобы её utils/storage/... не пересекались с чужими"""
+    function_dir = os.path.abspath(function_dir or os.path.join(BACKEND_DIR, name))
+    if not os.path.exists(os.path.join(function_dir, f'{entry}.py')):
+        entry = 'index'
+    saved_path = list(sys.path)
+    before = set(sys.modules)
+
+    sys.path.insert(0, function_dir)
+    try:
+        spec = importlib.util.spec_from_file_location(f'{name}_{entry}', os.path.join(function_dir, f'{entry}.py'))
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+    finally:
+        sys.path[:] = saved_path
+        # Соседние модули функции остаются доступны ей через её globals, но убираются из sys.modules,
+        # чтобы следующая функция импортировала собственные utils.py и storage.py
+        for module_name in set(sys.modules) - before:
+            module_file = getattr(sys.modules[module_name], '__file__', None) or ''
+            if os.path.dirname(os.path.abspath(module_file)) == function_dir:
+                del sys.modules[module_name]
+
+    return module
+
+
+def load_routes(only: list, entry: str = 'index') -> dict:
+    """Маршруты шлюза: первый сегмент пути -> (имя функции, модуль)"""
+    with open(os.path.join(BACKEND_DIR, 'func2url.json')) as f:
+        func2url = json.load(f)
+
+    routes = {}
+    for name, url in func2url.items():
+        if only and name not in only:
+            continue
+        module = load_function(name, entry=entry)
+        routes[name] = (name, module)
+        url_path = urlsplit(url).path.strip('/')
+        if url_path:
+            routes[url_path] = (name, module)
+    return routes
+
+
+def build_event(method: str, path: str, query: str, headers: dict, body: bytes, source_ip: str,
+                request_id: str) -> dict:
+    """Событие облачной функции из HTTP-запроса"""
+    content_type = headers.get('Content-Type', '')
+    is_text = not body or any(content_type.startswith(prefix) for prefix in TEXT_CONTENT_TYPES)
+
+    return {
+        'httpMethod': method,
+        'headers': headers,
+        'url': path + (f'?{query}' if query else ''),
+        'path': path,
+        'params': {},
+        'queryStringParameters': dict(parse_qsl(query, keep_blank_values=True)),
+        'multiValueQueryStringParameters': {},
+        'body': body.decode('utf-8') if is_text else base64.b64encode(body).decode('ascii'),
+        'isBase64Encoded': not is_text,
+        'requestContext': {
+            'requestId': request_id,
+            'httpMethod': method,
+            'requestTime': datetime.now(timezone.utc).strftime('%d/%b/%Y:%H:%M:%S %z'),
+            'identity': {
+                'sourceIp': source_ip,
+                'userAgent': headers.get('User-Agent', '')
+            }
+        }
+    }
+
+
+_loop = None
+_loop_lock = threading.Lock()
+
+
+def _event_loop():
+    """Общий цикл событий в фоновом потоке для асинхронных обработчиков"""
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name='gateway-loop', daemon=True).start()
+    return _loop
+
+
+def invoke(module, event: dict, context: Context) -> dict:
+    if asyncio.iscoroutinefunction(module.handler):
+        future = asyncio.run_coroutine_threadsafe(module.handler(event, context), _event_loop())
+        return future.result()
+    return module.handler(event, context)
+
+
+class GatewayRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    routes = {}
+    timeout_ms = 30000
+    quiet = False
+
+    def _dispatch(self):
+        started = time.perf_counter()
+        parts = urlsplit(self.path)
+        segments = parts.path.strip('/').split('/', 1)
+        route = self.routes.get(segments[0])
+
+        if not route:
+            self._send(404, {'Content-Type': 'application/json'}, json.dumps({'error': 'Unknown function'}).encode())
+            return
+
+        name, module = route
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b''
+        # Заголовки приводим к виду X-Admin-Token, как их передаёт облачная платформа
+        headers = {key.title(): value for key, value in self.headers.items()}
+        request_id = str(uuid.uuid4())
+
+        event = build_event(self.command, '/' + (segments[1] if len(segments) > 1 else ''),
+                            parts.query, headers, body, self.client_address[0], request_id)
+
+        try:
+            response = invoke(module, event, Context(name, request_id, self.timeout_ms))
+        except Exception as e:
+            response = {'statusCode': 502, 'headers': {'Content-Type': 'application/json'},
+                        'body': json.dumps({'error': f'{type(e).__name__}: {e}'})}
+
+        response_body = response.get('body') or ''
+        if response.get('isBase64Encoded'):
+            payload = base64.b64decode(response_body)
+        else:
+            payload = response_body.encode('utf-8') if isinstance(response_body, str) else bytes(response_body)
+
+        self._send(response.get('statusCode', 200), response.get('headers') or {}, payload)
+
+        if not self.quiet:
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            print(f'{self.command} {self.path} -> {name} {response.get("statusCode", 200)} {elapsed_ms:.1f} ms',
+                  flush=True)
+
+    def _send(self, status: int, headers: dict, payload: bytes):
+        self.send_response(status)
+        for key, value in headers.items():
+            self.send_header(key, str(value))
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+    do_GET = do_POST = do_PUT = do_DELETE = do_PATCH = do_OPTIONS = _dispatch
+
+
+class PooledHTTPServer(HTTPServer):
+    """HTTP-сервер, обрабатывающий запросы в пуле потоков фиксированного размера"""
+
+    daemon_threads = True
+
+    def __init__(self, address, handler_class, workers: int):
+        super().__init__(address, handler_class)
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='gateway')
+
+    def process_request(self, request, client_address):
+        self.pool.submit(self._process, request, client_address)
+
+    def _process(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        self.pool.shutdown(wait=False)
+
+
+def load_env_file(path: str):
+    """Простая загрузка переменных окружения из файла KEY=VALUE"""
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith('#') or '=' not in line:
+                continue
+            key, value = line.split('=', 1)
+            os.environ.setdefault(key.strip(), value.strip().strip('"').strip("'"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Локальный шлюз для всех функций')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--workers', type=int, default=8, help='Размер пула обработчиков')
+    parser.add_argument('--timeout', type=int, default=30, help='Таймаут функции в секундах (для context)')
+    parser.add_argument('--env-file', help='Файл с переменными окружения KEY=VALUE')
+    parser.add_argument('--only', action='append', default=[], help='Поднять только эти функции')
+    parser.add_argument('--async', dest='use_async', action='store_true',
+                        help='Использовать async_index.py у функций, где он есть')
+    parser.add_argument('--quiet', action='store_true', help='Не печатать журнал запросов')
+    args = parser.parse_args()
+
+    if args.env_file:
+        load_env_file(args.env_file)
+
+    GatewayRequestHandler.routes = load_routes(args.only, 'async_index' if args.use_async else 'index')
+    GatewayRequestHandler.timeout_ms = args.timeout * 1000
+    GatewayRequestHandler.quiet = args.quiet
+
+    server = PooledHTTPServer((args.host, args.port), GatewayRequestHandler, args.workers)
+    print(f'Шлюз слушает http://{args.host}:{args.port} ({args.workers} обработчиков)')
+    for path, (name, _) in sorted(GatewayRequestHandler.routes.items()):
+        print(f'  /{path} -> {name}')
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Прогрев развёрнутых функций из backend/func2url.json.
+
+Каждой функции отправляется запрос с заголовком X-Warmup, равным секрету WARMUP_TOKEN
+(тот же, что в окружении функций): она открывает пул соединений с базой, подготавливает
+запросы, создаёт клиенты хранилища и HTTP и заполняет кэши, не выполняя никакой работы.
+Функция отвечает только итогом; время и ошибки шагов — в её логе (событие warmup).
+Подходит для хука после деплоя или для планировщика, который держит экземпляры тёплыми.
+
+Запуск:
+    WARMUP_TOKEN=... python3 tools/warm_functions.py
+    python3 tools/warm_functions.py --only slots --only bookings --json
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend')
+
+
+def load_urls() -> dict:
+    with open(os.path.join(BACKEND_DIR, 'func2url.json')) as f:
+        return json.load(f)
+
+
+def warm(name: str, url: str, token: str, timeout: float) -> dict:
+    request = urllib.request.Request(url, headers={'X-Warmup': token})
+    started = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            status, body = response.status, response.read()
+    except urllib.error.HTTPError as e:
+        status, body = e.code, e.read()
+    except (urllib.error.URLError, OSError) as e:
+        return {'function': name, 'ok': False, 'error': repr(e)}
+
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    try:
+        report = json.loads(body)
+    except ValueError:
+        report = {'error': body[:200].decode('utf-8', 'replace')}
+
+    # Функция без режима прогрева ответит обычным образом — это не считается успехом
+    ok = status == 200 and report.get('warmup') is True
+    return {'function': name, 'ok': ok, 'status': status, 'request_ms': round(elapsed_ms, 1), **report}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Прогрев функций')
+    parser.add_argument('--only', action='append', default=[], help='Прогреть только эти функции')
+    parser.add_argument('--timeout', type=float, default=30, help='Таймаут запроса, секунд')
+    parser.add_argument('--json', action='store_true', help='Вывести результат в JSON')
+    args = parser.parse_args()
+
+    token = os.environ.get('WARMUP_TOKEN', '')
+    if not token:
+        sys.exit('WARMUP_TOKEN не задан: без него функции не примут запрос прогрева')
+
+    urls = {name: url for name, url in sorted(load_urls().items()) if not args.only or name in args.only}
+    with ThreadPoolExecutor(max_workers=len(urls) or 1) as pool:
+        results = list(pool.map(lambda item: warm(item[0], item[1], token, args.timeout), urls.items()))
+
+    if args.json:
+        print(json.dumps(results, indent=2, ensure_ascii=False))
+    else:
+        for result in results:
+            status = 'ok' if result['ok'] else 'ошибка'
+            print(f"{result['function']:<10} {status:<7} {result.get('request_ms', 0):>8.1f} ms")
+            if 'error' in result:
+                print(f"{'':<10} {result['error']}")
+
+    sys.exit(0 if all(result['ok'] for result in results) else 1)
+
+
+if __name__ == '__main__':
+    main()